@@ -4,7 +4,8 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'web.settings')
 django.setup()
 
-from main.models import Student, Group, GroupHistory
+from main.models import Student, Group, GroupHistory, SnapshotDate
+from main.signals import deferred_history_updates
 from datetime import date
 
 # Распределение на 16.12.2025 (ДЕКАБРЬ - из загруженного файла)
@@ -146,14 +147,19 @@ january_distribution = {
 }
 
 
+@deferred_history_updates()
 def add_history():
     print("🔄 Добавление истории групп...")
     print("=" * 80)
 
     # Очищаем старую историю
     GroupHistory.objects.all().delete()
+    SnapshotDate.objects.all().delete()
     print("✓ Очищена старая история")
 
+    # Январский срез нужен статистике, даже если в нём пишутся только переходы
+    SnapshotDate.objects.bulk_create([SnapshotDate(date=date(2025, 12, 16)), SnapshotDate(date=date(2026, 1, 12))])
+
     groups = {g.number: g for g in Group.objects.all()}
 
     # 1. Создаём записи на 16.12.2025 (декабрь)
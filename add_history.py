@@ -5,7 +5,8 @@ import csv
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'web.settings')
 django.setup()
 
-from main.models import Student, Group, GroupHistory
+from main.models import Student, Group, GroupHistory, SnapshotDate
+from main.signals import deferred_history_updates
 from datetime import date
 
 print("=" * 80)
@@ -54,65 +55,73 @@ print(f"Всего записей для добавления: {total_records}")
 response = input("\n❓ Очистить текущую историю и добавить новую? (yes/no): ")
 
 if response.lower() == 'yes':
-    print("\n🔄 Обновление истории...")
-
-    # Очищаем историю
-    deleted = GroupHistory.objects.all().delete()
-    print(f"  ✓ Удалено старых записей: {deleted[0]}")
-
-    # Добавляем новую историю из файла
-    added_count = 0
-    errors = []
-
-    for name, file_data in file_history.items():
-        try:
-            student = Student.objects.get(full_name=name)
-
-            # Обновляем класс
-            if file_data['class'] and student.class_name != file_data['class']:
-                student.class_name = file_data['class']
-                student.save()
-
-            # Добавляем записи для каждой даты
-            for period, date_val in dates_map.items():
-                group_num = file_data.get(period)
-
-                if group_num is None:
-                    continue
-
-                if group_num in groups:
-                    group = groups[group_num]
-
-                    GroupHistory.objects.create(
-                        student=student,
-                        group=group,
-                        transfer_date=date_val,
-                        reason=f'Данные из файла ({period})'
-                    )
-                    added_count += 1
-                else:
-                    errors.append(f"Группа {group_num} не найдена для {name}")
-
-            # Обновляем текущую группу
-            jan_group = file_data.get('january')
-            if jan_group and jan_group in groups:
-                student.current_group = groups[jan_group]
-                student.save()
-
-        except Student.DoesNotExist:
-            errors.append(f"Ученик не найден: {name}")
-        except Student.MultipleObjectsReturned:
-            errors.append(f"Несколько учеников с именем: {name}")
-
-    print(f"  ✓ Добавлено записей: {added_count}")
-
-    if errors:
-        print(f"\n⚠️ Ошибки ({len(errors)}):")
-        for error in errors[:10]:  # Показываем первые 10
-            print(f"  - {error}")
-        if len(errors) > 10:
-            print(f"  ... и ещё {len(errors) - 10}")
-
-    print("\n✅ История успешно обновлена с датой 15.10.2025!")
+    # Интервалы и линии статистики пересчитываются один раз в конце
+    with deferred_history_updates():
+        print("\n🔄 Обновление истории...")
+
+        # Очищаем историю
+        deleted = GroupHistory.objects.all().delete()
+        SnapshotDate.objects.all().delete()
+        print(f"  ✓ Удалено старых записей: {deleted[0]}")
+
+        # Даты срезов храним отдельно: в историю пишем только смену группы
+        SnapshotDate.objects.bulk_create([SnapshotDate(date=date_val) for date_val in dates_map.values()])
+
+        # Добавляем новую историю из файла
+        added_count = 0
+        errors = []
+
+        for name, file_data in file_history.items():
+            try:
+                student = Student.objects.get(full_name=name)
+
+                # Обновляем класс
+                if file_data['class'] and student.class_name != file_data['class']:
+                    student.class_name = file_data['class']
+                    student.save()
+
+                # Добавляем записи только на даты, когда группа меняется
+                previous_group_num = None
+                for period, date_val in dates_map.items():
+                    group_num = file_data.get(period)
+
+                    if group_num is None or group_num == previous_group_num:
+                        continue
+                    previous_group_num = group_num
+
+                    if group_num in groups:
+                        group = groups[group_num]
+
+                        GroupHistory.objects.create(
+                            student=student,
+                            group=group,
+                            transfer_date=date_val,
+                            reason=f'Данные из файла ({period})'
+                        )
+                        added_count += 1
+                    else:
+                        errors.append(f"Группа {group_num} не найдена для {name}")
+
+                # Обновляем текущую группу
+                jan_group = file_data.get('january')
+                if jan_group and jan_group in groups:
+                    student.current_group = groups[jan_group]
+                    student.save()
+
+            except Student.DoesNotExist:
+                errors.append(f"Ученик не найден: {name}")
+            except Student.MultipleObjectsReturned:
+                errors.append(f"Несколько учеников с именем: {name}")
+
+        print(f"  ✓ Добавлено записей: {added_count}")
+
+        if errors:
+            print(f"\n⚠️ Ошибки ({len(errors)}):")
+            for error in errors[:10]:  # Показываем первые 10
+                print(f"  - {error}")
+            if len(errors) > 10:
+                print(f"  ... и ещё {len(errors) - 10}")
+
+        print("\n✅ История успешно обновлена с датой 15.10.2025!")
 else:
     print("\n❌ Обновление отменено")
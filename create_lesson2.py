@@ -401,6 +401,7 @@ else:
         theory_content=theory_html,
         duration_minutes=40,
         test_duration_minutes=10,
+        task_generator='comparison',
         is_active=True
     )
 
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Student, Group, Teacher, GroupHistory, Lesson, LessonTask
+from django.db.models import Count
+from .lesson_assets import build_lesson
+from .models import Student, Group, Teacher, GroupHistory, SnapshotDate, Lesson, LessonStats, LessonTask
 
 
 @admin.register(Teacher)
@@ -14,15 +16,20 @@ class GroupAdmin(admin.ModelAdmin):
     list_filter = ['teacher']
     search_fields = ['number']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(student_count=Count('student'))
+
     def get_student_count(self, obj):
-        return obj.students.count()
+        return obj.student_count
 
     get_student_count.short_description = 'Количество учеников'
+    get_student_count.admin_order_field = 'student_count'
 
 
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
     list_display = ['full_name', 'class_name', 'current_group', 'user']
+    list_select_related = ['current_group', 'user']
     list_filter = ['current_group', 'class_name']
     search_fields = ['full_name', 'user__username']
     ordering = ['full_name']
@@ -30,33 +37,75 @@ class StudentAdmin(admin.ModelAdmin):
 
 @admin.register(GroupHistory)
 class GroupHistoryAdmin(admin.ModelAdmin):
-    list_display = ['student', 'group', 'transfer_date', 'reason']
+    list_display = ['student', 'group', 'transfer_date', 'valid_to', 'reason']
     list_filter = ['group', 'transfer_date']
     search_fields = ['student__full_name', 'reason']
     date_hierarchy = 'transfer_date'
     ordering = ['-transfer_date']
 
 
+@admin.register(SnapshotDate)
+class SnapshotDateAdmin(admin.ModelAdmin):
+    list_display = ['date']
+    date_hierarchy = 'date'
+
+
 @admin.register(Lesson)
 class LessonAdmin(admin.ModelAdmin):
-    list_display = ['title', 'date', 'subject', 'grade', 'is_active', 'get_tasks_count']
-    list_filter = ['subject', 'grade', 'is_active', 'date']
+    list_display = ['title', 'date', 'subject', 'grade', 'task_generator', 'is_active',
+                    'get_tasks_count', 'get_submission_count', 'get_average_score']
+    list_filter = ['subject', 'grade', 'task_generator', 'is_active', 'date']
     search_fields = ['title', 'subject']
     date_hierarchy = 'date'
     ordering = ['-date']
+    actions = ['provision_tasks', 'build_theory']
+    list_select_related = ['stats']
+
+    @admin.action(description='Подготовить задания для всех учеников')
+    def provision_tasks(self, request, queryset):
+        for lesson in queryset:
+            created = LessonTask.provision(lesson)
+            self.message_user(request, f'{lesson}: создано заданий {created}')
+
+    @admin.action(description='Собрать теорию (стили и скрипты в отдельные файлы)')
+    def build_theory(self, request, queryset):
+        for lesson in queryset:
+            names = build_lesson(lesson, force=True)
+            self.message_user(request, f'{lesson}: файлов {len(names)}')
+
+    @staticmethod
+    def _stats(obj):
+        # Строка статистики появляется с первым заданием урока
+        try:
+            return obj.stats
+        except LessonStats.DoesNotExist:
+            return None
 
     def get_tasks_count(self, obj):
-        return obj.tasks.count()
+        stats = self._stats(obj)
+        return stats.tasks_created if stats else 0
 
     get_tasks_count.short_description = 'Заданий создано'
 
+    def get_submission_count(self, obj):
+        stats = self._stats(obj)
+        return stats.submission_count if stats else 0
+
+    get_submission_count.short_description = 'Сдано работ'
+
+    def get_average_score(self, obj):
+        stats = self._stats(obj)
+        return stats.average if stats else None
+
+    get_average_score.short_description = 'Средняя оценка'
+
 
 @admin.register(LessonTask)
 class LessonTaskAdmin(admin.ModelAdmin):
     list_display = ['student', 'lesson', 'score', 'correct_count', 'total_count', 'submitted_at']
     list_filter = ['lesson', 'score', 'submitted_at']
     search_fields = ['student__full_name', 'lesson__title']
-    readonly_fields = ['tasks_data', 'answers', 'submitted_at']
+    readonly_fields = ['tasks_data', 'generator', 'generator_version', 'seed', 'answers', 'submitted_at']
     ordering = ['-submitted_at']
 
     fieldsets = (
@@ -64,7 +113,7 @@ class LessonTaskAdmin(admin.ModelAdmin):
             'fields': ('lesson', 'student')
         }),
         ('Задания и ответы', {
-            'fields': ('tasks_data', 'answers'),
+            'fields': ('tasks_data', 'generator', 'generator_version', 'seed', 'answers'),
             'classes': ('collapse',)
         }),
         ('Результаты', {
@@ -0,0 +1,239 @@
+"""Аналитика по группам и заданиям тестов: векторные расчёты на numpy"""
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import Group, LessonTask, TaskAttempt
+from .timeline import get_key_dates, groups_on_dates
+
+# Код «ученика ещё нет в истории» в матрице принадлежности
+NO_GROUP = -1
+
+# Доля учеников в сильной и слабой группах для индекса дискриминативности
+DISCRIMINATION_SHARE = 0.27
+ITEM_ANALYSIS_TIMEOUT = 60 * 60
+MAX_SCORE = 7
+
+
+def membership_matrix(key_dates=None):
+    """
+    Плотная матрица ученики × ключевые даты с кодами групп.
+
+    Ячейки заполняются срезами GroupHistory.on_date (groups_on_dates);
+    до первой записи ученика стоит NO_GROUP.
+    Возвращает (матрица, номера групп по кодам, id учеников по строкам).
+    """
+    if key_dates is None:
+        key_dates = get_key_dates()
+    rows = groups_on_dates(key_dates)
+    if not rows:
+        return np.full((0, len(key_dates)), NO_GROUP), [], []
+
+    columns, student_ids, group_numbers = (np.asarray(values) for values in zip(*rows))
+    student_ids, row_index = np.unique(student_ids, return_inverse=True)
+    numbers, codes = np.unique(group_numbers.astype(float), return_inverse=True)
+
+    matrix = np.full((len(student_ids), len(key_dates)), NO_GROUP)
+    matrix[row_index, columns] = codes
+    return matrix, numbers.tolist(), student_ids.tolist()
+
+
+def transition_counts(matrix, groups_count):
+    """
+    Матрицы переходов для каждой пары соседних дат.
+
+    Результат формы (даты - 1, группы, группы): [t, a, b] - сколько
+    учеников были в группе с кодом a на дату t и в b на дату t + 1.
+    """
+    steps = max(matrix.shape[1] - 1, 0)
+    size = groups_count * groups_count
+    before, after = matrix[:, :-1], matrix[:, 1:]
+    valid = (before != NO_GROUP) & (after != NO_GROUP)
+    flat = np.arange(steps) * size + before * groups_count + after
+    counts = np.bincount(flat[valid], minlength=steps * size)
+    return counts.reshape(steps, groups_count, groups_count)
+
+
+def group_transitions(key_dates=None):
+    """
+    Потоки между группами по шагам для страницы статистики.
+
+    Для каждой пары соседних дат: сколько учеников осталось в своей
+    группе и список переходов вида {'from': 2.1, 'to': 2.2, 'count': 3}.
+    """
+    if key_dates is None:
+        key_dates = get_key_dates()
+    matrix, numbers, _ = membership_matrix(key_dates)
+    counts = transition_counts(matrix, len(numbers))
+
+    steps = []
+    for step, step_counts in enumerate(counts):
+        moved_from, moved_to = np.nonzero(step_counts)
+        flows = [
+            {'from': numbers[a], 'to': numbers[b], 'count': int(step_counts[a, b])}
+            for a, b in zip(moved_from.tolist(), moved_to.tolist())
+            if a != b
+        ]
+        steps.append({
+            'from_date': key_dates[step].strftime('%d.%m.%Y'),
+            'to_date': key_dates[step + 1].strftime('%d.%m.%Y'),
+            'stayed': int(np.trace(step_counts)),
+            'moved': int(step_counts.sum() - np.trace(step_counts)),
+            'flows': flows,
+        })
+    return steps
+
+
+def group_stats():
+    """Группы с числом учеников и преподавателем для страницы статистики"""
+    groups = (
+        Group.objects
+        .select_related('teacher')
+        .annotate(current_count=Count('student'))
+        .order_by('number')
+    )
+    return [
+        {
+            'group': group,
+            'current_count': group.current_count,
+            'teacher': group.teacher.full_name if group.teacher else 'Не назначен',
+        }
+        for group in groups
+    ]
+
+
+def correctness_matrix(lesson):
+    """
+    Матрица ученики × позиции заданий урока по строкам TaskAttempt.
+
+    Возвращает (верно: 1.0/0.0, NaN - задания не было; баллы за
+    задания; преобладающий тип задания на каждой позиции).
+    """
+    rows = list(
+        TaskAttempt.objects
+        .filter(lesson=lesson)
+        .values_list('student_id', 'position', 'is_correct', 'points', 'task_type')
+    )
+    if not rows:
+        return np.zeros((0, 0)), np.zeros((0, 0)), []
+
+    student_ids, positions, correct, points, types = zip(*rows)
+    _, row_index = np.unique(np.asarray(student_ids), return_inverse=True)
+    positions = np.asarray(positions)
+    shape = (row_index.max() + 1, positions.max() + 1)
+
+    matrix = np.full(shape, np.nan)
+    matrix[row_index, positions] = np.asarray(correct, dtype=float)
+    weights = np.zeros(shape)
+    weights[row_index, positions] = np.asarray(points, dtype=float)
+
+    type_names, type_codes = np.unique(np.asarray(types), return_inverse=True)
+    type_counts = np.zeros((shape[1], len(type_names)), dtype=int)
+    np.add.at(type_counts, (positions, type_codes), 1)
+    return matrix, weights, type_names[type_counts.argmax(axis=1)].tolist()
+
+
+def _masked_mean(values, mask, axis=0):
+    count = mask.sum(axis=axis)
+    total = np.where(mask, values, 0).sum(axis=axis)
+    return np.divide(total, count, out=np.full(total.shape, np.nan), where=count > 0)
+
+
+def item_statistics(matrix, weights):
+    """
+    Показатели заданий по матрице верности.
+
+    difficulty - доля верных ответов; discrimination - разность этой доли
+    в сильной и слабой группах (по DISCRIMINATION_SHARE учеников с каждого
+    края по сумме баллов); point_biserial - корреляция верности задания
+    с баллами за остальные задания.
+    """
+    answered = ~np.isnan(matrix)
+    correct = np.where(answered, matrix, 0.0)
+    totals = (correct * weights).sum(axis=1)
+
+    difficulty = _masked_mean(correct, answered)
+
+    students = len(totals)
+    group_size = max(1, int(round(students * DISCRIMINATION_SHARE)))
+    order = np.argsort(totals, kind='stable')
+    lower, upper = order[:group_size], order[-group_size:]
+    discrimination = (
+        _masked_mean(correct[upper], answered[upper]) - _masked_mean(correct[lower], answered[lower])
+    )
+
+    # Баллы без самого задания, чтобы оно не коррелировало само с собой
+    rest = totals[:, None] - correct * weights
+    item_mean = _masked_mean(correct, answered)
+    rest_mean = _masked_mean(rest, answered)
+    item_dev = np.where(answered, correct - item_mean, 0.0)
+    rest_dev = np.where(answered, rest - rest_mean, 0.0)
+    spread = np.sqrt((item_dev ** 2).sum(axis=0) * (rest_dev ** 2).sum(axis=0))
+    covariance = (item_dev * rest_dev).sum(axis=0)
+    point_biserial = np.divide(covariance, spread, out=np.full(spread.shape, np.nan), where=spread > 0)
+
+    return {
+        'answered': answered.sum(axis=0),
+        'difficulty': difficulty,
+        'discrimination': discrimination,
+        'point_biserial': point_biserial,
+    }
+
+
+def score_distribution(scores):
+    """Гистограмма оценок 0..MAX_SCORE, среднее и стандартное отклонение"""
+    scores = np.asarray(scores, dtype=int)
+    counts = np.bincount(scores, minlength=MAX_SCORE + 1)[:MAX_SCORE + 1]
+    total = int(counts.sum())
+    return {
+        'histogram': [
+            {'score': score, 'count': int(count), 'percent': round(count / total * 100, 1) if total else 0}
+            for score, count in enumerate(counts.tolist())
+        ],
+        'mean': round(float(scores.mean()), 2) if total else None,
+        'std': round(float(scores.std()), 2) if total else None,
+    }
+
+
+def _rounded(value, digits=2):
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def build_item_analysis(lesson):
+    matrix, weights, task_types = correctness_matrix(lesson)
+    scores = LessonTask.objects.filter(lesson=lesson, score__isnull=False).values_list('score', flat=True)
+    analysis = {
+        'students': matrix.shape[0],
+        'items': [],
+        'scores': score_distribution(list(scores)),
+    }
+    if not matrix.size:
+        return analysis
+
+    stats = item_statistics(matrix, weights)
+    for position, task_type in enumerate(task_types):
+        analysis['items'].append({
+            'number': position + 1,
+            'task_type': task_type,
+            'answered': int(stats['answered'][position]),
+            'difficulty': _rounded(stats['difficulty'][position]),
+            'discrimination': _rounded(stats['discrimination'][position]),
+            'point_biserial': _rounded(stats['point_biserial'][position]),
+        })
+    return analysis
+
+
+def get_item_analysis(lesson):
+    """
+    Анализ заданий урока с кэшем.
+
+    Ключ включает число и максимальный id строк TaskAttempt урока:
+    новая сдача или перепроверка (строки пересоздаются) дают новый ключ.
+    """
+    fingerprint = TaskAttempt.objects.filter(lesson=lesson).aggregate(count=Count('id'), last=Max('id'))
+    key = f"item_analysis:{lesson.pk}:{fingerprint['count']}:{fingerprint['last']}"
+    analysis = cache.get(key)
+    if analysis is None:
+        analysis = build_item_analysis(lesson)
+        cache.set(key, analysis, ITEM_ANALYSIS_TIMEOUT)
+    return analysis
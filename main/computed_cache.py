@@ -0,0 +1,101 @@
+"""
+Кэш тяжёлых вычислений для страниц преподавателя с защитой от лавины.
+
+Значение хранится вместе с версией своего пространства имён (например,
+GROUP_HISTORY). Сигналы поднимают версию при изменении данных, и запись
+становится устаревшей. Пересчитывает только тот процесс, который взял
+блокировку через cache.add. Остальные в это время отдают устаревшее
+значение, а если его нет - ждут результат. Версия поднимается после
+коммита транзакции, чтобы пересчёт не прочитал незакоммиченные данные.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+# Пространства имён версий
+GROUP_HISTORY = 'group_history'  # линии, переходы и состав групп
+GRADEBOOK = 'gradebook'          # таблица результатов
+
+# Сколько значение считается свежим, даже если версия не менялась
+FRESH_SECONDS = 10 * 60
+# Сколько хранится устаревшее значение, которое можно отдать во время пересчёта
+STALE_SECONDS = 24 * 60 * 60
+# Блокировка снимается сама, если пересчитывающий процесс упал
+LOCK_SECONDS = 60
+# Сколько ждать чужого пересчёта, если отдать нечего
+WAIT_SECONDS = 10
+WAIT_INTERVAL = 0.05
+
+
+def _version_key(namespace):
+    return f'computed:version:{namespace}'
+
+
+def get_version(namespace):
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        version = 1
+        cache.add(key, version, None)
+    return version
+
+
+def _bump(namespaces):
+    for namespace in namespaces:
+        try:
+            cache.incr(_version_key(namespace))
+        except ValueError:
+            cache.set(_version_key(namespace), 2, None)
+
+
+def bump_version(*namespaces):
+    """Пометить значения пространств имён устаревшими (после коммита текущей транзакции)"""
+    transaction.on_commit(lambda: _bump(namespaces))
+
+
+def _is_fresh(entry, version):
+    return entry is not None and entry['version'] == version and entry['fresh_until'] > time.time()
+
+
+def _store(key, version, value):
+    cache.set(key, {'version': version, 'fresh_until': time.time() + FRESH_SECONDS, 'value': value},
+              STALE_SECONDS)
+
+
+def cached_computation(namespace, name, compute):
+    """
+    Значение compute() из кэша под ключом name в пространстве namespace.
+
+    Свежее значение отдаётся сразу. Устаревшее или отсутствующее
+    пересчитывает один процесс; остальные получают устаревшее значение
+    или ждут до WAIT_SECONDS, после чего считают сами.
+    """
+    key = f'computed:{namespace}:{name}'
+    lock_key = f'{key}:lock'
+    # Версия читается до пересчёта: изменение во время расчёта снова сделает запись устаревшей
+    version = get_version(namespace)
+    entry = cache.get(key)
+    if _is_fresh(entry, version):
+        return entry['value']
+
+    if cache.add(lock_key, 1, LOCK_SECONDS):
+        try:
+            value = compute()
+            _store(key, version, value)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    if entry is not None:
+        return entry['value']
+
+    deadline = time.monotonic() + WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['value']
+        if cache.get(lock_key) is None:
+            break
+    return compute()
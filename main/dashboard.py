@@ -0,0 +1,85 @@
+"""Сводка уроков для главной страницы ученика (с кэшем на ученика)"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, FilteredRelation, Q
+
+from .models import Lesson
+
+# Сводка хранится до явной инвалидации, таймаут - страховка
+STUDENT_LESSONS_TIMEOUT = 60 * 60 * 24
+
+# Версия списка уроков: меняется при создании/активации/удалении урока
+LESSONS_VERSION_KEY = 'student_lessons:version'
+
+
+def _lessons_version():
+    version = cache.get(LESSONS_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(LESSONS_VERSION_KEY, version, None)
+    return version
+
+
+def _student_lessons_key(student_id, version):
+    return f'student_lessons:{version}:{student_id}'
+
+
+def build_student_lessons(student_id):
+    """Статусы всех активных уроков ученика одним запросом (без theory_content)"""
+    rows = (
+        Lesson.objects
+        .filter(is_active=True)
+        .annotate(student_task=FilteredRelation('tasks', condition=Q(tasks__student_id=student_id)))
+        .order_by('date')
+        .values(
+            'id', 'title', 'date',
+            task_submitted_at=F('student_task__submitted_at'),
+            task_score=F('student_task__score'),
+        )
+    )
+
+    lessons = []
+    for row in rows:
+        completed = row['task_submitted_at'] is not None
+        lessons.append({
+            'id': row['id'],
+            'title': row['title'],
+            'date': row['date'],
+            'completed': completed,
+            'score': row['task_score'] if completed else None,
+        })
+    return lessons
+
+
+def get_student_lessons(student_id):
+    """Список уроков со статусами из кэша; при промахе - build_student_lessons"""
+    key = _student_lessons_key(student_id, _lessons_version())
+    lessons = cache.get(key)
+    if lessons is None:
+        lessons = build_student_lessons(student_id)
+        cache.set(key, lessons, STUDENT_LESSONS_TIMEOUT)
+    return lessons
+
+
+def _delete_student_lessons(student_id):
+    cache.delete(_student_lessons_key(student_id, _lessons_version()))
+
+
+def _bump_lessons_version():
+    try:
+        cache.incr(LESSONS_VERSION_KEY)
+    except ValueError:
+        cache.set(LESSONS_VERSION_KEY, 2, None)
+
+
+# Сброс выполняется после коммита: иначе параллельный запрос успеет
+# закэшировать на сутки ещё не закоммиченное состояние
+
+def invalidate_student_lessons(student_id):
+    """Сбросить сводку одного ученика (после сдачи теста)"""
+    transaction.on_commit(lambda: _delete_student_lessons(student_id))
+
+
+def invalidate_all_lessons():
+    """Сбросить сводки всех учеников (урок создан, активирован или удалён)"""
+    transaction.on_commit(_bump_lessons_version)
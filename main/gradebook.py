@@ -0,0 +1,263 @@
+"""Сводная таблица оценок (ученики × уроки) для преподавателя"""
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+
+from .computed_cache import GRADEBOOK, bump_version
+from .dashboard import invalidate_all_lessons
+from .grading import default_checker
+from .models import (
+    GradebookEntry, GroupProgress, Lesson, LessonStats, LessonTask, Student, StudentProgress, TaskAttempt,
+)
+
+# Ячейка для урока, к которому ученик ещё не приступал
+EMPTY_RESULT = {'score': None, 'submitted': False}
+
+
+def build_gradebook(group_ids):
+    """
+    Таблица результатов учеников указанных групп.
+
+    Всегда три запроса (уроки, ученики с итогами, журнал) независимо от
+    числа учеников и уроков: записи журнала выбираются одним проходом и
+    раскладываются в матрицу в памяти.
+    """
+    lessons = list(
+        Lesson.objects
+        .filter(is_active=True)
+        .order_by('date')
+        .values('id', 'title', 'date', submission_count=F('stats__submission_count'),
+                score_sum=F('stats__score_sum'))
+    )
+    for lesson in lessons:
+        submitted = lesson.pop('submission_count') or 0
+        score_sum = lesson.pop('score_sum') or 0
+        lesson['submitted'] = submitted
+        lesson['average'] = round(score_sum / submitted, 2) if submitted else None
+    lesson_index = {lesson['id']: i for i, lesson in enumerate(lessons)}
+
+    students = list(
+        Student.objects
+        .filter(current_group_id__in=group_ids)
+        .order_by('full_name')
+        .values(
+            'id', 'full_name', 'class_name',
+            group_number=F('current_group__number'),
+            completed_count=F('progress__completed_count'),
+            score_sum=F('progress__score_sum'),
+        )
+    )
+    rows = {}
+    results_table = []
+    for student in students:
+        completed = student.pop('completed_count') or 0
+        score_sum = student.pop('score_sum') or 0
+        student['completed_count'] = completed
+        student['average'] = round(score_sum / completed, 2) if completed else None
+        row = {'student': student, 'results': [EMPTY_RESULT] * len(lessons)}
+        rows[student['id']] = row
+        results_table.append(row)
+
+    entries = (
+        GradebookEntry.objects
+        .filter(student__current_group_id__in=group_ids, lesson__is_active=True)
+        .values_list('student_id', 'lesson_id', 'score', 'submitted_at')
+    )
+    for student_id, lesson_id, score, submitted_at in entries:
+        row = rows.get(student_id)
+        position = lesson_index.get(lesson_id)
+        if row is None or position is None or submitted_at is None:
+            continue
+        row['results'][position] = {'score': score, 'submitted': True}
+
+    return {
+        'lessons': lessons,
+        'results_table': results_table,
+    }
+
+
+def refresh_rollups(student_ids=None, group_ids=None):
+    """
+    Пересчитать итоги учеников и групп по журналу.
+
+    None - пересчитать все строки; иначе только перечисленные.
+    """
+    for model, field, ids in ((StudentProgress, 'student_id', student_ids), (GroupProgress, 'group_id', group_ids)):
+        entries = GradebookEntry.objects.filter(**{f'{field}__isnull': False})
+        stale = model.objects.all()
+        if ids is not None:
+            entries = entries.filter(**{f'{field}__in': ids})
+            stale = stale.filter(pk__in=ids)
+        totals = (
+            entries
+            .values(field)
+            .annotate(count=Count('id'), total=Sum('score'), last=Max('submitted_at'))
+        )
+        with transaction.atomic():
+            stale.delete()
+            model.objects.bulk_create([
+                model(pk=row[field], completed_count=row['count'], score_sum=row['total'],
+                      last_submitted_at=row['last'])
+                for row in totals
+            ], batch_size=500)
+    bump_version(GRADEBOOK)
+
+
+def refresh_lesson_stats(lesson_ids=None):
+    """
+    Пересчитать LessonStats по журналу и заданиям уроков.
+
+    None - все уроки; иначе только перечисленные.
+    """
+    lessons = Lesson.objects.all()
+    entries = GradebookEntry.objects.filter(score__isnull=False)
+    tasks = LessonTask.objects.all()
+    stale = LessonStats.objects.all()
+    if lesson_ids is not None:
+        lessons = lessons.filter(pk__in=lesson_ids)
+        entries = entries.filter(lesson_id__in=lesson_ids)
+        tasks = tasks.filter(lesson_id__in=lesson_ids)
+        stale = stale.filter(pk__in=lesson_ids)
+
+    created = dict(tasks.values('lesson_id').annotate(count=Count('id')).values_list('lesson_id', 'count'))
+    histogram = {f'score_{score}': Count('id', filter=Q(score=score)) for score in LessonStats.SCORES}
+    totals = {
+        row['lesson_id']: row
+        for row in (
+            entries
+            .values('lesson_id')
+            .annotate(count=Count('id'), total=Sum('score'), squares=Sum(F('score') * F('score')), **histogram)
+        )
+    }
+
+    rows = []
+    for lesson_id in lessons.values_list('id', flat=True):
+        row = totals.get(lesson_id, {})
+        rows.append(LessonStats(
+            pk=lesson_id,
+            tasks_created=created.get(lesson_id, 0),
+            submission_count=row.get('count', 0),
+            score_sum=row.get('total') or 0,
+            score_sq_sum=row.get('squares') or 0,
+            **{field: row.get(field, 0) for field in histogram},
+        ))
+    with transaction.atomic():
+        stale.delete()
+        LessonStats.objects.bulk_create(rows, batch_size=500)
+
+
+def rebuild_gradebook_summary():
+    """
+    Пересобрать журнал, итоги учеников/групп и статистику уроков из LessonTask с нуля.
+
+    Нужен для первичного заполнения и после массовых правок оценок в
+    обход save() (update, bulk_update). Возвращает количество записей журнала.
+    """
+    submitted = (
+        LessonTask.objects
+        .filter(submitted_at__isnull=False, score__isnull=False)
+        .values_list('student_id', 'lesson_id', 'student__current_group_id', 'score', 'submitted_at')
+    )
+    entries = [
+        GradebookEntry(student_id=student_id, lesson_id=lesson_id, group_id=group_id,
+                       score=score, submitted_at=submitted_at)
+        for student_id, lesson_id, group_id, score, submitted_at in submitted.iterator()
+    ]
+
+    with transaction.atomic():
+        GradebookEntry.objects.all().delete()
+        GradebookEntry.objects.bulk_create(entries, batch_size=500)
+        refresh_rollups()
+        refresh_lesson_stats()
+
+    return len(entries)
+
+
+def regrade_lesson(lesson, checker=default_checker, chunk_size=500, dry_run=False):
+    """
+    Перепроверить все сданные работы урока одним проходом.
+
+    Работы читаются потоком (iterator), проверяются общим checker,
+    изменившиеся оценки пишутся пачками через bulk_update, ответы по
+    заданиям (TaskAttempt) переписываются целиком; журнал и итоги
+    затронутых учеников и групп пересчитываются в конце.
+    checker - набор правил, например grading.get_checker('equivalent_sums').
+    Возвращает (проверено работ, изменилось оценок).
+    """
+    submitted = (
+        LessonTask.objects
+        .filter(lesson=lesson, submitted_at__isnull=False, score__isnull=False)
+        .only('id', 'lesson_id', 'student_id', 'tasks_data', 'generator', 'generator_version', 'seed',
+              'answers', 'score', 'correct_count')
+    )
+
+    checked = 0
+    changed_scores = {}
+    with transaction.atomic():
+        group_ids = dict(GradebookEntry.objects.filter(lesson=lesson).values_list('student_id', 'group_id'))
+        if not dry_run:
+            TaskAttempt.objects.filter(lesson=lesson, lesson_task__score__isnull=False).delete()
+
+        pending = []
+        attempts = []
+        for lesson_task in submitted.iterator(chunk_size=chunk_size):
+            checked += 1
+            tasks = lesson_task.get_tasks()
+            result = checker.grade(tasks, lesson_task.answers or {})
+            if not dry_run:
+                attempts.extend(TaskAttempt.build(lesson_task, tasks, result.items,
+                                                  group_ids.get(lesson_task.student_id)))
+                if len(attempts) >= chunk_size:
+                    TaskAttempt.objects.bulk_create(attempts)
+                    attempts = []
+            if (result.score, result.correct_count) == (lesson_task.score, lesson_task.correct_count):
+                continue
+            lesson_task.score = result.score
+            lesson_task.correct_count = result.correct_count
+            changed_scores[lesson_task.student_id] = result.score
+            pending.append(lesson_task)
+            if len(pending) >= chunk_size:
+                if not dry_run:
+                    LessonTask.objects.bulk_update(pending, ['score', 'correct_count'])
+                pending = []
+        if pending and not dry_run:
+            LessonTask.objects.bulk_update(pending, ['score', 'correct_count'])
+        if attempts:
+            TaskAttempt.objects.bulk_create(attempts)
+
+        if changed_scores and not dry_run:
+            entries = list(GradebookEntry.objects.filter(lesson=lesson, student_id__in=changed_scores))
+            for entry in entries:
+                entry.score = changed_scores[entry.student_id]
+            GradebookEntry.objects.bulk_update(entries, ['score'], batch_size=chunk_size)
+            refresh_rollups(
+                student_ids=set(changed_scores),
+                group_ids={entry.group_id for entry in entries if entry.group_id is not None},
+            )
+            refresh_lesson_stats([lesson.pk])
+
+    if changed_scores and not dry_run:
+        invalidate_all_lessons()
+    return checked, len(changed_scores)
+
+
+def task_type_accuracy(lesson, group_ids=None):
+    """
+    Доля верных ответов по типам заданий урока в разрезе групп.
+
+    Один агрегирующий запрос по индексу (lesson, group, task_type).
+    Возвращает список {'group_id', 'group__number', 'task_type', 'attempts', 'correct', 'accuracy'}.
+    """
+    attempts = TaskAttempt.objects.filter(lesson=lesson)
+    if group_ids is not None:
+        attempts = attempts.filter(group_id__in=group_ids)
+    rows = (
+        attempts
+        .values('group_id', 'group__number', 'task_type')
+        .annotate(attempts=Count('id'), correct=Count('id', filter=Q(is_correct=True)))
+        .order_by('group__number', 'task_type')
+    )
+    return [
+        dict(row, accuracy=round(row['correct'] / row['attempts'] * 100, 1))
+        for row in rows
+    ]
@@ -0,0 +1,134 @@
+"""Проверка ответов и выставление оценки по 7-балльной шкале"""
+import re
+from collections import namedtuple
+from fractions import Fraction
+from functools import lru_cache
+
+# Нижние границы процента набранных баллов для оценок 7..2, ниже - 1
+SCORE_THRESHOLDS = ((95, 7), (85, 6), (75, 5), (65, 4), (50, 3), (35, 2))
+
+MIXED_RE = re.compile(r'^(\d+)\s+(\d+)\s*/\s*(\d+)$')
+FRACTION_RE = re.compile(r'^(-?\d+)\s*/\s*(-?\d+)$')
+INTEGER_RE = re.compile(r'^-?\d+$')
+SPACES_RE = re.compile(r'\s+')
+
+GradeResult = namedtuple('GradeResult', ['score', 'correct_count', 'earned_points', 'total_points', 'items'])
+
+
+def score_for_points(earned_points, total_points):
+    percentage = (earned_points / total_points) * 100 if total_points > 0 else 0
+    for threshold, score in SCORE_THRESHOLDS:
+        if percentage >= threshold:
+            return score
+    return 1
+
+
+@lru_cache(maxsize=8192)
+def normalize_answer(text):
+    """
+    Каноническая форма ответа для сравнения кортежей.
+
+    '2 3/5' -> ('mixed', 2, 3, 5), '7 / 4' -> ('frac', 7, 4), '3' -> ('int', 3),
+    остальное (знаки сравнения, proper/improper) - ('text', строка без
+    пробелов в нижнем регистре). Дробь не сокращается: форма записи
+    ответа тоже проверяется.
+    """
+    text = (text or '').strip().lower()
+    match = MIXED_RE.match(text)
+    if match:
+        return ('mixed',) + tuple(int(part) for part in match.groups())
+    match = FRACTION_RE.match(text)
+    if match:
+        return ('frac',) + tuple(int(part) for part in match.groups())
+    if INTEGER_RE.match(text):
+        return ('int', int(text))
+    return ('text', SPACES_RE.sub('', text))
+
+
+def with_answer_keys(tasks):
+    """Добавить к сгенерированным заданиям готовый ключ ответа (task['key'])"""
+    for task in tasks:
+        task['key'] = list(normalize_answer(task['answer']))
+    return tasks
+
+
+def answer_key(task):
+    """Ключ правильного ответа: сохранённый при генерации или вычисленный для старых заданий"""
+    key = task.get('key')
+    if key is not None:
+        return tuple(key)
+    return normalize_answer(task['answer'])
+
+
+class AnswerChecker:
+    """
+    Проверка наборов ответов сравнением канонических ключей.
+
+    rules - необязательные правила по типу задания вида
+    rule(ключ ответа ученика, ключ правильного ответа) -> bool, например,
+    чтобы засчитывать эквивалентные дроби. Один экземпляр можно
+    переиспользовать для тысяч работ (перепроверка).
+    """
+
+    def __init__(self, rules=None):
+        self.rules = dict(rules or {})
+
+    def is_correct(self, task, user_answer):
+        user_key = normalize_answer(user_answer)
+        rule = self.rules.get(task.get('type'))
+        if rule is None:
+            return user_key == answer_key(task)
+        return rule(user_key, answer_key(task))
+
+    def grade(self, tasks, submitted_answers):
+        """Оценка за набор ответов {'0': '...', '1': '...'}"""
+        correct = earned_points = total_points = 0
+        items = []
+        for i, task in enumerate(tasks):
+            task_points = task.get('points', 1)
+            total_points += task_points
+            is_correct = self.is_correct(task, submitted_answers.get(str(i), ''))
+            if is_correct:
+                correct += 1
+                earned_points += task_points
+            items.append(is_correct)
+        return GradeResult(
+            score=score_for_points(earned_points, total_points),
+            correct_count=correct,
+            earned_points=earned_points,
+            total_points=total_points,
+            items=items,
+        )
+
+
+default_checker = AnswerChecker()
+
+
+def key_value(key):
+    """Число, записанное ключом ответа ('int', 'frac', 'mixed'), или None"""
+    kind = key[0]
+    if kind == 'int':
+        return Fraction(key[1])
+    if kind == 'frac' and key[2]:
+        return Fraction(key[1], key[2])
+    if kind == 'mixed' and key[3]:
+        return key[1] + Fraction(key[2], key[3])
+    return None
+
+
+def equivalent_value(user_key, correct_key):
+    """Правило: засчитать любую запись того же числа (10/12 вместо 5/6)"""
+    user_value = key_value(user_key)
+    return user_value is not None and user_value == key_value(correct_key)
+
+
+# Именованные наборы правил для перепроверки (manage.py regrade_lesson --rules).
+# В сложении и вычитании проверяется результат, а не сокращение дроби
+RULE_SETS = {
+    'default': {},
+    'equivalent_sums': {'add_diff_denom': equivalent_value, 'sub_diff_denom': equivalent_value},
+}
+
+
+def get_checker(rule_set='default'):
+    return AnswerChecker(RULE_SETS[rule_set])
@@ -0,0 +1,120 @@
+"""
+Очередь проверки сданных работ.
+
+Отправка формы записывает ответы одним UPDATE (submitted_at
+проставлен, score пуст - работа ждёт проверки). Оценку выставляет тот
+же запрос, а при ASYNC_GRADING - пул фоновых потоков после коммита.
+Очередью служит сама таблица LessonTask: работы, потерянные при
+перезапуске процесса или упавшие при проверке, подбирает команда
+process_grading_queue или lesson_result, если проверка затянулась
+дольше GRADING_STALE_SECONDS.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .dashboard import invalidate_student_lessons
+from .models import LessonTask
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.GRADING_WORKERS, thread_name_prefix='grading'
+            )
+        return _executor
+
+
+def pending_submissions(older_than=None):
+    """Сданные, но ещё не проверенные работы"""
+    pending = LessonTask.objects.filter(submitted_at__isnull=False, score__isnull=True)
+    if older_than is not None:
+        pending = pending.filter(submitted_at__lte=timezone.now() - older_than)
+    return pending
+
+
+def is_stale(lesson_task):
+    """Работа ждёт проверки дольше GRADING_STALE_SECONDS (задача в пуле потеряна)"""
+    stale_after = timedelta(seconds=settings.GRADING_STALE_SECONDS)
+    return lesson_task.score is None and lesson_task.submitted_at <= timezone.now() - stale_after
+
+
+def submit_answers(lesson_task, answers):
+    """
+    Принять ответы ученика: один UPDATE без проверки.
+
+    Возвращает False, если работа уже была сдана. При ASYNC_GRADING
+    проверка ставится в пул после коммита, иначе выполняется сразу.
+    """
+    submitted_at = timezone.now()
+    updated = LessonTask.objects.filter(pk=lesson_task.pk, submitted_at__isnull=True).update(
+        answers=answers, submitted_at=submitted_at, score=None
+    )
+    if not updated:
+        return False
+    lesson_task.answers = answers
+    lesson_task.submitted_at = submitted_at
+    lesson_task.score = None
+    # update() не вызывает сигналы - сбрасываем кэш главной страницы сами
+    invalidate_student_lessons(lesson_task.student_id)
+
+    if settings.ASYNC_GRADING:
+        pk = lesson_task.pk
+        transaction.on_commit(lambda: get_executor().submit(_grade_in_worker, pk))
+    else:
+        try:
+            lesson_task.score = grade_submission(lesson_task.pk)
+        except Exception:
+            # Ответы уже сохранены - работа остаётся в очереди
+            logger.exception('Не удалось проверить работу %s', lesson_task.pk)
+    return True
+
+
+def grade_submission(pk):
+    """
+    Проверить одну ожидающую работу. Повторный вызов безопасен:
+    уже оценённая работа пропускается. Возвращает оценку или None.
+    """
+    with transaction.atomic():
+        lesson_task = (
+            pending_submissions()
+            .select_for_update()
+            .select_related('lesson', 'student')
+            .filter(pk=pk)
+            .first()
+        )
+        if lesson_task is None:
+            return None
+        return lesson_task.check_answers(lesson_task.answers or {})
+
+
+def _grade_in_worker(pk):
+    close_old_connections()
+    try:
+        grade_submission(pk)
+    except Exception:
+        logger.exception('Не удалось проверить работу %s', pk)
+    finally:
+        # У потоков пула собственные соединения - не оставляем их открытыми
+        connection.close()
+
+
+def process_pending(older_than=None):
+    """Проверить все ожидающие работы в текущем процессе; возвращает их число"""
+    graded = 0
+    for pk in pending_submissions(older_than).values_list('pk', flat=True).iterator():
+        if grade_submission(pk) is not None:
+            graded += 1
+    return graded
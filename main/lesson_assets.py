@@ -0,0 +1,107 @@
+"""
+Сборка теории уроков: встроенные <style> и <script> выносятся в файлы.
+
+Каждый блок записывается в LESSON_ASSETS_ROOT под именем из хэша
+содержимого (css/<хэш>.css, js/<хэш>.js) со сжатыми копиями и заменяется
+ссылкой на него. Собранный HTML хранится в Lesson.theory_built вместе с
+хэшем исходника, по которому собран; при изменении теории урок
+показывает исходник, пока сборку не повторят.
+"""
+import hashlib
+import os
+import re
+
+from django.conf import settings
+
+from .models import Lesson
+from .static_serving import precompress
+
+STYLE_RE = re.compile(r'<style(?P<attrs>[^>]*)>(?P<body>.*?)</style>', re.IGNORECASE | re.DOTALL)
+SCRIPT_RE = re.compile(r'<script(?P<attrs>[^>]*)>(?P<body>.*?)</script>', re.IGNORECASE | re.DOTALL)
+TYPE_RE = re.compile(r'\btype\s*=\s*["\']?([^"\'\s>]+)', re.IGNORECASE)
+SRC_RE = re.compile(r'\bsrc\s*=', re.IGNORECASE)
+
+# Типы скриптов, которые браузер исполняет как JavaScript
+SCRIPT_TYPES = {'', 'text/javascript', 'application/javascript', 'module'}
+STYLE_TYPES = {'', 'text/css'}
+
+
+def asset_name(kind, content):
+    digest = hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+    return f'{kind}/{digest}.{kind}'
+
+
+def write_asset(kind, content):
+    """
+    Записать блок в файл с хэшем в имени и сжатыми копиями.
+
+    Файл с таким именем уже содержит то же самое - повторно не пишется.
+    Возвращает относительный путь.
+    """
+    name = asset_name(kind, content)
+    path = os.path.join(settings.LESSON_ASSETS_ROOT, name)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Запись через временный файл: параллельный запрос не увидит половину
+        tmp_path = f'{path}.tmp{os.getpid()}'
+        with open(tmp_path, 'w', encoding='utf-8') as asset_file:
+            asset_file.write(content)
+        os.replace(tmp_path, path)
+        precompress(path)
+    return name
+
+
+def _block_type(attrs):
+    match = TYPE_RE.search(attrs)
+    return match.group(1).lower() if match else ''
+
+
+def extract_assets(html):
+    """
+    Вынести встроенные стили и скрипты в файлы.
+
+    Скрипты с src, пустые блоки и данные (type="application/json",
+    шаблоны) остаются на месте. Возвращает собранный HTML и список
+    записанных файлов.
+    """
+    names = []
+    url = settings.LESSON_ASSETS_URL
+
+    def replace_style(match):
+        attrs, body = match.group('attrs'), match.group('body')
+        if not body.strip() or _block_type(attrs) not in STYLE_TYPES:
+            return match.group(0)
+        name = write_asset('css', body)
+        names.append(name)
+        attrs = TYPE_RE.sub('', attrs).rstrip()
+        return f'<link rel="stylesheet" href="{url}{name}"{attrs}>'
+
+    def replace_script(match):
+        attrs, body = match.group('attrs'), match.group('body')
+        if SRC_RE.search(attrs) or not body.strip() or _block_type(attrs) not in SCRIPT_TYPES:
+            return match.group(0)
+        name = write_asset('js', body)
+        names.append(name)
+        # Без async/defer внешний скрипт исполняется на том же месте, что и встроенный
+        return f'<script src="{url}{name}"{attrs.rstrip()}></script>'
+
+    html = STYLE_RE.sub(replace_style, html)
+    html = SCRIPT_RE.sub(replace_script, html)
+    return html, names
+
+
+def build_lesson(lesson, force=False):
+    """
+    Собрать теорию урока; возвращает список файлов или None, если сборка актуальна.
+
+    Собранный HTML пишется через update(): сигналы Lesson не нужны,
+    ключ кэша фрагмента включает theory_built_from.
+    """
+    if not force and lesson.is_theory_built:
+        return None
+    content = Lesson.objects.filter(pk=lesson.pk).values_list('theory_content', flat=True).get()
+    theory_hash = Lesson.content_hash(content)
+    built, names = extract_assets(content)
+    Lesson.objects.filter(pk=lesson.pk).update(theory_built=built, theory_built_from=theory_hash,
+                                              theory_hash=theory_hash)
+    return names
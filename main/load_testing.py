@@ -0,0 +1,156 @@
+"""
+Нагрузочный прогон страниц через тестовый клиент Django.
+
+Каждая сессия (ученик или преподаватель) идёт в своём потоке со своим
+клиентом и своим соединением с БД и несколько раз проходит сценарий
+страниц. Для каждого запроса замеряются время и число SQL-запросов;
+отчёт - словарь, готовый для json.dumps, чтобы сравнивать релизы.
+"""
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import LessonTask, Teacher
+from .synthetic import SYNTHETIC_PREFIX
+
+TEACHER_PAGES = ['students', 'statistics', 'stats_overview', 'stats_analytics']
+PERCENTILES = (50, 95, 99)
+
+
+def _client_host():
+    hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+    return hosts[0] if hosts else 'testserver'
+
+
+def _student_sessions(count, rng):
+    """Сценарии учеников: главная, открытый урок, результат сданного урока"""
+    user_ids = list(
+        User.objects
+        .filter(username__startswith=SYNTHETIC_PREFIX, student__isnull=False)
+        .values_list('id', flat=True)
+    )
+    user_ids = rng.sample(user_ids, min(count, len(user_ids)))
+    rows = (
+        LessonTask.objects
+        .filter(student__user_id__in=user_ids, lesson__is_active=True)
+        .values_list('student__user_id', 'lesson__date', 'submitted_at')
+    )
+    open_lessons, submitted_lessons = {}, {}
+    for user_id, lesson_date, submitted_at in rows:
+        target = submitted_lessons if submitted_at else open_lessons
+        target.setdefault(user_id, lesson_date)
+
+    sessions = []
+    for user_id in user_ids:
+        pages = [('home', reverse('home'))]
+        if user_id in open_lessons:
+            pages.append(('lesson_view', reverse('lesson_view', args=[open_lessons[user_id]])))
+        if user_id in submitted_lessons:
+            pages.append(('lesson_result', reverse('lesson_result', args=[submitted_lessons[user_id]])))
+        sessions.append({'role': 'student', 'user_id': user_id, 'pages': pages,
+                         'submit': open_lessons.get(user_id)})
+    return sessions
+
+
+def _teacher_sessions(count):
+    user_ids = list(Teacher.objects.order_by('id').values_list('user_id', flat=True)[:count])
+    pages = [(name, reverse(name)) for name in TEACHER_PAGES]
+    return [{'role': 'teacher', 'user_id': user_id, 'pages': pages, 'submit': None} for user_id in user_ids]
+
+
+def _timed_request(client, name, method, url, data=None):
+    with CaptureQueriesContext(connection) as context:
+        started = time.perf_counter()
+        response = getattr(client, method)(url, data, secure=not settings.DEBUG)
+        elapsed = time.perf_counter() - started
+    return {
+        'endpoint': name,
+        'seconds': elapsed,
+        'queries': len(context),
+        'error': response.status_code >= 400,
+    }
+
+
+def _run_session(session, iterations, submit):
+    """Один пользователь: вход и iterations проходов по своим страницам"""
+    samples = []
+    try:
+        client = Client(HTTP_HOST=_client_host())
+        client.force_login(User.objects.get(pk=session['user_id']))
+        for _ in range(iterations):
+            for name, url in session['pages']:
+                samples.append(_timed_request(client, name, 'get', url))
+        if submit and session['submit']:
+            # Сдача работы пишет в базу - включается только явно
+            url = reverse('lesson_view', args=[session['submit']])
+            samples.append(_timed_request(client, 'lesson_submit', 'post', url, {'answer_0': '1/2'}))
+    finally:
+        connection.close()
+    return samples
+
+
+def _summary(samples):
+    seconds = np.array([sample['seconds'] for sample in samples]) * 1000
+    queries = np.array([sample['queries'] for sample in samples])
+    summary = {'requests': len(samples), 'errors': sum(sample['error'] for sample in samples)}
+    summary.update({
+        f'p{p}_ms': round(float(value), 2)
+        for p, value in zip(PERCENTILES, np.percentile(seconds, PERCENTILES))
+    })
+    summary['max_ms'] = round(float(seconds.max()), 2)
+    summary['mean_queries'] = round(float(queries.mean()), 2)
+    summary['max_queries'] = int(queries.max())
+    return summary
+
+
+def run_load_test(students=20, teachers=2, iterations=5, concurrency=8, submit=False, seed=None):
+    """
+    Прогнать сессии синтетических учеников и преподавателей параллельно.
+
+    Возвращает отчёт: общие перцентили задержки, пропускную способность,
+    число запросов к БД на запрос и те же показатели по каждой странице.
+    """
+    rng = random.Random(seed)
+    sessions = _student_sessions(students, rng) + _teacher_sessions(teachers)
+    rng.shuffle(sessions)
+
+    started_at = datetime.now().isoformat(timespec='seconds')
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda session: _run_session(session, iterations, submit), sessions))
+    duration = time.perf_counter() - started
+
+    samples = [sample for session_samples in results for sample in session_samples]
+    report = {
+        'started_at': started_at,
+        'config': {
+            'student_sessions': sum(session['role'] == 'student' for session in sessions),
+            'teacher_sessions': sum(session['role'] == 'teacher' for session in sessions),
+            'iterations': iterations,
+            'concurrency': concurrency,
+            'submit': submit,
+            'database': settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1],
+        },
+        'duration_seconds': round(duration, 3),
+        'throughput_rps': round(len(samples) / duration, 2) if duration else None,
+    }
+    if not samples:
+        report['overall'] = None
+        report['endpoints'] = {}
+        return report
+
+    report['overall'] = _summary(samples)
+    by_endpoint = {}
+    for sample in samples:
+        by_endpoint.setdefault(sample['endpoint'], []).append(sample)
+    report['endpoints'] = {name: _summary(rows) for name, rows in sorted(by_endpoint.items())}
+    return report
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.lesson_assets import build_lesson
+from main.models import Lesson
+
+
+class Command(BaseCommand):
+    help = 'Вынести встроенные стили и скрипты теории уроков в файлы с хэшем и сжатыми копиями'
+
+    def add_arguments(self, parser):
+        parser.add_argument('lesson_dates', nargs='*', help='Даты уроков, YYYY-MM-DD; по умолчанию - все уроки')
+        parser.add_argument('--force', action='store_true', help='Пересобрать даже актуальные уроки')
+
+    def handle(self, *args, lesson_dates, force=False, **options):
+        lessons = Lesson.objects.defer('theory_content', 'theory_built').order_by('date')
+        if lesson_dates:
+            lessons = lessons.filter(date__in=lesson_dates)
+            if not lessons:
+                raise CommandError('Уроки на указанные даты не найдены')
+
+        built = 0
+        for lesson in lessons:
+            names = build_lesson(lesson, force=force)
+            if names is None:
+                continue
+            built += 1
+            self.stdout.write(f'{lesson}: файлов {len(names)}')
+        self.stdout.write(self.style.SUCCESS(f'Собрано уроков: {built}'))
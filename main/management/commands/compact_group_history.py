@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.models import GroupHistory, SnapshotDate
+from main.signals import deferred_history_updates
+from main.timeline import find_redundant_history
+
+CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Сжать историю групп: оставить только записи, где группа ученика меняется'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать лишние записи')
+
+    def handle(self, *args, dry_run=False, **options):
+        total = GroupHistory.objects.count()
+        redundant = find_redundant_history()
+        self.stdout.write(f'Записей в истории: {total}, лишних: {len(redundant)}')
+        if dry_run or not redundant:
+            return
+
+        with transaction.atomic(), deferred_history_updates():
+            # Даты срезов сохраняем до удаления - по ним восстанавливаются линии статистики
+            dates = GroupHistory.objects.values_list('transfer_date', flat=True).distinct()
+            SnapshotDate.objects.bulk_create(
+                [SnapshotDate(date=snapshot) for snapshot in dates], ignore_conflicts=True
+            )
+            for start in range(0, len(redundant), CHUNK_SIZE):
+                GroupHistory.objects.filter(pk__in=redundant[start:start + CHUNK_SIZE]).delete()
+
+        self.stdout.write(self.style.SUCCESS(f'Осталось записей: {GroupHistory.objects.count()}'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.synthetic import clear_synthetic_school, generate_synthetic_school, has_real_data
+
+
+class Command(BaseCommand):
+    help = 'Создать синтетическую школу (ученики, история групп, уроки, сданные работы) для нагрузочных тестов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=500)
+        parser.add_argument('--lessons', type=int, default=10)
+        parser.add_argument('--submitted-share', type=float, default=0.85,
+                            help='Доля учеников, сдавших каждый урок')
+        parser.add_argument('--seed', type=int, default=None, help='Seed для воспроизводимых данных')
+        parser.add_argument('--clear', action='store_true',
+                            help='Сначала удалить ранее созданные синтетические данные')
+        parser.add_argument('--active-lessons', action='store_true',
+                            help='Создать уроки активными (для load_test); только в базе без настоящих данных')
+
+    def handle(self, *args, students, lessons, submitted_share, seed, clear, active_lessons, **options):
+        if active_lessons and has_real_data():
+            raise CommandError('В базе есть настоящие ученики или уроки: активные синтетические уроки '
+                               'появились бы у них. Запустите без --active-lessons или на отдельной базе')
+
+        if clear:
+            deleted = clear_synthetic_school()
+            self.stdout.write(f'Удалено синтетических объектов: {deleted}')
+
+        created = generate_synthetic_school(students, lessons, submitted_share, seed, active_lessons)
+        self.stdout.write(self.style.SUCCESS(
+            f"Учеников: {created['students']}, записей истории: {created['history']}, "
+            f"уроков: {created['lessons']}, заданий: {created['tasks']}, сдано: {created['submitted']}"
+        ))
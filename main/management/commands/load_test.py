@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.load_testing import run_load_test
+from main.models import Lesson
+from main.synthetic import LESSON_TITLE_PREFIX
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон страниц сессиями синтетических учеников и преподавателей; отчёт в JSON. '
+            'Нужна школа из generate_synthetic_school --active-lessons')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=20, help='Число сессий учеников')
+        parser.add_argument('--teachers', type=int, default=2, help='Число сессий преподавателей')
+        parser.add_argument('--iterations', type=int, default=5, help='Проходов по страницам в каждой сессии')
+        parser.add_argument('--concurrency', type=int, default=8, help='Одновременных сессий')
+        parser.add_argument('--submit', action='store_true',
+                            help='Ученики сдают открытый урок (пишет в базу)')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--output', help='Файл для отчёта; по умолчанию - stdout')
+
+    def handle(self, *args, students, teachers, iterations, concurrency, submit, seed, output, **options):
+        if not Lesson.objects.filter(title__startswith=LESSON_TITLE_PREFIX, is_active=True).exists():
+            raise CommandError('Нет активных синтетических уроков: '
+                               'создайте их командой generate_synthetic_school --active-lessons')
+        report = run_load_test(students, teachers, iterations, concurrency, submit, seed)
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if output:
+            with open(output, 'w', encoding='utf-8') as report_file:
+                report_file.write(text)
+            overall = report['overall'] or {}
+            self.stdout.write(self.style.SUCCESS(
+                f"{overall.get('requests', 0)} запросов, p95 {overall.get('p95_ms')} мс, "
+                f"{report['throughput_rps']} запр/с -> {output}"
+            ))
+        else:
+            self.stdout.write(text)
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from main.grading_queue import process_pending
+
+
+class Command(BaseCommand):
+    help = 'Проверить сданные работы, которые ещё ждут оценки'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=0,
+            help='Только работы, ожидающие дольше указанного числа секунд'
+        )
+
+    def handle(self, *args, older_than, **options):
+        graded = process_pending(timedelta(seconds=older_than) if older_than else None)
+        self.stdout.write(self.style.SUCCESS(f'Проверено работ: {graded}'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import Group, Lesson, LessonTask
+
+
+class Command(BaseCommand):
+    help = 'Заранее создать задания урока для всех учеников (до начала занятия)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('lesson_date', help='Дата урока, YYYY-MM-DD')
+        parser.add_argument('--group', action='append', type=float, dest='groups',
+                            help='Номер группы (можно указать несколько раз); по умолчанию - все группы')
+
+    def handle(self, *args, lesson_date, groups=None, **options):
+        lesson = Lesson.objects.filter(date=lesson_date).first()
+        if lesson is None:
+            raise CommandError(f'Урок на дату {lesson_date} не найден')
+
+        group_ids = None
+        if groups:
+            group_ids = list(Group.objects.filter(number__in=groups).values_list('id', flat=True))
+            if not group_ids:
+                raise CommandError('Указанные группы не найдены')
+
+        created = LessonTask.provision(lesson, group_ids)
+        self.stdout.write(self.style.SUCCESS(f'{lesson}: создано заданий {created}'))
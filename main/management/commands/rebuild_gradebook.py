@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from main.gradebook import rebuild_gradebook_summary
+
+
+class Command(BaseCommand):
+    help = 'Пересобрать журнал оценок и итоги учеников/групп из LessonTask'
+
+    def handle(self, *args, **options):
+        count = rebuild_gradebook_summary()
+        self.stdout.write(self.style.SUCCESS(f'Записей в журнале: {count}'))
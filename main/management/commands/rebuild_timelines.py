@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from main.models import StudentTimeline
+from main.timeline import refresh_all_timelines
+
+
+class Command(BaseCommand):
+    help = 'Пересобрать линии истории групп для страницы статистики'
+
+    def handle(self, *args, **options):
+        refresh_all_timelines()
+        self.stdout.write(self.style.SUCCESS(f'Линий учеников: {StudentTimeline.objects.count()}'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.gradebook import regrade_lesson
+from main.grading import RULE_SETS, get_checker
+from main.models import Lesson
+
+
+class Command(BaseCommand):
+    help = 'Перепроверить все сданные работы урока по выбранному набору правил проверки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('lesson_date', help='Дата урока, YYYY-MM-DD')
+        parser.add_argument('--rules', choices=sorted(RULE_SETS), default='default',
+                            help='Набор правил из grading.RULE_SETS')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать изменения, ничего не записывать')
+
+    def handle(self, *args, lesson_date, rules, chunk_size, dry_run, **options):
+        lesson = Lesson.objects.filter(date=lesson_date).first()
+        if lesson is None:
+            raise CommandError(f'Урок на дату {lesson_date} не найден')
+
+        checked, changed = regrade_lesson(lesson, checker=get_checker(rules), chunk_size=chunk_size,
+                                          dry_run=dry_run)
+        prefix = '[dry-run] ' if dry_run else ''
+        self.stdout.write(self.style.SUCCESS(f'{prefix}{lesson}: проверено {checked}, изменилось оценок {changed}'))
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.9
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def fill_gradebook(apps, schema_editor):
+    """Заполнить журнал и итоги по уже сданным тестам"""
+    LessonTask = apps.get_model('main', 'LessonTask')
+    GradebookEntry = apps.get_model('main', 'GradebookEntry')
+    StudentProgress = apps.get_model('main', 'StudentProgress')
+    GroupProgress = apps.get_model('main', 'GroupProgress')
+
+    submitted = (
+        LessonTask.objects
+        .filter(submitted_at__isnull=False, score__isnull=False)
+        .values_list('student_id', 'lesson_id', 'student__current_group_id', 'score', 'submitted_at')
+    )
+    GradebookEntry.objects.bulk_create([
+        GradebookEntry(student_id=student_id, lesson_id=lesson_id, group_id=group_id,
+                       score=score, submitted_at=submitted_at)
+        for student_id, lesson_id, group_id, score, submitted_at in submitted.iterator()
+    ], batch_size=500)
+
+    for model, field in ((StudentProgress, 'student_id'), (GroupProgress, 'group_id')):
+        totals = (
+            GradebookEntry.objects
+            .filter(**{f'{field}__isnull': False})
+            .values(field)
+            .annotate(count=Count('id'), total=Sum('score'), last=Max('submitted_at'))
+        )
+        model.objects.bulk_create([
+            model(pk=row[field], completed_count=row['count'], score_sum=row['total'],
+                  last_submitted_at=row['last'])
+            for row in totals
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_remove_student_is_registered_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupProgress',
+            fields=[
+                ('completed_count', models.IntegerField(default=0, verbose_name='Сдано тестов')),
+                ('score_sum', models.IntegerField(default=0, verbose_name='Сумма оценок')),
+                ('last_submitted_at', models.DateTimeField(blank=True, null=True, verbose_name='Последняя сдача')),
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='progress', serialize=False, to='main.group', verbose_name='Группа')),
+            ],
+            options={
+                'verbose_name': 'Итоги группы',
+                'verbose_name_plural': 'Итоги групп',
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentProgress',
+            fields=[
+                ('completed_count', models.IntegerField(default=0, verbose_name='Сдано тестов')),
+                ('score_sum', models.IntegerField(default=0, verbose_name='Сумма оценок')),
+                ('last_submitted_at', models.DateTimeField(blank=True, null=True, verbose_name='Последняя сдача')),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='progress', serialize=False, to='main.student', verbose_name='Ученик')),
+            ],
+            options={
+                'verbose_name': 'Итоги ученика',
+                'verbose_name_plural': 'Итоги учеников',
+            },
+        ),
+        migrations.CreateModel(
+            name='GradebookEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.IntegerField(blank=True, null=True, verbose_name='Оценка (0-7)')),
+                ('submitted_at', models.DateTimeField(blank=True, null=True, verbose_name='Время сдачи')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='gradebook_entries', to='main.group', verbose_name='Группа на момент сдачи')),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gradebook_entries', to='main.lesson', verbose_name='Урок')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gradebook_entries', to='main.student', verbose_name='Ученик')),
+            ],
+            options={
+                'verbose_name': 'Запись журнала',
+                'verbose_name_plural': 'Журнал оценок',
+                'unique_together': {('student', 'lesson')},
+            },
+        ),
+        migrations.RunPython(fill_gradebook, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.9
+
+import json
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Копии main.timeline на момент миграции: миграция не должна зависеть от живого кода
+
+DEFAULT_KEY_DATES = [
+    date(2025, 9, 1),
+    date(2025, 10, 15),
+    date(2025, 12, 16),
+    date(2026, 1, 12),
+]
+
+
+def build_student_history(entries, key_dates):
+    """Точки графика ученика: последняя запись не позже каждой ключевой даты"""
+    if not entries:
+        return []
+    dates = [entry_date for entry_date, _ in entries]
+    history = []
+    for key_date in key_dates:
+        position = bisect_right(dates, key_date)
+        if position == 0:
+            continue
+        history.append({
+            'date': key_date.strftime('%Y-%m-%d'),
+            'group': float(entries[position - 1][1]),
+        })
+    return history
+
+
+def fill_timelines(apps, schema_editor):
+    """Построить линии статистики по существующей истории групп"""
+    GroupHistory = apps.get_model('main', 'GroupHistory')
+    StudentTimeline = apps.get_model('main', 'StudentTimeline')
+
+    key_dates = list(
+        GroupHistory.objects.values_list('transfer_date', flat=True).distinct().order_by('transfer_date')
+    ) or list(DEFAULT_KEY_DATES)
+
+    entries = defaultdict(list)
+    names = {}
+    rows = (
+        GroupHistory.objects
+        .order_by('student_id', 'transfer_date', 'id')
+        .values_list('student_id', 'student__full_name', 'transfer_date', 'group__number')
+    )
+    for student_id, name, transfer_date, group_number in rows.iterator():
+        entries[student_id].append((transfer_date, group_number))
+        names[student_id] = name
+
+    StudentTimeline.objects.bulk_create([
+        StudentTimeline(student_id=student_id, name=names[student_id],
+                        history=json.dumps(build_student_history(student_entries, key_dates)))
+        for student_id, student_entries in entries.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_gradebook_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentTimeline',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='timeline', serialize=False, to='main.student', verbose_name='Ученик')),
+                ('name', models.CharField(max_length=200, verbose_name='ФИО')),
+                ('history', models.TextField(verbose_name='История по ключевым датам (JSON)')),
+            ],
+            options={
+                'verbose_name': 'Линия истории ученика',
+                'verbose_name_plural': 'Линии истории учеников',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
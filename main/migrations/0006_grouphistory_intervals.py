@@ -0,0 +1,43 @@
+# Generated by Django 5.2.9
+
+from django.db import migrations, models
+
+
+def fill_intervals(apps, schema_editor):
+    """valid_to каждой записи - дата следующей записи того же ученика"""
+    GroupHistory = apps.get_model('main', 'GroupHistory')
+    entries = list(
+        GroupHistory.objects
+        .order_by('student_id', 'transfer_date', 'id')
+        .only('id', 'student_id', 'transfer_date')
+    )
+    changed = []
+    for entry, following in zip(entries, entries[1:] + [None]):
+        if following is not None and following.student_id == entry.student_id:
+            entry.valid_to = following.transfer_date
+            changed.append(entry)
+    GroupHistory.objects.bulk_update(changed, ['valid_to'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_student_timeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='grouphistory',
+            name='valid_to',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Действует до'),
+        ),
+        migrations.AddIndex(
+            model_name='grouphistory',
+            index=models.Index(fields=['student', 'transfer_date', 'valid_to'], name='grouphistory_student_period'),
+        ),
+        migrations.AddIndex(
+            model_name='grouphistory',
+            index=models.Index(fields=['group', 'transfer_date', 'valid_to'], name='grouphistory_group_period'),
+        ),
+        migrations.RunPython(fill_intervals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9
+
+from django.db import migrations, models
+
+
+def fill_snapshot_dates(apps, schema_editor):
+    """Текущие даты истории становятся срезами"""
+    GroupHistory = apps.get_model('main', 'GroupHistory')
+    SnapshotDate = apps.get_model('main', 'SnapshotDate')
+    dates = GroupHistory.objects.values_list('transfer_date', flat=True).distinct()
+    SnapshotDate.objects.bulk_create([SnapshotDate(date=snapshot) for snapshot in dates])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_grouphistory_intervals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotDate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Дата среза')),
+            ],
+            options={
+                'verbose_name': 'Дата среза',
+                'verbose_name_plural': 'Даты срезов',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.RunPython(fill_snapshot_dates, migrations.RunPython.noop),
+    ]
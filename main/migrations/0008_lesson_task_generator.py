@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9
+
+import main.task_generators
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def bind_legacy_generators(apps, schema_editor):
+    """Раньше урок 2 определялся по дате 03.02.2026 или слову «сравнение» в названии"""
+    Lesson = apps.get_model('main', 'Lesson')
+    Lesson.objects.filter(
+        Q(date='2026-02-03') | Q(title__icontains='сравнение')
+    ).update(task_generator='comparison')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_snapshot_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='task_generator',
+            field=models.CharField(choices=main.task_generators.generator_choices, default='mixed_fractions', max_length=50, verbose_name='Тип заданий'),
+        ),
+        migrations.RunPython(bind_legacy_generators, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_lesson_task_generator'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lessontask',
+            name='generator',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Генератор заданий'),
+        ),
+        migrations.AddField(
+            model_name='lessontask',
+            name='generator_version',
+            field=models.PositiveSmallIntegerField(default=1, verbose_name='Версия генератора'),
+        ),
+        migrations.AddField(
+            model_name='lessontask',
+            name='seed',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Seed генератора'),
+        ),
+        migrations.AlterField(
+            model_name='lessontask',
+            name='tasks_data',
+            field=models.TextField(blank=True, verbose_name='Данные заданий (JSON)'),
+        ),
+    ]
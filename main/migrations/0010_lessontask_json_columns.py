@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Новые JSON-колонки рядом со старыми текстовыми. Столбцы nullable и без
+    значения по умолчанию - MySQL добавляет их без перестройки таблицы.
+    """
+
+    dependencies = [
+        ('main', '0009_lessontask_seed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lessontask',
+            name='tasks_json',
+            field=models.JSONField(blank=True, null=True, verbose_name='Данные заданий'),
+        ),
+        migrations.AddField(
+            model_name='lessontask',
+            name='answers_json',
+            field=models.JSONField(blank=True, null=True, verbose_name='Ответы ученика'),
+        ),
+        migrations.AddField(
+            model_name='lessontask',
+            name='has_hard_task',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='Есть сложные задания'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.9
+
+import json
+
+from django.db import migrations, transaction
+
+CHUNK_SIZE = 500
+
+# Генераторы (ключ, версия), которые на момент миграции всегда добавляли одно задание
+# повышенной сложности; у mixed_fractions их нет. Компактные записи (только seed)
+# размечаются по этому списку, без вызова живых генераторов
+HARD_TASK_GENERATORS = {('comparison', 1), ('add_sub', 1)}
+
+
+def has_hard_task(tasks):
+    return any(task.get('difficulty') == 'hard' for task in tasks)
+
+
+def fill_json_columns(apps, schema_editor):
+    """
+    Перенести tasks_data/answers в JSON-колонки пачками по CHUNK_SIZE.
+
+    Каждая пачка - отдельная короткая транзакция, так что таблица надолго
+    не блокируется. Обрабатываются только строки с пустым tasks_json:
+    прерванную миграцию можно просто запустить снова.
+    """
+    LessonTask = apps.get_model('main', 'LessonTask')
+    pending = (
+        LessonTask.objects
+        .filter(tasks_json__isnull=True)
+        .order_by('pk')
+        .only('id', 'tasks_data', 'answers', 'generator', 'generator_version', 'seed')
+    )
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            chunk = list(pending.filter(pk__gt=last_pk)[:CHUNK_SIZE])
+            if not chunk:
+                break
+            for lesson_task in chunk:
+                tasks = json.loads(lesson_task.tasks_data) if lesson_task.tasks_data else []
+                lesson_task.tasks_json = tasks
+                lesson_task.answers_json = json.loads(lesson_task.answers) if lesson_task.answers else None
+                if not tasks and lesson_task.seed is not None:
+                    # Компактная запись: признак определяется генератором набора
+                    lesson_task.has_hard_task = (
+                        (lesson_task.generator, lesson_task.generator_version) in HARD_TASK_GENERATORS
+                    )
+                else:
+                    lesson_task.has_hard_task = has_hard_task(tasks)
+            LessonTask.objects.bulk_update(chunk, ['tasks_json', 'answers_json', 'has_hard_task'])
+        last_pk = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('main', '0010_lessontask_json_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_json_columns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.9
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_fill_lessontask_json'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='lessontask',
+            name='tasks_data',
+        ),
+        migrations.RemoveField(
+            model_name='lessontask',
+            name='answers',
+        ),
+        migrations.RenameField(
+            model_name='lessontask',
+            old_name='tasks_json',
+            new_name='tasks_data',
+        ),
+        migrations.RenameField(
+            model_name='lessontask',
+            old_name='answers_json',
+            new_name='answers',
+        ),
+        migrations.AlterField(
+            model_name='lessontask',
+            name='tasks_data',
+            field=models.JSONField(blank=True, default=list, verbose_name='Данные заданий'),
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.2.9
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CHUNK_SIZE = 500
+
+# Копия правил проверки main.grading на момент миграции: последующие правки
+# правил не должны менять ответы, записанные для старых работ
+
+MIXED_RE = re.compile(r'^(\d+)\s+(\d+)\s*/\s*(\d+)$')
+FRACTION_RE = re.compile(r'^(-?\d+)\s*/\s*(-?\d+)$')
+INTEGER_RE = re.compile(r'^-?\d+$')
+SPACES_RE = re.compile(r'\s+')
+
+
+def normalize_answer(text):
+    text = (text or '').strip().lower()
+    match = MIXED_RE.match(text)
+    if match:
+        return ('mixed',) + tuple(int(part) for part in match.groups())
+    match = FRACTION_RE.match(text)
+    if match:
+        return ('frac',) + tuple(int(part) for part in match.groups())
+    if INTEGER_RE.match(text):
+        return ('int', int(text))
+    return ('text', SPACES_RE.sub('', text))
+
+
+def answer_key(task):
+    key = task.get('key')
+    if key is not None:
+        return tuple(key)
+    return normalize_answer(task['answer'])
+
+
+def fill_attempts(apps, schema_editor):
+    """
+    Строки TaskAttempt для уже проверенных работ по правилам на момент миграции.
+
+    Компактные работы (только seed) пропускаются: набор восстанавливается
+    лишь живым генератором. Их результат lesson_result проверяет на лету,
+    строки TaskAttempt создаёт manage.py regrade_lesson.
+    """
+    LessonTask = apps.get_model('main', 'LessonTask')
+    GradebookEntry = apps.get_model('main', 'GradebookEntry')
+    TaskAttempt = apps.get_model('main', 'TaskAttempt')
+
+    group_ids = {
+        (student_id, lesson_id): group_id
+        for student_id, lesson_id, group_id
+        in GradebookEntry.objects.values_list('student_id', 'lesson_id', 'group_id').iterator()
+    }
+    graded = (
+        LessonTask.objects
+        .filter(submitted_at__isnull=False, score__isnull=False)
+        .only('id', 'lesson_id', 'student_id', 'tasks_data', 'answers')
+    )
+    attempts = []
+    for lesson_task in graded.iterator(chunk_size=CHUNK_SIZE):
+        tasks = lesson_task.tasks_data or []
+        answers = lesson_task.answers or {}
+        group_id = group_ids.get((lesson_task.student_id, lesson_task.lesson_id))
+        attempts.extend(
+            TaskAttempt(lesson_task_id=lesson_task.pk, lesson_id=lesson_task.lesson_id,
+                        student_id=lesson_task.student_id, group_id=group_id, position=position,
+                        task_type=task.get('type', ''),
+                        is_correct=normalize_answer(answers.get(str(position), '')) == answer_key(task),
+                        points=task.get('points', 1))
+            for position, task in enumerate(tasks)
+        )
+        if len(attempts) >= CHUNK_SIZE:
+            TaskAttempt.objects.bulk_create(attempts)
+            attempts = []
+    TaskAttempt.objects.bulk_create(attempts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_lessontask_json_swap'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(verbose_name='Номер задания')),
+                ('task_type', models.CharField(max_length=30, verbose_name='Тип задания')),
+                ('is_correct', models.BooleanField(verbose_name='Верно')),
+                ('points', models.PositiveSmallIntegerField(default=1, verbose_name='Баллы за задание')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attempts', to='main.group', verbose_name='Группа на момент сдачи')),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='main.lesson', verbose_name='Урок')),
+                ('lesson_task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='main.lessontask', verbose_name='Задание урока')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='main.student', verbose_name='Ученик')),
+            ],
+            options={
+                'verbose_name': 'Ответ на задание',
+                'verbose_name_plural': 'Ответы на задания',
+                'indexes': [models.Index(fields=['lesson', 'group', 'task_type'], name='attempt_lesson_group_type'), models.Index(fields=['lesson', 'position'], name='attempt_lesson_position')],
+                'unique_together': {('lesson_task', 'position')},
+            },
+        ),
+        migrations.RunPython(fill_attempts, migrations.RunPython.noop),
+    ]
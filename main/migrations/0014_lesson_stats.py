@@ -0,0 +1,72 @@
+# Generated by Django 5.2.9
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+
+
+def fill_lesson_stats(apps, schema_editor):
+    """Статистика уроков по уже созданным заданиям и журналу оценок"""
+    Lesson = apps.get_model('main', 'Lesson')
+    LessonTask = apps.get_model('main', 'LessonTask')
+    GradebookEntry = apps.get_model('main', 'GradebookEntry')
+    LessonStats = apps.get_model('main', 'LessonStats')
+
+    created = dict(
+        LessonTask.objects.values('lesson_id').annotate(count=Count('id')).values_list('lesson_id', 'count')
+    )
+    histogram = {f'score_{score}': Count('id', filter=Q(score=score)) for score in range(8)}
+    totals = {
+        row['lesson_id']: row
+        for row in (
+            GradebookEntry.objects
+            .filter(score__isnull=False)
+            .values('lesson_id')
+            .annotate(count=Count('id'), total=Sum('score'), squares=Sum(F('score') * F('score')), **histogram)
+        )
+    }
+    rows = []
+    for lesson_id in Lesson.objects.values_list('id', flat=True):
+        row = totals.get(lesson_id, {})
+        rows.append(LessonStats(
+            pk=lesson_id,
+            tasks_created=created.get(lesson_id, 0),
+            submission_count=row.get('count', 0),
+            score_sum=row.get('total') or 0,
+            score_sq_sum=row.get('squares') or 0,
+            **{field: row.get(field, 0) for field in histogram},
+        ))
+    LessonStats.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_task_attempt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonStats',
+            fields=[
+                ('lesson', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='main.lesson', verbose_name='Урок')),
+                ('tasks_created', models.IntegerField(default=0, verbose_name='Заданий создано')),
+                ('submission_count', models.IntegerField(default=0, verbose_name='Сдано работ')),
+                ('score_sum', models.IntegerField(default=0, verbose_name='Сумма оценок')),
+                ('score_sq_sum', models.IntegerField(default=0, verbose_name='Сумма квадратов оценок')),
+                ('score_0', models.IntegerField(default=0, verbose_name='Оценок 0')),
+                ('score_1', models.IntegerField(default=0, verbose_name='Оценок 1')),
+                ('score_2', models.IntegerField(default=0, verbose_name='Оценок 2')),
+                ('score_3', models.IntegerField(default=0, verbose_name='Оценок 3')),
+                ('score_4', models.IntegerField(default=0, verbose_name='Оценок 4')),
+                ('score_5', models.IntegerField(default=0, verbose_name='Оценок 5')),
+                ('score_6', models.IntegerField(default=0, verbose_name='Оценок 6')),
+                ('score_7', models.IntegerField(default=0, verbose_name='Оценок 7')),
+            ],
+            options={
+                'verbose_name': 'Статистика урока',
+                'verbose_name_plural': 'Статистика уроков',
+            },
+        ),
+        migrations.RunPython(fill_lesson_stats, migrations.RunPython.noop),
+    ]
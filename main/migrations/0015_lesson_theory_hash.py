@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def fill_theory_hash(apps, schema_editor):
+    """Хэш теории уже созданных уроков - по одному уроку, теория бывает большой"""
+    Lesson = apps.get_model('main', 'Lesson')
+    for lesson_id in Lesson.objects.values_list('id', flat=True):
+        content = Lesson.objects.filter(pk=lesson_id).values_list('theory_content', flat=True).get()
+        Lesson.objects.filter(pk=lesson_id).update(
+            theory_hash=hashlib.sha256(content.encode('utf-8')).hexdigest()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_lesson_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='theory_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Хэш теории'),
+        ),
+        migrations.RunPython(fill_theory_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_lesson_theory_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='theory_built',
+            field=models.TextField(blank=True, editable=False, verbose_name='Собранная теория'),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='theory_built_from',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Хэш собранной теории'),
+        ),
+    ]
@@ -1,10 +1,15 @@
-from django.db import models
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
-import json
+import hashlib
 import random
-from fractions import Fraction
+
+from .grading import default_checker
+from .task_generators import generator_choices, get_generator, has_hard_task, new_seed, tasks_from_seed
 
 
 class Teacher(models.Model):
@@ -45,6 +50,14 @@ class Group(models.Model):
     def __str__(self):
         return f"Группа {self.number}"
 
+    def roster_on(self, on_date):
+        """Ученики, состоявшие в группе на дату"""
+        return Student.objects.filter(
+            Q(group_history__valid_to__gt=on_date) | Q(group_history__valid_to__isnull=True),
+            group_history__group=self,
+            group_history__transfer_date__lte=on_date,
+        )
+
 
 class Student(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True)
@@ -61,22 +74,125 @@ class Student(models.Model):
         verbose_name_plural = 'Ученики'
         ordering = ['full_name']
 
+    def group_on(self, on_date):
+        """Группа ученика на дату (None, если ученика ещё не было в истории)"""
+        entry = self.group_history.on_date(on_date).select_related('group').first()
+        return entry.group if entry else None
+
+
+class GroupHistoryQuerySet(models.QuerySet):
+    def on_date(self, on_date):
+        """Записи, действующие на дату: transfer_date <= дата < valid_to"""
+        return self.filter(
+            Q(valid_to__gt=on_date) | Q(valid_to__isnull=True),
+            transfer_date__lte=on_date,
+        )
+
 
 class GroupHistory(models.Model):
     """История перемещений по группам"""
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='group_history', verbose_name='Ученик')
     group = models.ForeignKey(Group, on_delete=models.CASCADE, verbose_name='Группа')
     transfer_date = models.DateField(verbose_name='Дата перехода')
+    # Дата следующего перехода ученика (конец интервала), NULL - действует сейчас
+    valid_to = models.DateField(null=True, blank=True, editable=False, verbose_name='Действует до')
     reason = models.TextField(blank=True, verbose_name='Причина перемещения')
 
+    objects = GroupHistoryQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'История группы'
         verbose_name_plural = 'История групп'
         ordering = ['-transfer_date']
+        indexes = [
+            models.Index(fields=['student', 'transfer_date', 'valid_to'], name='grouphistory_student_period'),
+            models.Index(fields=['group', 'transfer_date', 'valid_to'], name='grouphistory_group_period'),
+        ]
 
     def __str__(self):
         return f"{self.student.full_name} → Группа {self.group.number} ({self.transfer_date})"
 
+    @property
+    def valid_from(self):
+        return self.transfer_date
+
+    @classmethod
+    def rebuild_intervals(cls, student_ids):
+        """
+        Пересчитать valid_to у записей указанных учеников.
+
+        Каждая запись действует до даты следующей записи того же ученика;
+        из нескольких записей на одну дату действует последняя.
+        """
+        entries = list(
+            cls.objects
+            .filter(student_id__in=student_ids)
+            .order_by('student_id', 'transfer_date', 'id')
+            .only('id', 'student_id', 'transfer_date', 'valid_to')
+        )
+        changed = []
+        for entry, following in zip(entries, entries[1:] + [None]):
+            valid_to = None
+            if following is not None and following.student_id == entry.student_id:
+                valid_to = following.transfer_date
+            if entry.valid_to != valid_to:
+                entry.valid_to = valid_to
+                changed.append(entry)
+        cls.objects.bulk_update(changed, ['valid_to'], batch_size=500)
+
+
+class SnapshotDate(models.Model):
+    """Дата среза распределения по группам (ключевая дата статистики)"""
+    date = models.DateField(unique=True, verbose_name='Дата среза')
+
+    class Meta:
+        verbose_name = 'Дата среза'
+        verbose_name_plural = 'Даты срезов'
+        ordering = ['date']
+
+    def __str__(self):
+        return self.date.strftime('%d.%m.%Y')
+
+
+class StudentTimeline(models.Model):
+    """Готовая история ученика по ключевым датам для графика статистики"""
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='timeline', verbose_name='Ученик')
+    name = models.CharField(max_length=200, verbose_name='ФИО')
+    # JSON-список точек [{"date": "YYYY-MM-DD", "group": 2.1}, ...]
+    history = models.TextField(verbose_name='История по ключевым датам (JSON)')
+
+    class Meta:
+        verbose_name = 'Линия истории ученика'
+        verbose_name_plural = 'Линии истории учеников'
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class LessonQuerySet(models.QuerySet):
+    """
+    Массовые правки теории пересчитывают theory_hash, как Lesson.save():
+    хэш входит в ключ кэша фрагмента, без него страница отдавала бы старую теорию.
+    """
+
+    def update(self, **kwargs):
+        content = kwargs.get('theory_content')
+        if content is not None and 'theory_hash' not in kwargs:
+            if not isinstance(content, str):
+                raise ValueError('theory_content в update() - только строка: выражение не даст пересчитать хэш')
+            kwargs['theory_hash'] = Lesson.content_hash(content)
+        return super().update(**kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if 'theory_content' in fields:
+            objs = list(objs)
+            for lesson in objs:
+                lesson.theory_hash = Lesson.content_hash(lesson.theory_content)
+            fields = {*fields, 'theory_hash'}
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
 
 class Lesson(models.Model):
     """Урок с теоретическим материалом"""
@@ -85,11 +201,21 @@ class Lesson(models.Model):
     subject = models.CharField(max_length=100, default='Математика', verbose_name='Предмет')
     grade = models.CharField(max_length=20, default='5', verbose_name='Класс')
     theory_content = models.TextField(verbose_name='Теоретический материал (HTML)')
+    # Хэш теории - часть ключа кэша фрагмента в lesson.html
+    theory_hash = models.CharField(max_length=64, blank=True, editable=False, verbose_name='Хэш теории')
+    # Теория со стилями и скриптами, вынесенными в файлы (main/lesson_assets.py)
+    theory_built = models.TextField(blank=True, editable=False, verbose_name='Собранная теория')
+    theory_built_from = models.CharField(max_length=64, blank=True, editable=False,
+                                         verbose_name='Хэш собранной теории')
     duration_minutes = models.IntegerField(default=40, verbose_name='Длительность урока (минут)')
     test_duration_minutes = models.IntegerField(default=5, verbose_name='Время на тест (минут)')
     is_active = models.BooleanField(default=True, verbose_name='Активен')
+    task_generator = models.CharField(max_length=50, choices=generator_choices, default='mixed_fractions',
+                                      verbose_name='Тип заданий')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = LessonQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Урок'
         verbose_name_plural = 'Уроки'
@@ -98,17 +224,46 @@ class Lesson(models.Model):
     def __str__(self):
         return f"{self.title} ({self.date})"
 
+    @staticmethod
+    def content_hash(content):
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    @property
+    def is_theory_built(self):
+        """Собранная теория соответствует текущему исходнику"""
+        return bool(self.theory_built_from) and self.theory_built_from == self.theory_hash
+
+    @property
+    def theory_html(self):
+        """HTML теории для страницы урока: собранный, если сборка актуальна"""
+        return self.theory_built if self.is_theory_built else self.theory_content
+
+    def save(self, *args, **kwargs):
+        # Теория, отложенная через defer(), не менялась - хэш прежний
+        if 'theory_content' not in self.get_deferred_fields():
+            self.theory_hash = self.content_hash(self.theory_content)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'theory_content' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'theory_hash'}
+        super().save(*args, **kwargs)
+
 
 class LessonTask(models.Model):
     """Задание для ученика к конкретному уроку"""
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='tasks')
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='lesson_tasks')
 
-    # Сгенерированные задания (JSON)
-    tasks_data = models.TextField(verbose_name='Данные заданий (JSON)')
+    # Сгенерированные задания; в компактном режиме пусто - задания восстанавливаются по seed
+    tasks_data = models.JSONField(default=list, blank=True, verbose_name='Данные заданий')
+    generator = models.CharField(max_length=50, blank=True, verbose_name='Генератор заданий')
+    generator_version = models.PositiveSmallIntegerField(default=1, verbose_name='Версия генератора')
+    seed = models.BigIntegerField(null=True, blank=True, verbose_name='Seed генератора')
+    # Есть ли в наборе задания повышенной сложности; для фильтрации без разбора JSON
+    has_hard_task = models.BooleanField(default=False, db_index=True, editable=False,
+                                        verbose_name='Есть сложные задания')
 
-    # Ответы ученика
-    answers = models.TextField(blank=True, null=True, verbose_name='Ответы ученика (JSON)')
+    # Ответы ученика {'0': '...', '1': '...'}
+    answers = models.JSONField(blank=True, null=True, verbose_name='Ответы ученика')
 
     # Результаты
     score = models.IntegerField(
@@ -130,281 +285,383 @@ class LessonTask(models.Model):
         return f"{self.student.full_name} - {self.lesson.title}"
 
     def generate_tasks(self):
-        """Генерация индивидуальных заданий"""
-        # Определяем тип урока по дате или названию
-        lesson_date_str = str(self.lesson.date)
-        
-        if '2026-02-03' in lesson_date_str or 'сравнение' in self.lesson.title.lower():
-            # УРОК 2: Сравнение и сокращение дробей
-            tasks = self._generate_comparison_tasks()
-        else:
-            # УРОК 1: Смешанные и неправильные дроби (по умолчанию)
-            tasks = self._generate_mixed_fraction_tasks()
-        
-        self.tasks_data = json.dumps(tasks, ensure_ascii=False)
-        self.total_count = len(tasks)
+        """Генерация индивидуальных заданий генератором, выбранным для урока"""
+        self.assign_tasks(self.lesson.task_generator)
         self.save()
 
-    def _generate_mixed_fraction_tasks(self):
-        """Генерация заданий для урока 1: смешанные и неправильные дроби"""
-        tasks = []
-        
-        # 3 задания на классификацию (правильная/неправильная)
-        for _ in range(3):
-            numerator = random.randint(1, 20)
-            denominator = random.randint(2, 15)
-            tasks.append({
-                'type': 'classify',
-                'numerator': numerator,
-                'denominator': denominator,
-                'answer': 'proper' if numerator < denominator else 'improper'
-            })
-
-        # 3 задания: смешанная → неправильная
-        for _ in range(3):
-            whole = random.randint(1, 10)
-            numerator = random.randint(1, 8)
-            denominator = random.randint(2, 9)
-            answer_num = whole * denominator + numerator
-            tasks.append({
-                'type': 'mixed_to_improper',
-                'whole': whole,
-                'numerator': numerator,
-                'denominator': denominator,
-                'answer': f"{answer_num}/{denominator}"
-            })
-
-        # 4 задания: неправильная → смешанная
-        for _ in range(4):
-            denominator = random.randint(2, 9)
-            whole = random.randint(1, 8)
-            numerator = random.randint(1, denominator - 1)
-            improper_num = whole * denominator + numerator
-            tasks.append({
-                'type': 'improper_to_mixed',
-                'numerator': improper_num,
-                'denominator': denominator,
-                'answer': f"{whole} {numerator}/{denominator}"
-            })
-        
-        return tasks
-
-    def _generate_comparison_tasks(self):
-        """Генерация заданий для урока 2: сравнение и сокращение дробей"""
-        tasks = []
-        
-        # 3 задания на сокращение дробей
-        for _ in range(3):
-            # Выбираем общий делитель
-            gcd_value = random.choice([2, 3, 4, 5, 6])
-            # Генерируем несокращённую дробь
-            numerator_reduced = random.randint(1, 8)
-            denominator_reduced = random.randint(numerator_reduced + 1, 12)
-            
-            numerator = numerator_reduced * gcd_value
-            denominator = denominator_reduced * gcd_value
-            
-            tasks.append({
-                'type': 'reduce',
-                'numerator': numerator,
-                'denominator': denominator,
-                'answer': f"{numerator_reduced}/{denominator_reduced}"
-            })
-
-        # 3 задания на сравнение дробей с одинаковым знаменателем
-        for _ in range(3):
-            denominator = random.randint(5, 15)
-            num1 = random.randint(1, denominator - 1)
-            num2 = random.randint(1, denominator - 1)
-            while num1 == num2:
-                num2 = random.randint(1, denominator - 1)
-            
-            if num1 > num2:
-                answer = ">"
-            elif num1 < num2:
-                answer = "<"
-            else:
-                answer = "="
-            
-            tasks.append({
-                'type': 'compare_same_denom',
-                'numerator1': num1,
-                'denominator1': denominator,
-                'numerator2': num2,
-                'denominator2': denominator,
-                'answer': answer
-            })
-
-        # 3 задания на сравнение дробей с разными знаменателями
-        for _ in range(3):
-            # Используем простые знаменатели для простоты
-            denominators = [2, 3, 4, 5, 6, 8, 10, 12]
-            denom1 = random.choice(denominators)
-            denom2 = random.choice([d for d in denominators if d != denom1])
-            
-            num1 = random.randint(1, denom1 - 1)
-            num2 = random.randint(1, denom2 - 1)
-            
-            # Используем Fraction для точного сравнения
-            frac1 = Fraction(num1, denom1)
-            frac2 = Fraction(num2, denom2)
-            
-            if frac1 > frac2:
-                answer = ">"
-            elif frac1 < frac2:
-                answer = "<"
-            else:
-                answer = "="
-            
-            tasks.append({
-                'type': 'compare_diff_denom',
-                'numerator1': num1,
-                'denominator1': denom1,
-                'numerator2': num2,
-                'denominator2': denom2,
-                'answer': answer
-            })
-
-        # 1 задание повышенной сложности (обязательно для 7)
-        # Сокращение дроби с большими числами И сравнение
-        gcd_large = random.choice([6, 8, 9, 12, 15])
-        num_base = random.randint(3, 10)
-        denom_base = random.randint(num_base + 2, 15)
-        
-        numerator_large = num_base * gcd_large
-        denominator_large = denom_base * gcd_large
-        
-        tasks.append({
-            'type': 'reduce_hard',
-            'numerator': numerator_large,
-            'denominator': denominator_large,
-            'answer': f"{num_base}/{denom_base}",
-            'difficulty': 'hard',
-            'points': 2  # Это задание даёт 2 балла вместо 1
-        })
-        
-        return tasks
-
-    def generate_addsub_tasks(self):
-        tasks = []
-        denominators = [2, 3, 4, 5, 6, 8, 10, 12]
-
-        # 5 задач на сложение (разные знаменатели)
-        for _ in range(5):
-            d1 = random.choice(denominators)
-            d2 = random.choice([d for d in denominators if d != d1])
-            n1 = random.randint(1, d1 - 1)
-            n2 = random.randint(1, d2 - 1)
-            result = Fraction(n1, d1) + Fraction(n2, d2)
-            tasks.append({
-                'type': 'add_diff_denom',
-                'numerator1': n1, 
-                'denominator1': d1,
-                'numerator2': n2, 
-                'denominator2': d2,
-                'answer': f"{result.numerator}/{result.denominator}"
-            })
-
-        # 4 задачи на вычитание (разные знаменатели)
-        for _ in range(4):
-            d1 = random.choice(denominators)
-            d2 = random.choice([d for d in denominators if d != d1])
-            n1 = random.randint(1, d1 - 1)
-            n2 = random.randint(1, d2 - 1)
-            f1, f2 = Fraction(n1, d1), Fraction(n2, d2)
-            if f1 < f2: 
-                n1, d1, n2, d2 = n2, d2, n1, d1
-                f1, f2 = f2, f1
-            result = f1 - f2
-            tasks.append({
-                'type': 'sub_diff_denom',
-                'numerator1': n1, 
-                'denominator1': d1,
-                'numerator2': n2, 
-                'denominator2': d2,
-                'answer': f"{result.numerator}/{result.denominator}"
-            })
-
-        # 1 задача посложнее
-        pairs = [(6,8),(8,10),(6,10),(4,6),(8,12)]
-        d1, d2 = pairs[random.randint(0, len(pairs)-1)]
-        n1 = random.randint(d1//2+1, d1-1)
-        n2 = random.randint(1, d2//2)
-        result = Fraction(n1,d1) + Fraction(n2,d2)
-        tasks.append({
-            'type': 'add_diff_denom',
-            'numerator1': n1, 
-            'denominator1': d1,
-            'numerator2': n2, 
-            'denominator2': d2,
-            'answer': f"{result.numerator}/{result.denominator}",
-            'difficulty': 'hard'
-        })
-        return tasks
+    def assign_tasks(self, generator_key, seed=None):
+        """
+        Привязать к заданию набор задач генератора с данным seed.
+
+        Генератор, версия и seed сохраняются всегда (набор можно
+        воспроизвести), полный список заданий - только без COMPACT_TASK_STORAGE.
+        """
+        generator = get_generator(generator_key)
+        if seed is None:
+            seed = new_seed()
+        tasks = tasks_from_seed(generator.key, generator.version, seed)
+
+        self.generator = generator.key
+        self.generator_version = generator.version
+        self.seed = seed
+        self.tasks_data = [] if settings.COMPACT_TASK_STORAGE else tasks
+        self.has_hard_task = has_hard_task(tasks)
+        self.total_count = len(tasks)
+
+    @property
+    def has_tasks(self):
+        return bool(self.tasks_data) or self.seed is not None
+
+    def get_tasks(self):
+        """Список заданий: сохранённый или заново по seed (с кэшем в процессе)"""
+        if self.tasks_data:
+            return self.tasks_data
+        if self.seed is not None:
+            return tasks_from_seed(self.generator, self.generator_version, self.seed)
+        return []
+
+    @classmethod
+    def get_or_generate(cls, lesson, student):
+        """
+        Задание ученика к уроку; если его не подготовили заранее -
+        создаётся одной вставкой вместе со сгенерированными задачами.
+        """
+        lesson_task = cls.objects.filter(lesson=lesson, student=student).first()
+        if lesson_task is not None:
+            return lesson_task
+
+        lesson_task = cls(lesson=lesson, student=student)
+        lesson_task.assign_tasks(lesson.task_generator)
+        try:
+            with transaction.atomic():
+                lesson_task.save(force_insert=True)
+        except IntegrityError:
+            # Параллельный запрос того же ученика успел создать задание
+            lesson_task = cls.objects.get(lesson=lesson, student=student)
+        return lesson_task
+
+    @classmethod
+    def provision(cls, lesson, group_ids=None):
+        """
+        Заранее создать задания урока всем ученикам групп (или всем ученикам с группой).
+
+        Наборы генерируются одним проходом (seed каждого ученика берётся
+        из общего генератора) и вставляются через bulk_create в одной
+        транзакции; уже созданные задания не трогаются.
+        Возвращает количество действительно вставленных заданий.
+        """
+        students = Student.objects.filter(current_group__isnull=False)
+        if group_ids:
+            students = students.filter(current_group_id__in=group_ids)
+
+        with transaction.atomic():
+            existing = set(cls.objects.filter(lesson=lesson).values_list('student_id', flat=True))
+            student_ids = [pk for pk in students.values_list('id', flat=True) if pk not in existing]
+            rng = random.Random()
+
+            lesson_tasks = []
+            for student_id in student_ids:
+                lesson_task = cls(lesson=lesson, student_id=student_id)
+                lesson_task.assign_tasks(lesson.task_generator, seed=rng.getrandbits(62))
+                lesson_tasks.append(lesson_task)
+            cls.objects.bulk_create(lesson_tasks, batch_size=500, ignore_conflicts=True)
+            # Строки, пропущенные из-за конфликта, вставил параллельный запрос (и учёл своим
+            # сигналом) - считаем только свои. bulk_create не вызывает post_save
+            created = cls.objects.filter(lesson=lesson).count() - len(existing)
+            LessonStats.add_tasks(lesson.pk, created)
+
+        return created
 
     def check_answers(self, submitted_answers):
         """Проверка ответов и выставление оценки"""
-        tasks = json.loads(self.tasks_data)
-        correct = 0
-        total_points = 0
-        earned_points = 0
-        
-        for i, task in enumerate(tasks):
-            user_answer = submitted_answers.get(str(i), '').strip()
-            correct_answer = task['answer'].strip()
-            
-            # Получаем количество баллов за задание
-            task_points = task.get('points', 1)
-            total_points += task_points
-            
-            # Проверка ответа
-            is_correct = False
-            
-            if task.get('type') in ['compare_same_denom', 'compare_diff_denom']:
-                # Для сравнений нормализуем ответ
-                user_answer_normalized = user_answer.replace(' ', '')
-                correct_answer_normalized = correct_answer.replace(' ', '')
-                try:
-                    if '/' in user_answer_normalized:
-                        is_correct = (Fraction(user_answer_normalized) == Fraction(correct_answer_normalized))
-                    else:
-                        is_correct = (user_answer_normalized == correct_answer_normalized)
-                except ValueError:
-                    is_correct = False
-            else:
-                # Для дробей проверяем точное совпадение или эквивалентность
-                is_correct = user_answer.lower() == correct_answer.lower()
-            
-            if is_correct:
-                correct += 1
-                earned_points += task_points
-        
-        self.correct_count = correct
-        self.answers = json.dumps(submitted_answers, ensure_ascii=False)
-        self.submitted_at = timezone.now()
-
-        # Выставление оценки по 7-бальной системе (на основе набранных баллов)
-        percentage = (earned_points / total_points) * 100 if total_points > 0 else 0
-        
-        if percentage >= 95:
-            self.score = 7
-        elif percentage >= 85:
-            self.score = 6
-        elif percentage >= 75:
-            self.score = 5
-        elif percentage >= 65:
-            self.score = 4
-        elif percentage >= 50:
-            self.score = 3
-        elif percentage >= 35:
-            self.score = 2
-        else:
-            self.score = 1
-
-        self.save()
+        tasks = self.get_tasks()
+        result = default_checker.grade(tasks, submitted_answers)
+
+        self.correct_count = result.correct_count
+        self.score = result.score
+        self.answers = submitted_answers
+        # При фоновой проверке время сдачи уже записано submit_answers
+        if self.submitted_at is None:
+            self.submitted_at = timezone.now()
+
+        # Оценка, сводные таблицы (сигнал post_save) и ответы по заданиям обновляются в одной транзакции
+        with transaction.atomic():
+            self.save()
+            group_id = (
+                GradebookEntry.objects.filter(student_id=self.student_id, lesson_id=self.lesson_id)
+                .values_list('group_id', flat=True)
+                .first()
+            )
+            TaskAttempt.record(self, tasks, result.items, group_id)
         return self.score
 
 
+class ProgressRollup(models.Model):
+    """Накопительные итоги по сданным тестам"""
+    completed_count = models.IntegerField(default=0, verbose_name='Сдано тестов')
+    score_sum = models.IntegerField(default=0, verbose_name='Сумма оценок')
+    last_submitted_at = models.DateTimeField(null=True, blank=True, verbose_name='Последняя сдача')
+
+    class Meta:
+        abstract = True
+
+    @property
+    def average(self):
+        if not self.completed_count:
+            return None
+        return round(self.score_sum / self.completed_count, 2)
+
+    @classmethod
+    def apply(cls, pk, count_delta, score_delta, submitted_at=None):
+        """Атомарно сдвинуть итоги строки pk (создаётся при первой сдаче)"""
+        if pk is None:
+            return
+        # Вычитание не создаёт строку: её могли удалить каскадом вместе с учеником или группой
+        if count_delta > 0:
+            cls.objects.get_or_create(pk=pk)
+        changes = {
+            'completed_count': F('completed_count') + count_delta,
+            'score_sum': F('score_sum') + score_delta,
+        }
+        if submitted_at is not None:
+            changes['last_submitted_at'] = Greatest(
+                Coalesce('last_submitted_at', Value(submitted_at)), Value(submitted_at)
+            )
+        cls.objects.filter(pk=pk).update(**changes)
+
+
+class StudentProgress(ProgressRollup):
+    """Итоги ученика по всем урокам"""
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='progress', verbose_name='Ученик')
+
+    class Meta:
+        verbose_name = 'Итоги ученика'
+        verbose_name_plural = 'Итоги учеников'
+
+    def __str__(self):
+        return f"{self.student.full_name}: {self.completed_count} тестов"
+
+
+class GroupProgress(ProgressRollup):
+    """Итоги группы по всем урокам"""
+    group = models.OneToOneField(Group, on_delete=models.CASCADE, primary_key=True,
+                                 related_name='progress', verbose_name='Группа')
+
+    class Meta:
+        verbose_name = 'Итоги группы'
+        verbose_name_plural = 'Итоги групп'
+
+    def __str__(self):
+        return f"Группа {self.group.number}: {self.completed_count} тестов"
+
+
+class LessonStats(models.Model):
+    """Накопительная статистика урока: выдано заданий, сдано работ, гистограмма оценок"""
+    lesson = models.OneToOneField(Lesson, on_delete=models.CASCADE, primary_key=True,
+                                  related_name='stats', verbose_name='Урок')
+    tasks_created = models.IntegerField(default=0, verbose_name='Заданий создано')
+    submission_count = models.IntegerField(default=0, verbose_name='Сдано работ')
+    score_sum = models.IntegerField(default=0, verbose_name='Сумма оценок')
+    score_sq_sum = models.IntegerField(default=0, verbose_name='Сумма квадратов оценок')
+    # Гистограмма: сколько работ получили каждую оценку 0..7
+    score_0 = models.IntegerField(default=0, verbose_name='Оценок 0')
+    score_1 = models.IntegerField(default=0, verbose_name='Оценок 1')
+    score_2 = models.IntegerField(default=0, verbose_name='Оценок 2')
+    score_3 = models.IntegerField(default=0, verbose_name='Оценок 3')
+    score_4 = models.IntegerField(default=0, verbose_name='Оценок 4')
+    score_5 = models.IntegerField(default=0, verbose_name='Оценок 5')
+    score_6 = models.IntegerField(default=0, verbose_name='Оценок 6')
+    score_7 = models.IntegerField(default=0, verbose_name='Оценок 7')
+
+    SCORES = range(8)
+
+    class Meta:
+        verbose_name = 'Статистика урока'
+        verbose_name_plural = 'Статистика уроков'
+
+    def __str__(self):
+        return f"{self.lesson_id}: {self.submission_count} из {self.tasks_created}"
+
+    @property
+    def average(self):
+        if not self.submission_count:
+            return None
+        return round(self.score_sum / self.submission_count, 2)
+
+    @property
+    def std(self):
+        if not self.submission_count:
+            return None
+        mean = self.score_sum / self.submission_count
+        variance = max(self.score_sq_sum / self.submission_count - mean * mean, 0)
+        return round(variance ** 0.5, 2)
+
+    @property
+    def completion(self):
+        """Процент сданных работ от выданных заданий"""
+        if not self.tasks_created:
+            return None
+        return round(self.submission_count / self.tasks_created * 100, 1)
+
+    @property
+    def histogram(self):
+        return [getattr(self, f'score_{score}') for score in self.SCORES]
+
+    @classmethod
+    def add_tasks(cls, lesson_id, count):
+        """Учесть созданные (count > 0) или удалённые (count < 0) задания урока"""
+        if not count:
+            return
+        # Вычитание не создаёт строку: при каскадном удалении урока её уже нет
+        if count > 0:
+            cls.objects.get_or_create(pk=lesson_id)
+        cls.objects.filter(pk=lesson_id).update(tasks_created=F('tasks_created') + count)
+
+    @classmethod
+    def apply_score(cls, lesson_id, old_score, new_score):
+        """
+        Атомарно перенести работу из столбца old_score в new_score.
+
+        old_score=None - первая сдача; при перепроверке старая оценка
+        вычитается из суммы, суммы квадратов и гистограммы;
+        new_score=None - работа удалена.
+        """
+        if new_score is not None:
+            cls.objects.get_or_create(pk=lesson_id)
+        changes = {}
+        count_delta = score_delta = square_delta = 0
+        if old_score is not None:
+            count_delta -= 1
+            score_delta -= old_score
+            square_delta -= old_score * old_score
+            changes[f'score_{old_score}'] = F(f'score_{old_score}') - 1
+        if new_score is not None:
+            count_delta += 1
+            score_delta += new_score
+            square_delta += new_score * new_score
+            field = f'score_{new_score}'
+            changes[field] = changes.get(field, F(field)) + 1
+        changes.update(
+            submission_count=F('submission_count') + count_delta,
+            score_sum=F('score_sum') + score_delta,
+            score_sq_sum=F('score_sq_sum') + square_delta,
+        )
+        cls.objects.filter(pk=lesson_id).update(**changes)
+
+
+class GradebookEntry(models.Model):
+    """Оценка ученика за урок (денормализованная копия LessonTask для таблиц)"""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='gradebook_entries',
+                                verbose_name='Ученик')
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='gradebook_entries',
+                               verbose_name='Урок')
+    group = models.ForeignKey(Group, on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='gradebook_entries', verbose_name='Группа на момент сдачи')
+    score = models.IntegerField(null=True, blank=True, verbose_name='Оценка (0-7)')
+    submitted_at = models.DateTimeField(null=True, blank=True, verbose_name='Время сдачи')
+
+    class Meta:
+        verbose_name = 'Запись журнала'
+        verbose_name_plural = 'Журнал оценок'
+        unique_together = ['student', 'lesson']
+
+    def __str__(self):
+        return f"{self.student_id} - {self.lesson_id}: {self.score}"
+
+    @classmethod
+    def record(cls, task):
+        """
+        Перенести оценку задания в журнал и сдвинуть итоги ученика и группы.
+
+        При повторной проверке того же теста старый вклад записи сначала
+        вычитается, поэтому итоги не задваиваются; повторный вызов с той
+        же оценкой ничего не меняет. Своя транзакция: метод вызывается из
+        сигналов, в том числе при сохранении вне atomic().
+        """
+        group_id = (
+            Student.objects.filter(pk=task.student_id)
+            .values_list('current_group_id', flat=True)
+            .first()
+        )
+        with transaction.atomic():
+            entry, created = cls.objects.select_for_update().get_or_create(
+                student_id=task.student_id,
+                lesson_id=task.lesson_id,
+            )
+            if not created and (entry.score, entry.submitted_at, entry.group_id) == (
+                    task.score, task.submitted_at, group_id):
+                return entry
+            if entry.score is not None:
+                StudentProgress.apply(task.student_id, -1, -entry.score)
+                GroupProgress.apply(entry.group_id, -1, -entry.score)
+            LessonStats.apply_score(task.lesson_id, entry.score, task.score)
+
+            entry.group_id = group_id
+            entry.score = task.score
+            entry.submitted_at = task.submitted_at
+            entry.save()
+
+            StudentProgress.apply(task.student_id, 1, task.score, task.submitted_at)
+            GroupProgress.apply(group_id, 1, task.score, task.submitted_at)
+        return entry
+
+    @classmethod
+    def discard(cls, student_id, lesson_id):
+        """Удалить запись журнала и вычесть её вклад из итогов ученика, группы и урока"""
+        with transaction.atomic():
+            entry = cls.objects.select_for_update().filter(student_id=student_id, lesson_id=lesson_id).first()
+            if entry is None:
+                return
+            entry.delete()
+            if entry.score is not None:
+                StudentProgress.apply(student_id, -1, -entry.score)
+                GroupProgress.apply(entry.group_id, -1, -entry.score)
+                LessonStats.apply_score(lesson_id, entry.score, None)
+
+
+class TaskAttempt(models.Model):
+    """Результат ученика по одному заданию теста (строка на каждую позицию набора)"""
+    lesson_task = models.ForeignKey(LessonTask, on_delete=models.CASCADE, related_name='attempts',
+                                    verbose_name='Задание урока')
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='attempts', verbose_name='Урок')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attempts', verbose_name='Ученик')
+    group = models.ForeignKey(Group, on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='attempts', verbose_name='Группа на момент сдачи')
+    position = models.PositiveSmallIntegerField(verbose_name='Номер задания')
+    task_type = models.CharField(max_length=30, verbose_name='Тип задания')
+    is_correct = models.BooleanField(verbose_name='Верно')
+    points = models.PositiveSmallIntegerField(default=1, verbose_name='Баллы за задание')
+
+    class Meta:
+        verbose_name = 'Ответ на задание'
+        verbose_name_plural = 'Ответы на задания'
+        unique_together = ['lesson_task', 'position']
+        indexes = [
+            models.Index(fields=['lesson', 'group', 'task_type'], name='attempt_lesson_group_type'),
+            models.Index(fields=['lesson', 'position'], name='attempt_lesson_position'),
+        ]
+
+    def __str__(self):
+        return f"{self.lesson_task_id} #{self.position}: {'верно' if self.is_correct else 'неверно'}"
+
+    @classmethod
+    def build(cls, task, tasks, items, group_id):
+        """Несохранённые строки по списку заданий и флагам GradeResult.items"""
+        return [
+            cls(lesson_task_id=task.pk, lesson_id=task.lesson_id, student_id=task.student_id,
+                group_id=group_id, position=position, task_type=item.get('type', ''),
+                is_correct=is_correct, points=item.get('points', 1))
+            for position, (item, is_correct) in enumerate(zip(tasks, items))
+        ]
+
+    @classmethod
+    def record(cls, task, tasks, items, group_id):
+        """Заменить строки проверенного задания новыми"""
+        cls.objects.filter(lesson_task_id=task.pk).delete()
+        cls.objects.bulk_create(cls.build(task, tasks, items, group_id))
+
+
 # Старые модели для совместимости
 class Assignment(models.Model):
     """Задание (пока заглушка)"""
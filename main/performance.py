@@ -0,0 +1,299 @@
+"""
+Замеры производительности запросов.
+
+PerformanceMiddleware собирает по каждому запросу число и время SQL,
+время рендеринга шаблонов, попадания и промахи кэша и общее время,
+отдаёт их заголовком Server-Timing и пишет строкой JSON в журнал
+PERFORMANCE_LOG (у каждого процесса свой файл). endpoint_report сводит последние записи журнала по
+страницам, get_endpoint_report кэширует сводку на минуту.
+
+Модуль подключается из LOGGING, TEMPLATES и CACHES при старте Django,
+поэтому моделей не импортирует.
+"""
+import glob
+import json
+import logging
+import os
+import time
+from collections import deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+_current_metrics = ContextVar('request_metrics', default=None)
+_MISSING = object()
+
+# Отчёт строится по последним записям журнала и кэшируется ненадолго:
+# разбор всех журналов (до 20 МБ на процесс) на каждый просмотр страницы слишком дорог
+REPORT_RECORDS = 50000
+REPORT_TIMEOUT = 60
+REPORT_CACHE_KEY = 'performance:report'
+
+
+class RequestMetrics:
+    """Счётчики одного запроса"""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_seconds += time.perf_counter() - started
+
+    def server_timing(self, total_seconds):
+        return ', '.join([
+            f'sql;dur={self.sql_seconds * 1000:.1f};desc="{self.sql_count} queries"',
+            f'tpl;dur={self.template_seconds * 1000:.1f}',
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+            f'total;dur={total_seconds * 1000:.1f}',
+        ])
+
+
+def record_cache_lookup(hit):
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return
+    if hit:
+        metrics.cache_hits += 1
+    else:
+        metrics.cache_misses += 1
+
+
+class PerformanceMiddleware:
+    """Замеры запроса: заголовок Server-Timing и строка в журнале производительности"""
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_MONITORING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics.sql_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        total = time.perf_counter() - started
+
+        response['Server-Timing'] = metrics.server_timing(total)
+        match = getattr(request, 'resolver_match', None)
+        logger.info(json.dumps({
+            'ts': datetime.now().isoformat(timespec='milliseconds'),
+            'endpoint': match.view_name if match else request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'sql_count': metrics.sql_count,
+            'sql_ms': round(metrics.sql_seconds * 1000, 2),
+            'template_ms': round(metrics.template_seconds * 1000, 2),
+            'cache_hits': metrics.cache_hits,
+            'cache_misses': metrics.cache_misses,
+        }))
+        return response
+
+
+class TimedTemplate:
+    """Шаблон, который засчитывает время рендеринга в метрики запроса"""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = _current_metrics.get()
+        if metrics is None:
+            return self.template.render(context, request)
+        # Вложенный render_to_string уже входит во время внешнего шаблона
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_seconds += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Шаблонизатор Django с замером времени рендеринга"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class InstrumentedCacheMixin:
+    """Подсчёт попаданий и промахов cache.get для метрик запроса"""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        record_cache_lookup(value is not _MISSING)
+        return default if value is _MISSING else value
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+class InstrumentedFileBasedCache(InstrumentedCacheMixin, FileBasedCache):
+    pass
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+    pass
+
+
+def process_log_path(path):
+    """Журнал одного процесса: logs/performance.log -> logs/performance.<pid>.log"""
+    root, ext = os.path.splitext(path)
+    return f'{root}.{os.getpid()}{ext}'
+
+
+class PerformanceLogHandler(RotatingFileHandler):
+    """
+    Ротируемый журнал своего процесса; каталог создаётся при первом запуске.
+
+    RotatingFileHandler не умеет ротировать файл, в который пишут несколько
+    процессов WSGI, поэтому каждый процесс пишет и ротирует свой файл,
+    а read_log_records сводит их вместе.
+    """
+
+    def __init__(self, filename, *args, **kwargs):
+        self.log_path = filename
+        self.pid = os.getpid()
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        super().__init__(process_log_path(filename), *args, **kwargs)
+
+    def emit(self, record):
+        # Процесс, созданный fork после настройки журналов (gunicorn --preload), переходит на свой файл
+        if self.pid != os.getpid():
+            self.acquire()
+            try:
+                if self.stream:
+                    self.stream.close()
+                    self.stream = None
+                self.pid = os.getpid()
+                self.baseFilename = os.path.abspath(process_log_path(self.log_path))
+            finally:
+                self.release()
+        super().emit(record)
+
+
+def _log_files(path):
+    """Журналы всех процессов вместе с ротированными копиями, свежие первыми"""
+    root, ext = os.path.splitext(path)
+    pattern = f'{glob.escape(root)}.*{ext}'
+    files = []
+    for name in glob.glob(pattern) + glob.glob(f'{pattern}.[0-9]*'):
+        try:
+            files.append((os.path.getmtime(name), name))
+        except OSError:
+            # Файл успели ротировать между glob и stat
+            continue
+    return sorted(files, reverse=True)
+
+
+def _read_tail(name, limit):
+    lines = deque(maxlen=limit)
+    try:
+        with open(name, encoding='utf-8') as log_file:
+            lines.extend(log_file)
+    except OSError:
+        return []
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue
+    return records
+
+
+def _record_time(record):
+    return record.get('ts', '')
+
+
+def read_log_records(path=None, limit=REPORT_RECORDS):
+    """Последние limit записей из журналов всех процессов по порядку времени"""
+    path = path or settings.PERFORMANCE_LOG
+    records = []
+    for modified, name in _log_files(path):
+        if len(records) >= limit:
+            records.sort(key=_record_time)
+            records = records[-limit:]
+            # Записи файла не новее его mtime: если и он старше нужных записей, остальные файлы тоже
+            if datetime.fromtimestamp(modified).isoformat(timespec='milliseconds') < _record_time(records[0]):
+                break
+        # Разбираются только последние строки, остальные лишь пролистываются
+        records.extend(_read_tail(name, limit))
+    records.sort(key=_record_time)
+    return records[-limit:]
+
+
+def endpoint_report(records, limit=20):
+    """Страницы, отсортированные по p95 времени ответа (худшие первыми)"""
+    by_endpoint = {}
+    for record in records:
+        by_endpoint.setdefault(record['endpoint'], []).append(record)
+
+    report = []
+    for endpoint, rows in by_endpoint.items():
+        total = np.array([row['total_ms'] for row in rows])
+        hits = sum(row['cache_hits'] for row in rows)
+        lookups = hits + sum(row['cache_misses'] for row in rows)
+        p50, p95, p99 = np.percentile(total, [50, 95, 99])
+        report.append({
+            'endpoint': endpoint,
+            'requests': len(rows),
+            'p50_ms': round(float(p50), 1),
+            'p95_ms': round(float(p95), 1),
+            'p99_ms': round(float(p99), 1),
+            'sql_count': round(float(np.mean([row['sql_count'] for row in rows])), 1),
+            'sql_ms': round(float(np.mean([row['sql_ms'] for row in rows])), 1),
+            'template_ms': round(float(np.mean([row['template_ms'] for row in rows])), 1),
+            'cache_hit_rate': round(hits / lookups * 100, 1) if lookups else None,
+            'errors': sum(row['status'] >= 500 for row in rows),
+        })
+    report.sort(key=lambda row: row['p95_ms'], reverse=True)
+    return report[:limit]
+
+
+def get_endpoint_report():
+    """(число записей, отчёт по страницам) с кэшем на REPORT_TIMEOUT секунд"""
+    report = cache.get(REPORT_CACHE_KEY)
+    if report is None:
+        records = read_log_records()
+        report = (len(records), endpoint_report(records))
+        cache.set(REPORT_CACHE_KEY, report, REPORT_TIMEOUT)
+    return report
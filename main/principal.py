@@ -0,0 +1,111 @@
+"""
+Профиль текущего пользователя (ученик или преподаватель) на время запроса.
+
+PrincipalMiddleware кладёт в request.principal ленивый объект: профиль
+загружается одним запросом при первом обращении и хранится в кэше до
+изменения ученика, преподавателя или группы (см. main/signals.py).
+Шаблоны получают его как principal через контекст-процессор.
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+# Профиль хранится до явной инвалидации, таймаут - страховка
+PRINCIPAL_TIMEOUT = 60 * 60 * 24
+
+# Версия всех профилей: меняется при изменении групп и преподавателей
+PRINCIPAL_VERSION_KEY = 'principal:version'
+
+
+class Principal:
+    """Роль пользователя: ученик (с группой и её преподавателем) или преподаватель"""
+
+    def __init__(self, student=None, teacher=None):
+        self.student = student
+        self.teacher = teacher
+
+    @property
+    def is_student(self):
+        return self.student is not None
+
+    @property
+    def is_teacher(self):
+        return self.teacher is not None
+
+    @property
+    def full_name(self):
+        profile = self.student or self.teacher
+        return profile.full_name if profile else ''
+
+
+ANONYMOUS = Principal()
+
+
+def _principal_version():
+    version = cache.get(PRINCIPAL_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(PRINCIPAL_VERSION_KEY, version, None)
+    return version
+
+
+def _principal_key(user_id, version):
+    return f'principal:{version}:{user_id}'
+
+
+def build_principal(user_id):
+    """Ученик и преподаватель пользователя одним запросом"""
+    user = (
+        User.objects
+        .select_related('student__current_group__teacher', 'teacher_profile')
+        .filter(pk=user_id)
+        .first()
+    )
+    if user is None:
+        return ANONYMOUS
+    return Principal(
+        student=getattr(user, 'student', None),
+        teacher=getattr(user, 'teacher_profile', None),
+    )
+
+
+def get_principal(user):
+    """Профиль пользователя из кэша; при промахе - build_principal"""
+    if not user.is_authenticated:
+        return ANONYMOUS
+    key = _principal_key(user.pk, _principal_version())
+    principal = cache.get(key)
+    if principal is None:
+        principal = build_principal(user.pk)
+        cache.set(key, principal, PRINCIPAL_TIMEOUT)
+    return principal
+
+
+def invalidate_principal(user_id):
+    """Сбросить профиль одного пользователя (изменился его ученик или преподаватель)"""
+    if user_id:
+        cache.delete(_principal_key(user_id, _principal_version()))
+
+
+def invalidate_all_principals():
+    """Сбросить профили всех пользователей (изменилась группа или её преподаватель)"""
+    try:
+        cache.incr(PRINCIPAL_VERSION_KEY)
+    except ValueError:
+        cache.set(PRINCIPAL_VERSION_KEY, 2, None)
+
+
+class PrincipalMiddleware:
+    """request.principal - профиль пользователя, загружаемый при первом обращении"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.principal = SimpleLazyObject(lambda: get_principal(request.user))
+        return self.get_response(request)
+
+
+def principal(request):
+    """Контекст-процессор: principal в шаблонах"""
+    return {'principal': getattr(request, 'principal', ANONYMOUS)}
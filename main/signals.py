@@ -0,0 +1,200 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .computed_cache import GRADEBOOK, GROUP_HISTORY, bump_version
+from .dashboard import invalidate_all_lessons, invalidate_student_lessons
+from .models import (
+    GradebookEntry, Group, GroupHistory, Lesson, LessonStats, LessonTask, SnapshotDate, Student, StudentTimeline, Teacher,
+)
+from .principal import invalidate_all_principals, invalidate_principal
+from .timeline import refresh_all_timelines, refresh_student_timelines
+
+_history_updates = threading.local()
+
+
+@contextmanager
+def deferred_history_updates():
+    """
+    Отложить пересчёт интервалов и линий статистики до конца массовой операции.
+
+    Внутри блока сигналы GroupHistory только копят затронутых учеников;
+    при выходе всё пересчитывается один раз.
+    """
+    if getattr(_history_updates, 'student_ids', None) is not None:
+        yield
+        return
+    _history_updates.student_ids = set()
+    try:
+        yield
+        student_ids = _history_updates.student_ids
+    finally:
+        _history_updates.student_ids = None
+    GroupHistory.rebuild_intervals(student_ids)
+    refresh_all_timelines()
+
+
+def _deferred(student_ids):
+    """Если идёт массовая операция - запомнить учеников и пропустить пересчёт"""
+    pending = getattr(_history_updates, 'student_ids', None)
+    if pending is None:
+        return False
+    pending.update(student_ids)
+    return True
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+def lesson_changed(sender, instance, **kwargs):
+    """
+    Изменился список или активность уроков - сбрасываем сводки всех учеников.
+
+    Кэш теории сбрасывать не нужно: хэш теории входит в ключ фрагмента,
+    новая теория сразу получает новый ключ, старый истекает сам.
+    """
+    invalidate_all_lessons()
+    bump_version(GRADEBOOK)
+
+
+@receiver([post_save, post_delete], sender=LessonTask)
+def lesson_task_changed(sender, instance, **kwargs):
+    """Сдача теста (check_answers) меняет статус урока у ученика и таблицу результатов"""
+    invalidate_student_lessons(instance.student_id)
+    bump_version(GRADEBOOK)
+
+
+@receiver(post_save, sender=LessonTask)
+def lesson_task_created(sender, instance, created, **kwargs):
+    """Новое задание увеличивает счётчик заданий урока"""
+    if created:
+        LessonStats.add_tasks(instance.lesson_id, 1)
+
+
+@receiver(post_delete, sender=LessonTask)
+def lesson_task_deleted(sender, instance, **kwargs):
+    """Удалённое задание (в том числе каскадом с учеником) уменьшает счётчик заданий урока"""
+    LessonStats.add_tasks(instance.lesson_id, -1)
+
+
+@receiver(post_save, sender=LessonTask)
+def lesson_task_graded(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """
+    Журнал и итоги повторяют оценку задания при любом сохранении:
+    проверке (check_answers), правке в админке, сбросе оценки.
+    """
+    if raw or (update_fields is not None and not {'score', 'submitted_at'} & set(update_fields)):
+        return
+    if instance.score is not None and instance.submitted_at is not None:
+        GradebookEntry.record(instance)
+    elif not created:
+        GradebookEntry.discard(instance.student_id, instance.lesson_id)
+
+
+@receiver(pre_delete, sender=LessonTask)
+def lesson_task_deleting(sender, instance, **kwargs):
+    """
+    Удалённое задание (в том числе каскадом с учеником или уроком) уходит
+    из журнала и итогов. Запись журнала снимается до удаления: при
+    каскаде она может исчезнуть раньше задания.
+    """
+    GradebookEntry.discard(instance.student_id, instance.lesson_id)
+
+
+@receiver(pre_save, sender=GroupHistory)
+def group_history_before_save(sender, instance, **kwargs):
+    """Запоминаем прежнего ученика, если запись редактируется"""
+    instance._previous_student_id = None
+    if instance.pk:
+        instance._previous_student_id = (
+            GroupHistory.objects.filter(pk=instance.pk)
+            .values_list('student_id', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=GroupHistory)
+def group_history_saved(sender, instance, **kwargs):
+    """
+    Обновляем интервалы действия записей ученика и линии статистики.
+
+    Дата записи регистрируется как срез; новый срез добавляет точку всем
+    ученикам (пересборку делает сигнал SnapshotDate), иначе достаточно
+    пересобрать затронутых.
+    """
+    student_ids = {instance.student_id}
+    previous_student_id = getattr(instance, '_previous_student_id', None)
+    if previous_student_id:
+        student_ids.add(previous_student_id)
+
+    deferred = _deferred(student_ids)
+    if not deferred:
+        # Интервалы - до регистрации среза: сигнал нового среза сразу строит линии по ним
+        GroupHistory.rebuild_intervals(student_ids)
+    _, new_snapshot = SnapshotDate.objects.get_or_create(date=instance.transfer_date)
+    if deferred:
+        return
+
+    if not new_snapshot:
+        refresh_student_timelines(student_ids)
+    bump_version(GROUP_HISTORY)
+
+
+@receiver(post_delete, sender=GroupHistory)
+def group_history_deleted(sender, instance, **kwargs):
+    if _deferred([instance.student_id]):
+        return
+    GroupHistory.rebuild_intervals([instance.student_id])
+    refresh_student_timelines([instance.student_id])
+    bump_version(GROUP_HISTORY)
+
+
+@receiver([post_save, post_delete], sender=SnapshotDate)
+def snapshot_date_changed(sender, instance, **kwargs):
+    """Набор ключевых дат изменился - точки сдвигаются у всех учеников"""
+    if _deferred([]):
+        return
+    refresh_all_timelines()
+
+
+@receiver(post_save, sender=Student)
+def student_saved(sender, instance, **kwargs):
+    """ФИО в готовой линии должно совпадать с карточкой ученика"""
+    StudentTimeline.objects.filter(student_id=instance.pk).exclude(name=instance.full_name).update(
+        name=instance.full_name
+    )
+
+
+@receiver([post_save, post_delete], sender=Student)
+def student_changed(sender, instance, **kwargs):
+    """Состав групп и таблица результатов строятся по карточкам учеников"""
+    bump_version(GROUP_HISTORY, GRADEBOOK)
+
+
+@receiver(pre_save, sender=Student)
+def student_before_save(sender, instance, **kwargs):
+    """Запоминаем прежнего пользователя, если ученика привязали к другому"""
+    instance._previous_user_id = None
+    if instance.pk:
+        instance._previous_user_id = (
+            Student.objects.filter(pk=instance.pk)
+            .values_list('user_id', flat=True)
+            .first()
+        )
+
+
+@receiver([post_save, post_delete], sender=Student)
+def student_principal_changed(sender, instance, **kwargs):
+    """Профиль в request.principal должен совпадать с карточкой ученика"""
+    invalidate_principal(instance.user_id)
+    previous_user_id = getattr(instance, '_previous_user_id', None)
+    if previous_user_id != instance.user_id:
+        invalidate_principal(previous_user_id)
+
+
+@receiver([post_save, post_delete], sender=Teacher)
+@receiver([post_save, post_delete], sender=Group)
+def group_or_teacher_changed(sender, instance, **kwargs):
+    """Преподаватель и группа входят в профили многих учеников и в статистику - сбрасываем всё"""
+    invalidate_all_principals()
+    bump_version(GROUP_HISTORY, GRADEBOOK)
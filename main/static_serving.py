@@ -0,0 +1,193 @@
+"""
+Отдача статических файлов с предварительным сжатием.
+
+Рядом с файлом лежат сжатые копии (file.js.br, file.js.gz), созданные
+при сборке (precompress). Запросу отдаётся лучшая копия из тех, что
+клиент принимает в Accept-Encoding, с ETag и Cache-Control: файлы с
+хэшем содержимого в имени кэшируются навсегда, остальные - ненадолго.
+
+Используется представлением lesson_asset, хранилищем статики для
+collectstatic и WSGI-обёрткой StaticFilesMiddleware из wsgi.py.
+"""
+import gzip
+import mimetypes
+import os
+import re
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import parse_etags
+
+try:
+    import brotli
+except ImportError:  # Brotli необязателен - тогда только gzip
+    brotli = None
+
+# Порядок предпочтения сжатых копий
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+# Файлы с хэшем содержимого в имени не меняются никогда
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Файлы без хэша в имени браузер перепроверяет по ETag раз в час
+REVALIDATE_CACHE_CONTROL = 'public, max-age=3600'
+# Мелкие файлы не сжимаем - заголовки съедят выигрыш
+MIN_COMPRESS_SIZE = 256
+# Текстовые форматы; картинки и шрифты woff уже сжаты
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.svg', '.json', '.map', '.txt', '.html', '.xml', '.ico',
+                           '.ttf', '.otf', '.eot'}
+# Имя после ManifestStaticFilesStorage: base.3f2a9c1d07e4.css
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+
+def accepted_encodings(accept_encoding):
+    """Кодировки из заголовка Accept-Encoding, кроме явно запрещённых (q=0)"""
+    accepted = set()
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        params = params.replace(' ', '')
+        if name and params not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(name.lower())
+    return accepted
+
+
+def select_variant(path, accept_encoding):
+    """Путь к лучшей сжатой копии файла и её кодировка (или исходный файл и None)"""
+    accepted = accepted_encodings(accept_encoding)
+    for encoding, suffix in ENCODINGS:
+        if (encoding in accepted or '*' in accepted) and os.path.isfile(path + suffix):
+            return path + suffix, encoding
+    return path, None
+
+
+def file_etag(path, encoding=None):
+    """ETag по времени изменения и размеру, как у Apache; у сжатой копии свой"""
+    stat = os.stat(path)
+    suffix = f'-{encoding}' if encoding else ''
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}{suffix}"'
+
+
+def content_type(path):
+    mime, _ = mimetypes.guess_type(path)
+    if mime and (mime.startswith('text/') or mime in ('application/javascript', 'application/json')):
+        return f'{mime}; charset=utf-8'
+    return mime or 'application/octet-stream'
+
+
+def precompress(path):
+    """
+    Записать рядом с файлом .gz (и .br, если установлен brotli).
+
+    Копия не создаётся, если файл мал или сжатие не уменьшает его.
+    Возвращает список созданных файлов.
+    """
+    with open(path, 'rb') as source:
+        data = source.read()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return []
+
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data)))
+
+    written = []
+    for suffix, compressed in variants:
+        if len(compressed) >= len(data):
+            continue
+        with open(path + suffix, 'wb') as target:
+            target.write(compressed)
+        written.append(path + suffix)
+    return written
+
+
+def cache_control_for(name):
+    return IMMUTABLE_CACHE_CONTROL if HASHED_NAME_RE.search(name) else REVALIDATE_CACHE_CONTROL
+
+
+def serve_file(request, path, cache_control=IMMUTABLE_CACHE_CONTROL):
+    """Ответ Django с файлом: сжатая копия по Accept-Encoding, ETag и 304"""
+    variant, encoding = select_variant(path, request.headers.get('Accept-Encoding'))
+    etag = file_etag(variant, encoding)
+
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(open(variant, 'rb'), content_type=content_type(path))
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хэшем в именах (collectstatic) и сжатыми копиями текстовых файлов"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # Сжимаются и файлы с хэшем, и исходные имена - на них ссылаются сторонние CSS
+        for name in set(paths) | set(self.hashed_files.values()):
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                precompress(self.path(name))
+
+
+class StaticFilesMiddleware:
+    """
+    WSGI-обёртка: отдаёт статику и файлы теории уроков, не заходя в Django.
+
+    Нужна, когда Apache не находит файл сам (.htaccess передаёт такие
+    запросы в wsgi.py): например, имя с хэшем после collectstatic.
+    """
+
+    def __init__(self, application, directories=None):
+        self.application = application
+        # (префикс URL, каталог, все ли имена содержат хэш)
+        if directories is None:
+            directories = [
+                (settings.STATIC_URL, str(settings.STATIC_ROOT), False),
+                (settings.LESSON_ASSETS_URL, str(settings.LESSON_ASSETS_ROOT), True),
+            ]
+        self.directories = directories
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') in ('GET', 'HEAD'):
+            path, cache_control = self.find_file(environ.get('PATH_INFO', ''))
+            if path is not None:
+                return self.serve(environ, start_response, path, cache_control)
+        return self.application(environ, start_response)
+
+    def find_file(self, path_info):
+        """Путь к файлу и Cache-Control для него; (None, None) - запрос не к статике"""
+        for prefix, root, hashed in self.directories:
+            if not path_info.startswith(prefix):
+                continue
+            try:
+                path = safe_join(root, path_info[len(prefix):])
+            except SuspiciousFileOperation:  # выход за пределы каталога - пусть ответит Django
+                break
+            if os.path.isfile(path):
+                return path, IMMUTABLE_CACHE_CONTROL if hashed else cache_control_for(path)
+        return None, None
+
+    def serve(self, environ, start_response, path, cache_control):
+        variant, encoding = select_variant(path, environ.get('HTTP_ACCEPT_ENCODING'))
+        etag = file_etag(variant, encoding)
+        headers = [('ETag', etag), ('Cache-Control', cache_control), ('Vary', 'Accept-Encoding')]
+        if etag in parse_etags(environ.get('HTTP_IF_NONE_MATCH', '')):
+            start_response('304 Not Modified', headers)
+            return []
+
+        headers.append(('Content-Type', content_type(path)))
+        headers.append(('Content-Length', str(os.path.getsize(variant))))
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        file_wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+        return file_wrapper(open(variant, 'rb'))
@@ -0,0 +1,243 @@
+"""
+Синтетическая школа для нагрузочного тестирования и подбора хостинга.
+
+Все создаваемые объекты помечены: логины начинаются с SYNTHETIC_PREFIX,
+названия уроков - с LESSON_TITLE_PREFIX, поэтому clear_synthetic_school
+удаляет только их и не трогает настоящих учеников.
+
+Уроки по умолчанию создаются неактивными: группы общие с настоящими
+учениками, и активный синтетический урок появился бы у них на главной.
+Активные уроки (нужны нагрузочному прогону) - только в базе без
+настоящих учеников и уроков, см. has_real_data.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .grading import default_checker, normalize_answer
+from .gradebook import rebuild_gradebook_summary
+from .models import (
+    Group, GroupHistory, Lesson, LessonStats, LessonTask, SnapshotDate, Student, TaskAttempt, Teacher,
+)
+from .task_generators import GENERATORS
+from .timeline import refresh_all_timelines
+
+SYNTHETIC_PREFIX = 'synth_'
+SYNTHETIC_PASSWORD = 'synthetic'
+TEACHER_USERNAME = f'{SYNTHETIC_PREFIX}teacher'
+LESSON_TITLE_PREFIX = 'Синтетический урок'
+
+GROUP_NUMBERS = [1, 2, 2.1, 2.2, 3]
+CLASS_NAMES = ['5А', '5Б', '5В', '5Г']
+# Вероятность перейти в соседнюю группу на очередной дате среза
+TRANSFER_PROBABILITY = 0.15
+# Доля заданий, оставленных без ответа
+BLANK_PROBABILITY = 0.05
+
+
+def history_dates(today=None):
+    """Даты срезов текущего учебного года"""
+    today = today or date.today()
+    year = today.year if today.month >= 9 else today.year - 1
+    return [date(year, 9, 1), date(year, 10, 15), date(year, 12, 16), date(year + 1, 2, 1)]
+
+
+def wrong_answer(task, rng):
+    """Правдоподобная ошибка: соседний числитель, не та целая часть, обратный знак"""
+    key = normalize_answer(task['answer'])
+    if key[0] == 'frac':
+        _, numerator, denominator = key
+        return f'{numerator + rng.choice([-1, 1])}/{denominator}'
+    if key[0] == 'mixed':
+        _, whole, numerator, denominator = key
+        return f'{whole + rng.choice([-1, 1])} {numerator}/{denominator}'
+    if key[0] == 'int':
+        return str(key[1] + 1)
+    swapped = {'proper': 'improper', 'improper': 'proper', '<': '>', '>': '<', '=': '<'}
+    return swapped.get(key[1], '')
+
+
+def plausible_answers(tasks, ability, rng):
+    """Ответы ученика с вероятностью успеха ability (ниже на сложных заданиях)"""
+    answers = {}
+    for i, task in enumerate(tasks):
+        chance = ability * (0.7 if task.get('difficulty') == 'hard' else 1)
+        if rng.random() < BLANK_PROBABILITY:
+            answers[str(i)] = ''
+        elif rng.random() < chance:
+            answers[str(i)] = task['answer']
+        else:
+            answers[str(i)] = wrong_answer(task, rng)
+    return answers
+
+
+def clear_synthetic_school():
+    """Удалить синтетических учеников, преподавателя и уроки; возвращает число удалённых объектов"""
+    with transaction.atomic():
+        deleted, _ = User.objects.filter(username__startswith=SYNTHETIC_PREFIX).delete()
+        lessons_deleted, _ = Lesson.objects.filter(title__startswith=LESSON_TITLE_PREFIX).delete()
+        rebuild_gradebook_summary()
+    refresh_all_timelines()
+    return deleted + lessons_deleted
+
+
+def has_real_data():
+    """Есть ли в базе настоящие (не синтетические) ученики или уроки"""
+    return (
+        Student.objects.exclude(user__username__startswith=SYNTHETIC_PREFIX).exists()
+        or Lesson.objects.exclude(title__startswith=LESSON_TITLE_PREFIX).exists()
+    )
+
+
+def _create_students(count, groups, dates, rng):
+    """Пользователи и ученики с путём по группам; возвращает учеников и записи истории"""
+    offset = User.objects.filter(username__startswith=SYNTHETIC_PREFIX).count()
+    # Хэш пароля считается один раз - PBKDF2 на тысячи пользователей слишком медленный
+    password = make_password(SYNTHETIC_PASSWORD)
+    usernames = [f'{SYNTHETIC_PREFIX}{offset + i:05d}' for i in range(count)]
+    User.objects.bulk_create([User(username=username, password=password) for username in usernames])
+    users = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+
+    paths = []
+    students = []
+    for i, username in enumerate(usernames):
+        position = rng.randrange(len(groups))
+        path = [position]
+        for _ in dates[1:]:
+            if rng.random() < TRANSFER_PROBABILITY:
+                position = min(max(position + rng.choice([-1, 1]), 0), len(groups) - 1)
+            path.append(position)
+        paths.append(path)
+        students.append(Student(
+            user_id=users[username],
+            full_name=f'Синтетический Ученик {offset + i:05d}',
+            class_name=rng.choice(CLASS_NAMES),
+            current_group=groups[path[-1]],
+        ))
+    Student.objects.bulk_create(students, batch_size=500)
+    students = list(Student.objects.filter(user_id__in=users.values()).order_by('user_id'))
+
+    history = [
+        GroupHistory(student=student, group=groups[position], transfer_date=transfer_date,
+                     reason='Синтетические данные')
+        for student, path in zip(students, paths)
+        for step, (position, transfer_date) in enumerate(zip(path, dates))
+        # В историю пишутся только настоящие переходы
+        if step == 0 or position != path[step - 1]
+    ]
+    GroupHistory.objects.bulk_create(history, batch_size=500)
+    return students, len(history)
+
+
+def _free_lesson_dates(count):
+    """Даты уроков раз в неделю назад от сегодняшнего дня, не занятые другими уроками"""
+    taken = set(Lesson.objects.values_list('date', flat=True))
+    dates = []
+    day = date.today()
+    while len(dates) < count:
+        if day not in taken:
+            dates.append(day)
+        day -= timedelta(days=7)
+    return sorted(dates)
+
+
+def _create_lesson_tasks(lesson, students, abilities, submitted_share, rng):
+    """Задания урока всем ученикам; часть сдана с правдоподобными ответами"""
+    submitted_at = timezone.make_aware(datetime.combine(lesson.date, time(10, 0)))
+    lesson_tasks = []
+    grades = {}
+    for student in students:
+        lesson_task = LessonTask(lesson=lesson, student=student)
+        lesson_task.assign_tasks(lesson.task_generator, seed=rng.getrandbits(62))
+        if rng.random() < submitted_share:
+            tasks = lesson_task.get_tasks()
+            answers = plausible_answers(tasks, abilities[student.pk], rng)
+            result = default_checker.grade(tasks, answers)
+            lesson_task.answers = answers
+            lesson_task.score = result.score
+            lesson_task.correct_count = result.correct_count
+            lesson_task.submitted_at = submitted_at + timedelta(seconds=rng.randrange(40 * 60))
+            grades[student.pk] = (tasks, result.items)
+        lesson_tasks.append(lesson_task)
+    LessonTask.objects.bulk_create(lesson_tasks, batch_size=500)
+    LessonStats.add_tasks(lesson.pk, len(lesson_tasks))
+
+    # bulk_create не везде возвращает id - перечитываем их для строк TaskAttempt
+    task_ids = dict(
+        LessonTask.objects.filter(lesson=lesson, student_id__in=grades).values_list('student_id', 'id')
+    )
+    attempts = []
+    for lesson_task in lesson_tasks:
+        if lesson_task.student_id in grades:
+            lesson_task.pk = task_ids[lesson_task.student_id]
+            tasks, items = grades[lesson_task.student_id]
+            attempts.extend(TaskAttempt.build(lesson_task, tasks, items, lesson_task.student.current_group_id))
+    TaskAttempt.objects.bulk_create(attempts, batch_size=1000)
+    return len(lesson_tasks), len(grades)
+
+
+def generate_synthetic_school(students=500, lessons=10, submitted_share=0.85, seed=None, active_lessons=False):
+    """
+    Создать синтетическую школу: учеников с историей переходов по группам,
+    уроки разными генераторами и сданные работы с правдоподобными ответами.
+
+    Уроки неактивны, если не передан active_lessons; проверку, что в базе
+    нет настоящих данных, делает вызывающий (has_real_data).
+
+    Журнал, итоги и линии статистики пересобираются в конце. Возвращает
+    словарь с количеством созданных объектов.
+    """
+    rng = random.Random(seed)
+    dates = history_dates()
+
+    with transaction.atomic():
+        teacher_user, created = User.objects.get_or_create(username=TEACHER_USERNAME)
+        if created:
+            teacher_user.set_password(SYNTHETIC_PASSWORD)
+            teacher_user.save()
+        teacher, _ = Teacher.objects.get_or_create(user=teacher_user,
+                                                   defaults={'full_name': 'Синтетический Преподаватель'})
+        groups = [
+            Group.objects.get_or_create(number=number, defaults={'teacher': teacher})[0]
+            for number in GROUP_NUMBERS
+        ]
+
+        student_rows, history_count = _create_students(students, groups, dates, rng)
+        SnapshotDate.objects.bulk_create([SnapshotDate(date=d) for d in dates], ignore_conflicts=True)
+        GroupHistory.rebuild_intervals([student.pk for student in student_rows])
+
+        # Уровень ученика: чем выше группа, тем чаще верные ответы
+        level = {group.pk: i for i, group in enumerate(groups)}
+        abilities = {
+            student.pk: min(0.97, max(0.2, rng.gauss(0.45 + 0.1 * level[student.current_group_id], 0.15)))
+            for student in student_rows
+        }
+
+        generator_keys = sorted(GENERATORS)
+        tasks_count = submitted_count = 0
+        for number, lesson_date in enumerate(_free_lesson_dates(lessons), start=1):
+            lesson = Lesson.objects.create(
+                title=f'{LESSON_TITLE_PREFIX} {number}',
+                date=lesson_date,
+                theory_content=f'<p>Теория к синтетическому уроку {number}.</p>',
+                task_generator=generator_keys[number % len(generator_keys)],
+                is_active=active_lessons,
+            )
+            created, submitted = _create_lesson_tasks(lesson, student_rows, abilities, submitted_share, rng)
+            tasks_count += created
+            submitted_count += submitted
+
+        rebuild_gradebook_summary()
+    refresh_all_timelines()
+
+    return {
+        'students': len(student_rows),
+        'history': history_count,
+        'lessons': lessons,
+        'tasks': tasks_count,
+        'submitted': submitted_count,
+    }
@@ -0,0 +1,282 @@
+"""
+Генераторы индивидуальных заданий к урокам.
+
+Тип заданий выбирается полем Lesson.task_generator. Общие таблицы
+(знаменатели, результаты действий над парами дробей) считаются один раз
+при импорте модуля и используются всеми генераторами. К каждому
+заданию добавляется канонический ключ ответа (см. grading.normalize_answer).
+"""
+import random
+from fractions import Fraction
+from functools import lru_cache
+
+from .grading import with_answer_keys
+
+# Текущая версия каждого генератора по ключу
+GENERATORS = {}
+# Все версии: (ключ, версия) -> генератор; старые версии нужны для заданий, сохранённых как seed
+GENERATOR_VERSIONS = {}
+
+# Удобные знаменатели для заданий с разными знаменателями
+DENOMINATORS = (2, 3, 4, 5, 6, 8, 10, 12)
+OTHER_DENOMINATORS = {d: tuple(x for x in DENOMINATORS if x != d) for d in DENOMINATORS}
+
+
+def _compare(first, second):
+    if first > second:
+        return '>'
+    if first < second:
+        return '<'
+    return '='
+
+
+def _fraction_str(value):
+    return f"{value.numerator}/{value.denominator}"
+
+
+def _build_pair_table():
+    """
+    Все пары правильных дробей с разными знаменателями из DENOMINATORS:
+    (n1, d1, n2, d2) -> (знак сравнения, сумма, модуль разности).
+    """
+    table = {}
+    for d1 in DENOMINATORS:
+        for d2 in OTHER_DENOMINATORS[d1]:
+            for n1 in range(1, d1):
+                for n2 in range(1, d2):
+                    f1, f2 = Fraction(n1, d1), Fraction(n2, d2)
+                    table[(n1, d1, n2, d2)] = (_compare(f1, f2), _fraction_str(f1 + f2), _fraction_str(abs(f1 - f2)))
+    return table
+
+
+PAIR_TABLE = _build_pair_table()
+
+
+def register_generator(cls):
+    """Декоратор: добавить генератор в реестр по его key и version"""
+    generator = cls()
+    GENERATOR_VERSIONS[(cls.key, cls.version)] = generator
+    current = GENERATORS.get(cls.key)
+    if current is None or current.version < cls.version:
+        GENERATORS[cls.key] = generator
+    return cls
+
+
+def get_generator(key, version=None):
+    if version is None:
+        return GENERATORS[key]
+    return GENERATOR_VERSIONS[(key, version)]
+
+
+def new_seed():
+    """Случайный seed, помещающийся в BigIntegerField"""
+    return random.getrandbits(62)
+
+
+@lru_cache(maxsize=4096)
+def tasks_from_seed(key, version, seed):
+    """
+    Детерминированно восстановить набор заданий по генератору и seed.
+
+    Результат кэшируется в процессе и общий для всех вызовов -
+    список и словари внутри не изменять.
+    """
+    return with_answer_keys(get_generator(key, version).generate(random.Random(seed)))
+
+
+def has_hard_task(tasks):
+    """Есть ли в наборе задание повышенной сложности"""
+    return any(task.get('difficulty') == 'hard' for task in tasks)
+
+
+def generator_choices():
+    """Варианты для поля Lesson.task_generator"""
+    return [(key, generator.title) for key, generator in GENERATORS.items()]
+
+
+class TaskGenerator:
+    """
+    Базовый генератор: generate(rng) возвращает список заданий-словарей.
+
+    version увеличивается при любом изменении generate, которое меняет
+    задания для того же seed; старую версию оставляют в реестре.
+    """
+    key = None
+    version = 1
+    title = ''
+
+    def generate(self, rng):
+        raise NotImplementedError
+
+
+@register_generator
+class MixedFractionsGenerator(TaskGenerator):
+    """Урок 1: смешанные и неправильные дроби"""
+    key = 'mixed_fractions'
+    title = 'Смешанные и неправильные дроби'
+
+    def generate(self, rng):
+        tasks = []
+
+        # 3 задания на классификацию (правильная/неправильная)
+        for _ in range(3):
+            numerator = rng.randint(1, 20)
+            denominator = rng.randint(2, 15)
+            tasks.append({
+                'type': 'classify',
+                'numerator': numerator,
+                'denominator': denominator,
+                'answer': 'proper' if numerator < denominator else 'improper'
+            })
+
+        # 3 задания: смешанная → неправильная
+        for _ in range(3):
+            whole = rng.randint(1, 10)
+            numerator = rng.randint(1, 8)
+            denominator = rng.randint(2, 9)
+            tasks.append({
+                'type': 'mixed_to_improper',
+                'whole': whole,
+                'numerator': numerator,
+                'denominator': denominator,
+                'answer': f"{whole * denominator + numerator}/{denominator}"
+            })
+
+        # 4 задания: неправильная → смешанная
+        for _ in range(4):
+            denominator = rng.randint(2, 9)
+            whole = rng.randint(1, 8)
+            numerator = rng.randint(1, denominator - 1)
+            tasks.append({
+                'type': 'improper_to_mixed',
+                'numerator': whole * denominator + numerator,
+                'denominator': denominator,
+                'answer': f"{whole} {numerator}/{denominator}"
+            })
+
+        return tasks
+
+
+@register_generator
+class ComparisonGenerator(TaskGenerator):
+    """Урок 2: сравнение и сокращение дробей"""
+    key = 'comparison'
+    title = 'Сравнение и сокращение дробей'
+
+    def generate(self, rng):
+        tasks = []
+
+        # 3 задания на сокращение дробей
+        for _ in range(3):
+            gcd_value = rng.choice((2, 3, 4, 5, 6))
+            numerator_reduced = rng.randint(1, 8)
+            denominator_reduced = rng.randint(numerator_reduced + 1, 12)
+            tasks.append({
+                'type': 'reduce',
+                'numerator': numerator_reduced * gcd_value,
+                'denominator': denominator_reduced * gcd_value,
+                'answer': f"{numerator_reduced}/{denominator_reduced}"
+            })
+
+        # 3 задания на сравнение дробей с одинаковым знаменателем
+        for _ in range(3):
+            denominator = rng.randint(5, 15)
+            num1, num2 = rng.sample(range(1, denominator), 2)
+            tasks.append({
+                'type': 'compare_same_denom',
+                'numerator1': num1,
+                'denominator1': denominator,
+                'numerator2': num2,
+                'denominator2': denominator,
+                'answer': _compare(num1, num2)
+            })
+
+        # 3 задания на сравнение дробей с разными знаменателями
+        for _ in range(3):
+            denom1 = rng.choice(DENOMINATORS)
+            denom2 = rng.choice(OTHER_DENOMINATORS[denom1])
+            num1 = rng.randint(1, denom1 - 1)
+            num2 = rng.randint(1, denom2 - 1)
+            tasks.append({
+                'type': 'compare_diff_denom',
+                'numerator1': num1,
+                'denominator1': denom1,
+                'numerator2': num2,
+                'denominator2': denom2,
+                'answer': PAIR_TABLE[(num1, denom1, num2, denom2)][0]
+            })
+
+        # 1 задание повышенной сложности (обязательно для 7): сокращение с большими числами
+        gcd_large = rng.choice((6, 8, 9, 12, 15))
+        num_base = rng.randint(3, 10)
+        denom_base = rng.randint(num_base + 2, 15)
+        tasks.append({
+            'type': 'reduce_hard',
+            'numerator': num_base * gcd_large,
+            'denominator': denom_base * gcd_large,
+            'answer': f"{num_base}/{denom_base}",
+            'difficulty': 'hard',
+            'points': 2  # Это задание даёт 2 балла вместо 1
+        })
+
+        return tasks
+
+
+@register_generator
+class AddSubGenerator(TaskGenerator):
+    """Урок 3: сложение и вычитание дробей с разными знаменателями"""
+    key = 'add_sub'
+    title = 'Сложение и вычитание дробей'
+
+    # Пары знаменателей для задачи повышенной сложности
+    HARD_PAIRS = ((6, 8), (8, 10), (6, 10), (4, 6), (8, 12))
+
+    def _random_pair(self, rng):
+        d1 = rng.choice(DENOMINATORS)
+        d2 = rng.choice(OTHER_DENOMINATORS[d1])
+        return rng.randint(1, d1 - 1), d1, rng.randint(1, d2 - 1), d2
+
+    def generate(self, rng):
+        tasks = []
+
+        # 5 задач на сложение (разные знаменатели)
+        for _ in range(5):
+            n1, d1, n2, d2 = self._random_pair(rng)
+            tasks.append({
+                'type': 'add_diff_denom',
+                'numerator1': n1,
+                'denominator1': d1,
+                'numerator2': n2,
+                'denominator2': d2,
+                'answer': PAIR_TABLE[(n1, d1, n2, d2)][1]
+            })
+
+        # 4 задачи на вычитание (разные знаменатели), из большей дроби
+        for _ in range(4):
+            n1, d1, n2, d2 = self._random_pair(rng)
+            if PAIR_TABLE[(n1, d1, n2, d2)][0] == '<':
+                n1, d1, n2, d2 = n2, d2, n1, d1
+            tasks.append({
+                'type': 'sub_diff_denom',
+                'numerator1': n1,
+                'denominator1': d1,
+                'numerator2': n2,
+                'denominator2': d2,
+                'answer': PAIR_TABLE[(n1, d1, n2, d2)][2]
+            })
+
+        # 1 задача посложнее
+        d1, d2 = rng.choice(self.HARD_PAIRS)
+        n1 = rng.randint(d1 // 2 + 1, d1 - 1)
+        n2 = rng.randint(1, d2 // 2)
+        tasks.append({
+            'type': 'add_diff_denom',
+            'numerator1': n1,
+            'denominator1': d1,
+            'numerator2': n2,
+            'denominator2': d2,
+            'answer': PAIR_TABLE[(n1, d1, n2, d2)][1],
+            'difficulty': 'hard'
+        })
+
+        return tasks
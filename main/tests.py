@@ -1,3 +1,875 @@
-from django.test import TestCase
+"""
+Регрессионные тесты числа SQL-запросов.
 
-# Create your tests here.
+Каждая страница открывается на маленькой (10 учеников) и большой
+(1000 учеников) школе с одной и той же верхней границей: если число
+запросов растёт вместе с числом учеников, вернулся N+1.
+"""
+import gzip
+import json
+import logging
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import computed_cache
+from .analytics import group_transitions
+from .computed_cache import GROUP_HISTORY, bump_version, cached_computation
+from .dashboard import get_student_lessons
+from .gradebook import rebuild_gradebook_summary
+from .grading_queue import grade_submission
+from .lesson_assets import build_lesson, extract_assets
+from .static_serving import CompressedManifestStaticFilesStorage, StaticFilesMiddleware
+from .models import (
+    GradebookEntry, Group, GroupHistory, GroupProgress, Lesson, LessonStats, LessonTask, SnapshotDate, Student,
+    StudentProgress, Teacher,
+)
+from .performance import PerformanceLogHandler, endpoint_report, read_log_records
+from .principal import get_principal
+from .timeline import refresh_all_timelines
+from .views import lesson_asset
+
+GROUP_NUMBERS = [1, 2, 2.1, 2.2, 3]
+HISTORY_DATES = [date(2025, 9, 1), date(2025, 10, 15), date(2025, 12, 16)]
+
+
+# Фабрики тестовых данных: массовые вставки, чтобы школа на 1000 учеников
+# создавалась за секунды; сводные таблицы пересобираются в конце.
+
+def make_teacher(username='teacher'):
+    user = User.objects.create_user(username, password='password')
+    return Teacher.objects.create(user=user, full_name=f'Преподаватель {username}')
+
+
+def make_groups(teacher):
+    return [Group.objects.create(number=number, teacher=teacher) for number in GROUP_NUMBERS]
+
+
+def make_students(count, groups):
+    Student.objects.bulk_create([
+        Student(full_name=f'Ученик {i:04d}', class_name='5А', current_group=groups[i % len(groups)])
+        for i in range(count)
+    ])
+    return list(Student.objects.order_by('id'))
+
+
+def make_history(students, groups):
+    """Три записи истории на ученика: каждую дату ученик переходит в следующую группу"""
+    GroupHistory.objects.bulk_create([
+        GroupHistory(student=student, group=groups[(i + step) % len(groups)], transfer_date=transfer_date)
+        for i, student in enumerate(students)
+        for step, transfer_date in enumerate(HISTORY_DATES)
+    ])
+    SnapshotDate.objects.bulk_create([SnapshotDate(date=d) for d in HISTORY_DATES])
+    GroupHistory.rebuild_intervals([student.pk for student in students])
+    refresh_all_timelines()
+
+
+def make_lesson(lesson_date, title='Урок', task_generator='mixed_fractions'):
+    return Lesson.objects.create(title=title, date=lesson_date, theory_content='<p>Теория</p>',
+                                 task_generator=task_generator)
+
+
+def submit_lesson(lesson, scores):
+    """Подготовить задания урока и проставить всем ученикам сданные работы"""
+    LessonTask.provision(lesson)
+    lesson_tasks = list(LessonTask.objects.filter(lesson=lesson).order_by('student_id'))
+    now = timezone.now()
+    for i, lesson_task in enumerate(lesson_tasks):
+        lesson_task.answers = {'0': 'proper'}
+        lesson_task.score = scores[i % len(scores)]
+        lesson_task.correct_count = lesson_task.score
+        lesson_task.submitted_at = now
+    LessonTask.objects.bulk_update(lesson_tasks, ['answers', 'score', 'correct_count', 'submitted_at'],
+                                   batch_size=500)
+
+
+def build_school(students_count):
+    """Преподаватель, пять групп, ученики с историей, два сданных урока и один открытый"""
+    teacher = make_teacher()
+    groups = make_groups(teacher)
+    students = make_students(students_count, groups)
+    make_history(students, groups)
+
+    submitted = [make_lesson(date(2026, 1, day), title=f'Урок {day}') for day in (10, 17)]
+    for lesson in submitted:
+        submit_lesson(lesson, scores=[3, 5, 7])
+    rebuild_gradebook_summary()
+
+    open_lesson = make_lesson(date(2026, 1, 24), title='Открытый урок', task_generator='comparison')
+    LessonTask.provision(open_lesson)
+
+    student = students[0]
+    student.user = User.objects.create_user('student', password='password')
+    student.save()
+
+    User.objects.create_superuser('admin', 'admin@example.com', 'password')
+    return {
+        'teacher': teacher,
+        'student': student,
+        'submitted_lesson': submitted[0],
+        'open_lesson': open_lesson,
+    }
+
+
+class QueryCountMixin:
+    """Верхние границы числа запросов; одинаковы для любого размера школы"""
+    STUDENTS = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = build_school(cls.STUDENTS)
+
+    def setUp(self):
+        # Меряем холодный путь - без данных, закэшированных другими тестами
+        cache.clear()
+
+    def login(self, username):
+        self.client.force_login(User.objects.get(username=username))
+
+    def assertMaxQueries(self, limit, url, method='get', data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data)
+        self.assertLess(response.status_code, 400, url)
+        self.assertLessEqual(
+            len(context), limit,
+            f'{url}: {len(context)} запросов\n' + '\n'.join(query['sql'] for query in context.captured_queries)
+        )
+        return response
+
+    def test_home(self):
+        self.login('student')
+        self.assertMaxQueries(5, reverse('home'))
+
+    def test_students(self):
+        self.login('teacher')
+        response = self.assertMaxQueries(9, reverse('students'))
+        self.assertEqual(len(response.context['results_table']), self.STUDENTS)
+
+    def test_statistics(self):
+        self.login('teacher')
+        response = self.assertMaxQueries(9, reverse('statistics'))
+        self.assertEqual(sum(row['current_count'] for row in response.context['group_stats']), self.STUDENTS)
+
+    def test_stats_overview(self):
+        self.login('teacher')
+        self.assertMaxQueries(6, reverse('stats_overview'))
+
+    def test_stats_analytics(self):
+        self.login('teacher')
+        self.assertMaxQueries(10, reverse('stats_analytics'))
+
+    def test_lesson_view(self):
+        self.login('student')
+        self.assertMaxQueries(6, reverse('lesson_view', args=[self.school['open_lesson'].date]))
+
+    @override_settings(ASYNC_GRADING=True)
+    def test_lesson_submit(self):
+        self.login('student')
+        lesson = self.school['open_lesson']
+        self.assertMaxQueries(8, reverse('lesson_view', args=[lesson.date]), method='post',
+                              data={'answer_0': '1/2'})
+
+    def test_lesson_submit_graded_inline(self):
+        # Проверка, журнал, итоги и ответы по заданиям в том же запросе
+        self.login('student')
+        lesson = self.school['open_lesson']
+        self.assertMaxQueries(29, reverse('lesson_view', args=[lesson.date]), method='post',
+                              data={'answer_0': '1/2'})
+
+    def test_lesson_result(self):
+        self.login('student')
+        self.assertMaxQueries(7, reverse('lesson_result', args=[self.school['submitted_lesson'].date]))
+
+    def test_register(self):
+        self.assertMaxQueries(3, reverse('register'))
+
+    def test_admin_changelists(self):
+        self.login('admin')
+        for model in admin.site._registry:
+            url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+            with self.subTest(model=model.__name__):
+                self.assertMaxQueries(12, url)
+
+
+class SmallSchoolQueryCountTests(QueryCountMixin, TestCase):
+    STUDENTS = 10
+
+
+class LargeSchoolQueryCountTests(QueryCountMixin, TestCase):
+    STUDENTS = 1000
+
+
+class PerformanceMonitoringTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_server_timing_header(self):
+        make_teacher()
+        self.client.force_login(User.objects.get(username='teacher'))
+        response = self.client.get(reverse('stats_overview'))
+        timing = response['Server-Timing']
+        for metric in ('sql;dur=', 'tpl;dur=', 'cache;desc="hit=', 'total;dur='):
+            self.assertIn(metric, timing)
+
+    def test_performance_report_cached(self):
+        make_teacher()
+        self.client.force_login(User.objects.get(username='teacher'))
+        with mock.patch('main.performance.read_log_records', return_value=[]) as read:
+            self.client.get(reverse('stats_performance'))
+            self.client.get(reverse('stats_performance'))
+        read.assert_called_once()
+
+    def test_performance_page_requires_teacher(self):
+        User.objects.create_user('student', password='password')
+        self.client.force_login(User.objects.get(username='student'))
+        self.assertRedirects(self.client.get(reverse('stats_performance')), reverse('home'))
+
+
+class PrincipalTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        teacher = make_teacher()
+        groups = make_groups(teacher)
+        cls.student = make_students(1, groups)[0]
+        cls.student.user = User.objects.create_user('student', password='password')
+        cls.student.save()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_resolved_once_and_cached(self):
+        user = User.objects.get(username='student')
+        with self.assertNumQueries(1):
+            principal = get_principal(user)
+            self.assertEqual(principal.student.current_group.teacher.full_name, 'Преподаватель teacher')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_principal(user).student.pk, self.student.pk)
+
+    def test_teacher(self):
+        principal = get_principal(User.objects.get(username='teacher'))
+        self.assertTrue(principal.is_teacher)
+        self.assertFalse(principal.is_student)
+
+    def test_invalidated_on_student_save(self):
+        user = User.objects.get(username='student')
+        get_principal(user)
+        self.student.full_name = 'Новое Имя'
+        self.student.save()
+        self.assertEqual(get_principal(user).full_name, 'Новое Имя')
+
+    def test_invalidated_on_teacher_save(self):
+        user = User.objects.get(username='student')
+        get_principal(user)
+        Teacher.objects.filter(user__username='teacher').get().save()
+        with self.assertNumQueries(1):
+            get_principal(user)
+
+    def test_topbar_shows_teacher_name(self):
+        self.client.force_login(User.objects.get(username='teacher'))
+        self.assertContains(self.client.get(reverse('news')), 'Преподаватель teacher')
+
+
+class GradebookSyncTests(TestCase):
+    """Журнал и итоги следуют за LessonTask при любом сохранении и удалении"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher()
+        cls.groups = make_groups(cls.teacher)
+        cls.student = make_students(1, cls.groups)[0]
+        cls.student.user = User.objects.create_user('student', password='password')
+        cls.student.save()
+        cls.lesson = make_lesson(date(2026, 1, 10))
+
+    def setUp(self):
+        cache.clear()
+        self.lesson_task = LessonTask.get_or_generate(self.lesson, self.student)
+        self.lesson_task.answers = {}
+        self.lesson_task.score = 3
+        self.lesson_task.submitted_at = timezone.now()
+        self.lesson_task.save()
+
+    def gradebook_score(self):
+        self.client.force_login(self.teacher.user)
+        response = self.client.get(reverse('students'))
+        return response.context['results_table'][0]['results'][0]['score']
+
+    def assertTotals(self, count, score_sum):
+        student_progress = StudentProgress.objects.get(pk=self.student.pk)
+        group_progress = GroupProgress.objects.get(pk=self.student.current_group_id)
+        stats = LessonStats.objects.get(pk=self.lesson.pk)
+        for row in (student_progress, group_progress):
+            self.assertEqual((row.completed_count, row.score_sum), (count, score_sum))
+        self.assertEqual((stats.submission_count, stats.score_sum), (count, score_sum))
+
+    def test_score_edit_reaches_gradebook(self):
+        self.assertEqual(self.gradebook_score(), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lesson_task.score = 7
+            self.lesson_task.save()
+        self.assertEqual(self.gradebook_score(), 7)
+        self.assertTotals(1, 7)
+        self.assertEqual(LessonStats.objects.get(pk=self.lesson.pk).histogram, [0, 0, 0, 0, 0, 0, 0, 1])
+
+    def test_home_counters_match_active_lessons(self):
+        # Проверенная работа по неактивному уроку не считается
+        inactive = make_lesson(date(2026, 1, 3))
+        inactive_task = LessonTask.get_or_generate(inactive, self.student)
+        inactive_task.score = 7
+        inactive_task.submitted_at = timezone.now()
+        inactive_task.save()
+        Lesson.objects.filter(pk=inactive.pk).update(is_active=False)
+        # Сданная, но ещё не проверенная работа считается сданной
+        pending = make_lesson(date(2026, 1, 17))
+        LessonTask.objects.create(lesson=pending, student=self.student, answers={}, submitted_at=timezone.now())
+        make_lesson(date(2026, 1, 24))
+
+        cache.clear()
+        self.client.force_login(self.student.user)
+        response = self.client.get(reverse('home'))
+        self.assertEqual((response.context['completed_count'], response.context['total_lessons']), (2, 3))
+        self.assertEqual(response.context['average'], 3)
+        self.assertContains(response, 'Сдано тестов: 2 из 3')
+
+    def test_home_cache_reset_after_commit(self):
+        get_student_lessons(self.student.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.lesson_task.score = None
+            self.lesson_task.submitted_at = None
+            self.lesson_task.save()
+            # До коммита кэш не сбрасывается: иначе его заполнили бы незакоммиченными данными
+            self.assertTrue(get_student_lessons(self.student.pk)[0]['completed'])
+        for callback in callbacks:
+            callback()
+        self.assertFalse(get_student_lessons(self.student.pk)[0]['completed'])
+
+    def test_repeated_save_not_counted_twice(self):
+        self.lesson_task.save()
+        self.assertTotals(1, 3)
+
+    def test_score_reset(self):
+        self.lesson_task.score = None
+        self.lesson_task.save()
+        self.assertFalse(GradebookEntry.objects.exists())
+        self.assertTotals(0, 0)
+
+    def test_delete(self):
+        self.lesson_task.delete()
+        self.assertFalse(GradebookEntry.objects.exists())
+        self.assertTotals(0, 0)
+
+    def test_student_delete_cascade(self):
+        group_id = self.student.current_group_id
+        Student.objects.filter(pk=self.student.pk).delete()
+        self.assertEqual(GroupProgress.objects.get(pk=group_id).completed_count, 0)
+        self.assertEqual(LessonStats.objects.get(pk=self.lesson.pk).submission_count, 0)
+
+class AutocommitGradebookTests(TransactionTestCase):
+    """
+    Сохранение и удаление задания вне atomic(): на MySQL select_for_update
+    в режиме autocommit падает с TransactionManagementError.
+    """
+
+    def setUp(self):
+        self.student = make_students(1, make_groups(make_teacher()))[0]
+        self.lesson = make_lesson(date(2026, 1, 10))
+        # SQLite не поддерживает FOR UPDATE - включаем только проверку транзакции
+        features = mock.patch.object(connection.features, 'has_select_for_update', True)
+        for_update_sql = mock.patch.object(connection.ops, 'for_update_sql', return_value='')
+        features.start()
+        for_update_sql.start()
+        self.addCleanup(features.stop)
+        self.addCleanup(for_update_sql.stop)
+
+    def test_save_and_delete_outside_transaction(self):
+        lesson_task = LessonTask(lesson=self.lesson, student=self.student)
+        lesson_task.save()
+        lesson_task.generate_tasks()
+        lesson_task.answers = {}
+        lesson_task.score = 5
+        lesson_task.submitted_at = timezone.now()
+        lesson_task.save()
+        self.assertEqual(GradebookEntry.objects.get().score, 5)
+        lesson_task.score = None
+        lesson_task.save()
+        self.assertFalse(GradebookEntry.objects.exists())
+        lesson_task.score = 4
+        lesson_task.save()
+        lesson_task.delete()
+        self.assertFalse(GradebookEntry.objects.exists())
+        self.assertEqual(StudentProgress.objects.get(pk=self.student.pk).completed_count, 0)
+
+class LessonStatsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.students = make_students(3, make_groups(make_teacher()))
+        cls.lesson = make_lesson(date(2026, 1, 10))
+
+    def stats(self):
+        return LessonStats.objects.get(pk=self.lesson.pk)
+
+    def test_apply_score(self):
+        LessonStats.apply_score(self.lesson.pk, None, 5)
+        LessonStats.apply_score(self.lesson.pk, None, 3)
+        # Перепроверка: работа переходит из столбца 5 в 7
+        LessonStats.apply_score(self.lesson.pk, 5, 7)
+        stats = self.stats()
+        self.assertEqual(stats.histogram, [0, 0, 0, 1, 0, 0, 0, 1])
+        self.assertEqual((stats.submission_count, stats.score_sum, stats.score_sq_sum), (2, 10, 58))
+        self.assertEqual((stats.average, stats.std), (5, 2))
+
+    def test_tasks_created_counts_inserted_rows(self):
+        LessonTask.get_or_generate(self.lesson, self.students[0])
+        self.assertEqual(LessonTask.provision(self.lesson), 2)
+        self.assertEqual(LessonTask.provision(self.lesson), 0)
+        self.assertEqual(self.stats().tasks_created, 3)
+
+    def test_tasks_created_decremented_on_delete(self):
+        LessonTask.provision(self.lesson)
+        LessonTask.objects.filter(student=self.students[0]).delete()
+        Student.objects.filter(pk=self.students[1].pk).delete()
+        self.assertEqual(self.stats().tasks_created, 1)
+
+class RegradeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = make_students(1, make_groups(make_teacher()))[0]
+        cls.lesson = make_lesson(date(2026, 1, 10), task_generator='add_sub')
+
+    def setUp(self):
+        cache.clear()
+        lesson_task = LessonTask.get_or_generate(self.lesson, self.student)
+        # Верные, но несокращённые ответы: 5/6 записано как 10/12
+        answers = {}
+        for i, task in enumerate(lesson_task.get_tasks()):
+            numerator, denominator = task['answer'].split('/')
+            answers[str(i)] = f'{int(numerator) * 2}/{int(denominator) * 2}'
+        lesson_task.check_answers(answers)
+
+    def test_rule_change_reaches_gradebook_and_stats(self):
+        self.assertEqual(GradebookEntry.objects.get().score, 1)
+        out = StringIO()
+        call_command('regrade_lesson', str(self.lesson.date), '--rules', 'equivalent_sums', stdout=out)
+        self.assertIn('проверено 1, изменилось оценок 1', out.getvalue())
+        self.assertEqual(GradebookEntry.objects.get().score, 7)
+        stats = LessonStats.objects.get(pk=self.lesson.pk)
+        self.assertEqual((stats.submission_count, stats.score_sum), (1, 7))
+        self.assertEqual(stats.histogram, [0, 0, 0, 0, 0, 0, 0, 1])
+        self.assertEqual(StudentProgress.objects.get(pk=self.student.pk).score_sum, 7)
+
+    def test_default_rules_change_nothing(self):
+        out = StringIO()
+        call_command('regrade_lesson', str(self.lesson.date), stdout=out)
+        self.assertIn('изменилось оценок 0', out.getvalue())
+
+class GroupHistoryIntervalTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.groups = make_groups(make_teacher())
+        cls.student = make_students(1, cls.groups)[0]
+
+    def transfer(self, group, transfer_date):
+        return GroupHistory.objects.create(student=self.student, group=group, transfer_date=transfer_date)
+
+    def test_valid_to_maintained(self):
+        first = self.transfer(self.groups[0], date(2025, 9, 1))
+        second = self.transfer(self.groups[1], date(2025, 10, 15))
+        first.refresh_from_db()
+        self.assertEqual((first.valid_to, GroupHistory.objects.get(pk=second.pk).valid_to),
+                         (date(2025, 10, 15), None))
+        self.assertEqual(self.student.group_on(date(2025, 10, 14)), self.groups[0])
+        self.assertEqual(self.student.group_on(date(2025, 10, 15)), self.groups[1])
+        self.assertIsNone(self.student.group_on(date(2025, 8, 31)))
+
+        second.delete()
+        first.refresh_from_db()
+        self.assertIsNone(first.valid_to)
+        self.assertEqual(self.student.group_on(date(2025, 12, 1)), self.groups[0])
+
+    def test_same_day_transfer(self):
+        self.transfer(self.groups[0], date(2025, 9, 1))
+        self.transfer(self.groups[1], date(2025, 10, 15))
+        self.transfer(self.groups[4], date(2025, 10, 15))
+        on_date = date(2025, 10, 15)
+        self.assertEqual(GroupHistory.objects.on_date(on_date).get().group, self.groups[4])
+        self.assertFalse(self.groups[1].roster_on(on_date).exists())
+        self.assertEqual(list(self.groups[4].roster_on(on_date)), [self.student])
+        self.assertEqual(list(self.groups[0].roster_on(date(2025, 10, 14))), [self.student])
+
+    def test_timeline_and_transitions_use_intervals(self):
+        self.transfer(self.groups[0], date(2025, 9, 1))
+        self.transfer(self.groups[1], date(2025, 10, 15))
+        self.transfer(self.groups[4], date(2025, 10, 15))
+        # Новая дата среза пересобирает линии уже по обновлённым интервалам
+        self.transfer(self.groups[2], date(2025, 12, 16))
+        self.student.timeline.refresh_from_db()
+        self.assertEqual(self.student.timeline.history,
+                         '[{"date": "2025-09-01", "group": 1.0}, {"date": "2025-10-15", "group": 3.0}, '
+                         '{"date": "2025-12-16", "group": 2.1}]')
+        steps = group_transitions()
+        self.assertEqual(steps[0]['flows'], [{'from': 1.0, 'to': 3.0, 'count': 1}])
+        self.assertEqual(steps[1]['flows'], [{'from': 3.0, 'to': 2.1, 'count': 1}])
+
+class GradingQueueTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = make_students(1, make_groups(make_teacher()))[0]
+        cls.student.user = User.objects.create_user('student', password='password')
+        cls.student.save()
+        cls.lesson = make_lesson(date(2026, 1, 10), task_generator='comparison')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.student.user)
+
+    def submit(self):
+        return self.client.post(reverse('lesson_view', args=[self.lesson.date]), {'answer_0': '1/2'})
+
+    def result(self):
+        return self.client.get(reverse('lesson_result', args=[self.lesson.date]))
+
+    def lesson_task(self):
+        return LessonTask.objects.get(lesson=self.lesson, student=self.student)
+
+    def test_graded_inline_by_default(self):
+        self.submit()
+        self.assertIsNotNone(self.lesson_task().score)
+        self.assertNotIn('grading', self.result().context)
+
+    @override_settings(ASYNC_GRADING=True)
+    def test_queued_after_commit(self):
+        executor = mock.Mock()
+        executor.submit.side_effect = lambda worker, pk: grade_submission(pk)
+        with mock.patch('main.grading_queue.get_executor', return_value=executor):
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.submit()
+            # До коммита работа только записана и ждёт проверки
+            self.assertIsNone(self.lesson_task().score)
+            self.assertTrue(self.result().context['grading'])
+            executor.submit.assert_not_called()
+            for callback in callbacks:
+                callback()
+        executor.submit.assert_called_once()
+        self.assertIsNotNone(self.lesson_task().score)
+        self.assertNotIn('grading', self.result().context)
+
+    @override_settings(ASYNC_GRADING=True)
+    def test_stale_grading_error_logged(self):
+        self.submit()
+        LessonTask.objects.filter(pk=self.lesson_task().pk).update(submitted_at=timezone.now() - timedelta(hours=1))
+        with mock.patch('main.views.grade_submission', side_effect=RuntimeError('boom')), \
+                self.assertLogs('main.views', 'ERROR'):
+            response = self.result()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['grading'])
+
+class LessonTheoryCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        groups = make_groups(make_teacher())
+        student = make_students(1, groups)[0]
+        student.user = User.objects.create_user('student', password='password')
+        student.save()
+        cls.lesson = make_lesson(date(2026, 1, 24))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.get(username='student'))
+
+    def theory_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('lesson_view', args=[self.lesson.date]))
+        return response, [query for query in context.captured_queries if 'theory_content' in query['sql']]
+
+    def test_theory_read_only_on_miss(self):
+        response, queries = self.theory_queries()
+        self.assertContains(response, '<p>Теория</p>')
+        self.assertEqual(len(queries), 1)
+        response, queries = self.theory_queries()
+        self.assertContains(response, '<p>Теория</p>')
+        self.assertEqual(queries, [])
+
+    def test_invalidated_on_save(self):
+        self.theory_queries()
+        lesson = Lesson.objects.get(pk=self.lesson.pk)
+        lesson.theory_content = '<p>Новая теория</p>'
+        lesson.save()
+        self.assertEqual(lesson.theory_hash, Lesson.content_hash('<p>Новая теория</p>'))
+        response, _ = self.theory_queries()
+        self.assertContains(response, '<p>Новая теория</p>')
+
+    def test_invalidated_on_queryset_update(self):
+        self.theory_queries()
+        Lesson.objects.filter(pk=self.lesson.pk).update(theory_content='<p>Правка списком</p>')
+        response, _ = self.theory_queries()
+        self.assertContains(response, '<p>Правка списком</p>')
+
+        lesson = Lesson.objects.get(pk=self.lesson.pk)
+        lesson.theory_content = '<p>Правка bulk_update</p>'
+        Lesson.objects.bulk_update([lesson], ['theory_content'])
+        response, _ = self.theory_queries()
+        self.assertContains(response, '<p>Правка bulk_update</p>')
+
+
+class ComputedCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def bump(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_version(GROUP_HISTORY)
+
+    def test_fresh_value_computed_once(self):
+        self.assertEqual(cached_computation(GROUP_HISTORY, 'test', self.compute), 1)
+        self.assertEqual(cached_computation(GROUP_HISTORY, 'test', self.compute), 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_recomputed_after_bump(self):
+        cached_computation(GROUP_HISTORY, 'test', self.compute)
+        self.bump()
+        self.assertEqual(cached_computation(GROUP_HISTORY, 'test', self.compute), 2)
+
+    def test_stale_value_served_while_locked(self):
+        cached_computation(GROUP_HISTORY, 'test', self.compute)
+        self.bump()
+        # Другой процесс уже пересчитывает
+        cache.add(f'computed:{GROUP_HISTORY}:test:lock', 1)
+        self.assertEqual(cached_computation(GROUP_HISTORY, 'test', self.compute), 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_computes_itself_after_waiting(self):
+        cache.add(f'computed:{GROUP_HISTORY}:test:lock', 1)
+        with mock.patch.object(computed_cache, 'WAIT_SECONDS', 0.1):
+            self.assertEqual(cached_computation(GROUP_HISTORY, 'test', self.compute), 1)
+
+    def test_statistics_sees_new_history(self):
+        teacher = make_teacher()
+        groups = make_groups(teacher)
+        student = make_students(1, groups)[0]
+        make_history([student], groups)
+        self.client.force_login(teacher.user)
+        self.client.get(reverse('statistics'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            GroupHistory.objects.create(student=student, group=groups[4], transfer_date=date(2026, 2, 1))
+        response = self.client.get(reverse('statistics'))
+        self.assertIn('01.02.2026', response.context['key_dates'])
+
+
+LESSON_WITH_ASSETS = """<style>.pizza { color: red; }</style>
+<p>Теория</p>
+<script type="application/json">{"data": 1}</script>
+<script>
+    document.querySelectorAll('.pizza').forEach(function (node) { node.title = 'Пицца'; });
+""" + "    // Комментарий, чтобы файл было выгодно сжимать\n" * 10 + "</script>"
+
+
+class LessonAssetsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.assets_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.assets_root)
+        settings_override = override_settings(LESSON_ASSETS_ROOT=self.assets_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_extract_assets(self):
+        html, names = extract_assets(LESSON_WITH_ASSETS)
+        self.assertEqual([name.split('/')[0] for name in names], ['css', 'js'])
+        self.assertNotIn('<style>', html)
+        self.assertIn(f'<link rel="stylesheet" href="/lesson-assets/{names[0]}">', html)
+        self.assertIn(f'<script src="/lesson-assets/{names[1]}"></script>', html)
+        # Данные остаются встроенными
+        self.assertIn('<script type="application/json">', html)
+        # Тот же блок - тот же файл
+        self.assertEqual(extract_assets(LESSON_WITH_ASSETS)[1], names)
+
+    def test_asset_served_compressed_and_immutable(self):
+        _, names = extract_assets(LESSON_WITH_ASSETS)
+        url = reverse('lesson_asset', args=[names[1]])
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn("node.title = 'Пицца'", gzip.decompress(b''.join(response.streaming_content)).decode())
+
+        plain = self.client.get(url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(plain['Content-Type'], 'text/javascript; charset=utf-8')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=plain['ETag']).status_code, 304)
+
+    def test_asset_outside_root(self):
+        request = RequestFactory().get('/lesson-assets/')
+        with self.assertRaises(SuspiciousFileOperation):
+            lesson_asset(request, '../settings.py')
+        with self.assertRaises(Http404):
+            lesson_asset(request, 'js/missing.js')
+
+    def test_lesson_page_uses_built_theory(self):
+        groups = make_groups(make_teacher())
+        student = make_students(1, groups)[0]
+        student.user = User.objects.create_user('student', password='password')
+        student.save()
+        lesson = make_lesson(date(2026, 1, 24))
+        Lesson.objects.filter(pk=lesson.pk).update(theory_content=LESSON_WITH_ASSETS)
+        lesson.refresh_from_db()
+        self.assertEqual(len(build_lesson(lesson)), 2)
+
+        self.client.force_login(student.user)
+        response = self.client.get(reverse('lesson_view', args=[lesson.date]))
+        self.assertContains(response, '<script src="/lesson-assets/js/')
+        self.assertNotContains(response, '.pizza { color: red; }')
+
+
+class SyntheticSchoolTests(TestCase):
+    def test_lessons_inactive_by_default(self):
+        call_command('generate_synthetic_school', students=3, lessons=2, seed=1, stdout=StringIO())
+        self.assertEqual(Lesson.objects.count(), 2)
+        self.assertFalse(Lesson.objects.filter(is_active=True).exists())
+
+    def test_active_lessons_refused_with_real_data(self):
+        make_lesson(date(2026, 1, 10))
+        with self.assertRaises(CommandError):
+            call_command('generate_synthetic_school', students=3, lessons=2, active_lessons=True, stdout=StringIO())
+        Lesson.objects.all().delete()
+        make_students(1, [Group.objects.create(number=1)])
+        with self.assertRaises(CommandError):
+            call_command('generate_synthetic_school', students=3, lessons=2, active_lessons=True, stdout=StringIO())
+        self.assertFalse(Lesson.objects.exists())
+
+    def test_load_test_requires_active_lessons(self):
+        call_command('generate_synthetic_school', students=3, lessons=1, seed=1, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('load_test', stdout=StringIO())
+
+
+class StaticPipelineTests(SimpleTestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.storage = CompressedManifestStaticFilesStorage(location=self.root, base_url='/static/')
+        for name, content in (('app.css', 'body { background: url("bg.png"); }\n' * 20), ('bg.png', 'png')):
+            with open(os.path.join(self.root, name), 'w') as static_file:
+                static_file.write(content)
+        list(self.storage.post_process({name: (self.storage, name) for name in ('app.css', 'bg.png')}))
+
+    def call(self, path, **environ):
+        app = StaticFilesMiddleware(lambda environ, start_response: [b'django'],
+                                    directories=[('/static/', self.root, False)])
+        response = {}
+
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+
+        body = b''.join(app({'REQUEST_METHOD': 'GET', 'PATH_INFO': path, **environ}, start_response))
+        return response.get('status'), response.get('headers', {}), body
+
+    def test_hashed_files_precompressed(self):
+        hashed = self.storage.stored_name('app.css')
+        self.assertNotEqual(hashed, 'app.css')
+        self.assertTrue(os.path.exists(os.path.join(self.root, hashed + '.gz')))
+        # Картинки не сжимаются
+        self.assertFalse(os.path.exists(os.path.join(self.root, self.storage.stored_name('bg.png') + '.gz')))
+
+    def test_hashed_file_served_immutable(self):
+        hashed = self.storage.stored_name('app.css')
+        status, headers, body = self.call('/static/' + hashed, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', headers['Cache-Control'])
+        self.assertIn(b'bg.', gzip.decompress(body))
+
+        status, _, body = self.call('/static/' + hashed, HTTP_IF_NONE_MATCH=headers['ETag'],
+                                    HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual((status, body), ('304 Not Modified', b''))
+
+    def test_unhashed_file_revalidated(self):
+        _, headers, _ = self.call('/static/app.css')
+        self.assertNotIn('immutable', headers['Cache-Control'])
+        self.assertNotIn('Content-Encoding', headers)
+
+    def test_other_requests_passed_to_django(self):
+        self.assertEqual(self.call('/static/missing.css')[2], b'django')
+        self.assertEqual(self.call('/static/../manage.py')[2], b'django')
+        self.assertEqual(self.call('/students/')[2], b'django')
+
+
+class EndpointReportTests(SimpleTestCase):
+
+    def record(self, endpoint, total_ms, status=200, hits=0, misses=0):
+        return {'endpoint': endpoint, 'status': status, 'total_ms': total_ms, 'sql_count': 3,
+                'sql_ms': 1.0, 'template_ms': 2.0, 'cache_hits': hits, 'cache_misses': misses}
+
+    def test_sorted_by_p95(self):
+        records = [self.record('home', 10) for _ in range(20)]
+        records += [self.record('statistics', 10) for _ in range(18)] + [self.record('statistics', 900)] * 2
+        report = endpoint_report(records)
+        self.assertEqual([row['endpoint'] for row in report], ['statistics', 'home'])
+        self.assertEqual(report[1]['p95_ms'], 10)
+
+    def test_cache_hit_rate_and_errors(self):
+        report = endpoint_report([self.record('home', 5, hits=3, misses=1), self.record('home', 5, status=500)])
+        self.assertEqual(report[0]['cache_hit_rate'], 75.0)
+        self.assertEqual(report[0]['errors'], 1)
+
+    def write_log(self, name, records):
+        with open(name, 'w', encoding='utf-8') as log_file:
+            for ts, total_ms in records:
+                log_file.write(json.dumps(dict(self.record('home', total_ms), ts=ts)) + '\n')
+
+    def test_merges_process_logs(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'performance.log')
+        # Два процесса, у первого есть ротированная копия; чужие файлы не читаются
+        self.write_log(os.path.join(directory, 'performance.101.log.1'), [('2026-01-01T10:00:00.000', 1)])
+        self.write_log(os.path.join(directory, 'performance.101.log'), [('2026-01-01T10:00:02.000', 3)])
+        self.write_log(os.path.join(directory, 'performance.202.log'),
+                       [('2026-01-01T10:00:01.000', 2), ('2026-01-01T10:00:03.000', 4)])
+        self.write_log(os.path.join(directory, 'other.log'), [('2026-01-01T10:00:05.000', 9)])
+        self.assertEqual([record['total_ms'] for record in read_log_records(path)], [1, 2, 3, 4])
+        self.assertEqual([record['total_ms'] for record in read_log_records(path, limit=2)], [3, 4])
+
+    def test_handler_writes_process_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'logs', 'performance.log')
+        handler = PerformanceLogHandler(path, encoding='utf-8')
+        self.addCleanup(handler.close)
+        handler.emit(logging.makeLogRecord({'msg': json.dumps(self.record('home', 5))}))
+        with mock.patch('os.getpid', return_value=os.getpid() + 1):
+            handler.emit(logging.makeLogRecord({'msg': json.dumps(self.record('home', 6))}))
+        self.assertEqual(sorted(os.listdir(os.path.dirname(path))),
+                         sorted([f'performance.{os.getpid()}.log', f'performance.{os.getpid() + 1}.log']))
+        self.assertEqual(sorted(record['total_ms'] for record in read_log_records(path)), [5, 6])
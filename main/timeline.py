@@ -0,0 +1,132 @@
+"""Материализованная история групп учеников по ключевым датам (страница статистики)"""
+import json
+from collections import defaultdict
+from datetime import date
+
+from django.db import transaction
+
+from .computed_cache import GROUP_HISTORY, bump_version
+from .models import GroupHistory, SnapshotDate, Student, StudentTimeline
+
+# Даты по умолчанию, пока история не заполнена
+DEFAULT_KEY_DATES = [
+    date(2025, 9, 1),
+    date(2025, 10, 15),
+    date(2025, 12, 16),
+    date(2026, 1, 12),
+]
+
+
+def get_key_dates():
+    """
+    Даты срезов из БД (или даты по умолчанию).
+
+    Дата каждой записи GroupHistory регистрируется как срез при
+    сохранении, поэтому срезы переживают сжатие истории до переходов.
+    """
+    key_dates = list(SnapshotDate.objects.values_list('date', flat=True).order_by('date'))
+    return key_dates or list(DEFAULT_KEY_DATES)
+
+
+def groups_on_dates(key_dates, student_ids=None):
+    """
+    Группы учеников на каждую ключевую дату: строки (номер даты, id ученика, номер группы).
+
+    Срез на дату - записи GroupHistory.on_date (transfer_date <= дата < valid_to),
+    по одному запросу на дату по индексу интервалов. Из нескольких записей
+    на одну дату действует последняя; на даты до появления ученика строк нет.
+    """
+    rows = []
+    for position, key_date in enumerate(key_dates):
+        entries = GroupHistory.objects.on_date(key_date)
+        if student_ids is not None:
+            entries = entries.filter(student_id__in=student_ids)
+        rows.extend(
+            (position, student_id, group_number)
+            for student_id, group_number in entries.values_list('student_id', 'group__number')
+        )
+    return rows
+
+
+def refresh_student_timelines(student_ids, key_dates=None):
+    """Пересобрать линии только указанных учеников"""
+    student_ids = set(student_ids)
+    if not student_ids:
+        return
+    if key_dates is None:
+        key_dates = get_key_dates()
+
+    histories = defaultdict(list)
+    for position, student_id, group_number in groups_on_dates(key_dates, student_ids):
+        histories[student_id].append({
+            'date': key_dates[position].strftime('%Y-%m-%d'),
+            'group': float(group_number),
+        })
+
+    names = dict(Student.objects.filter(pk__in=student_ids).values_list('id', 'full_name'))
+    timelines = [
+        StudentTimeline(student_id=student_id, name=names[student_id], history=json.dumps(history))
+        for student_id, history in histories.items()
+        if student_id in names
+    ]
+
+    with transaction.atomic():
+        StudentTimeline.objects.filter(student_id__in=student_ids).delete()
+        StudentTimeline.objects.bulk_create(timelines, batch_size=500)
+        bump_version(GROUP_HISTORY)
+
+
+def refresh_all_timelines():
+    """Пересобрать линии всех учеников (изменился набор ключевых дат)"""
+    student_ids = set(GroupHistory.objects.values_list('student_id', flat=True).distinct())
+    with transaction.atomic():
+        StudentTimeline.objects.exclude(student_id__in=student_ids).delete()
+        refresh_student_timelines(student_ids)
+
+
+def get_timeline():
+    """
+    Данные для страницы статистики из готовых линий.
+
+    Возвращает ключевые даты, список учеников (id, name) и JSON всех
+    линий, собранный из сохранённых фрагментов без повторного разбора.
+    """
+    key_dates = get_key_dates()
+    rows = StudentTimeline.objects.order_by('name').values_list('student_id', 'name', 'history')
+
+    students = []
+    fragments = []
+    for student_id, name, history in rows:
+        students.append({'id': student_id, 'name': name})
+        fragments.append(f'"{student_id}": {{"name": {json.dumps(name)}, "history": {history}}}')
+
+    return {
+        'key_dates': key_dates,
+        'students': students,
+        'students_json': '{' + ', '.join(fragments) + '}',
+    }
+
+
+def find_redundant_history():
+    """
+    id записей GroupHistory, не меняющих группу ученика.
+
+    Лишние - перекрытые записью на ту же дату (valid_to == transfer_date)
+    и повторяющие группу предыдущей действующей записи.
+    """
+    redundant = []
+    previous_student_id = previous_group_id = None
+    rows = (
+        GroupHistory.objects
+        .order_by('student_id', 'transfer_date', 'id')
+        .values_list('id', 'student_id', 'group_id', 'transfer_date', 'valid_to')
+    )
+    for entry_id, student_id, group_id, transfer_date, valid_to in rows.iterator():
+        if valid_to == transfer_date:
+            redundant.append(entry_id)
+            continue
+        if student_id == previous_student_id and group_id == previous_group_id:
+            redundant.append(entry_id)
+            continue
+        previous_student_id, previous_group_id = student_id, group_id
+    return redundant
@@ -1,13 +1,27 @@
+import logging
+import os
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login
 from django.contrib import messages
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.utils._os import safe_join
+from django.db.models import Exists, OuterRef
+from .analytics import get_item_analysis, group_stats, group_transitions
+from .computed_cache import GRADEBOOK, GROUP_HISTORY, cached_computation
+from .dashboard import get_student_lessons
 from .forms import StudentRegistrationForm
-from .models import GroupHistory, Student, Group, Lesson, LessonTask, Teacher
-from collections import defaultdict
-import json
-from datetime import date
+from .grading import default_checker
+from .grading_queue import grade_submission, is_stale, submit_answers
+from .gradebook import build_gradebook, task_type_accuracy
+from .models import Lesson, LessonStats, LessonTask, TaskAttempt
+from .performance import get_endpoint_report
+from .static_serving import serve_file
+from .timeline import get_timeline
+
+logger = logging.getLogger(__name__)
 
 
 def home(request):
@@ -15,40 +29,22 @@ def home(request):
 
     # Если пользователь авторизован и является учеником
     if request.user.is_authenticated:
-        try:
-            student = request.user.student
-
-            # Получаем все активные уроки
-            lessons = Lesson.objects.filter(is_active=True).order_by('date')
-
-            # Проверяем статус выполнения каждого урока
-            lessons_with_status = []
-            completed_count = 0  # ДОБАВЛЕНО: счётчик пройденных уроков
+        student = request.principal.student
 
-            for lesson in lessons:
-                try:
-                    lesson_task = LessonTask.objects.get(lesson=lesson, student=student)
-                    lesson.completed = lesson_task.submitted_at is not None
-                    lesson.score = lesson_task.score if lesson_task.submitted_at else None
-
-                    # ДОБАВЛЕНО: считаем пройденные уроки
-                    if lesson.completed:
-                        completed_count += 1
-
-                except LessonTask.DoesNotExist:
-                    lesson.completed = False
-                    lesson.score = None
-
-                lessons_with_status.append(lesson)
+        # Пользователь не ученик (возможно, преподаватель)
+        if student is not None:
+            # Активные уроки со статусами: один запрос + кэш на ученика
+            lessons_with_status = get_student_lessons(student.id)
+            # Счётчики - по тем же активным урокам, что и список (без лишних запросов):
+            # сданная, но ещё не проверенная работа уже считается сданной
+            completed_count = sum(1 for lesson in lessons_with_status if lesson['completed'])
+            scores = [lesson['score'] for lesson in lessons_with_status if lesson['score'] is not None]
 
             context['lessons'] = lessons_with_status
             context['student'] = student
-            context['completed_count'] = completed_count  # ДОБАВЛЕНО
-            context['total_lessons'] = len(lessons_with_status)  # ДОБАВЛЕНО
-
-        except Student.DoesNotExist:
-            # Пользователь не ученик (возможно, преподаватель)
-            pass
+            context['completed_count'] = completed_count
+            context['average'] = round(sum(scores) / len(scores), 2) if scores else None
+            context['total_lessons'] = len(lessons_with_status)
 
     return render(request, 'home.html', context)
 
@@ -68,27 +64,23 @@ def lesson_view(request, lesson_date):
     """Просмотр урока и выполнение заданий"""
     try:
         # Получаем урок по дате
-        lesson = get_object_or_404(Lesson, date=lesson_date, is_active=True)
+        # Теория берётся из кэша фрагмента в шаблоне - из базы её не читаем
+        lesson = get_object_or_404(Lesson.objects.defer('theory_content', 'theory_built'),
+                                   date=lesson_date, is_active=True)
         
         # Получаем ученика
-        try:
-            student = request.user.student
-        except Student.DoesNotExist:
+        student = request.principal.student
+        if student is None:
             messages.error(request, 'Ваш профиль ученика не найден.')
             return redirect('home')
         
-        # Получаем или создаем задание для ученика
-        lesson_task, created = LessonTask.objects.get_or_create(
-            lesson=lesson,
-            student=student
-        )
-        
-        # Если задание новое, генерируем задачи
-        if created or not lesson_task.tasks_data:
+        # Задание обычно подготовлено заранее (provision_lesson_tasks) - тогда это только чтение
+        lesson_task = LessonTask.get_or_generate(lesson, student)
+        if not lesson_task.has_tasks:
             lesson_task.generate_tasks()
         
         # Загружаем задания
-        tasks = json.loads(lesson_task.tasks_data)
+        tasks = lesson_task.get_tasks()
         
         # Обработка отправки формы
         if request.method == 'POST':
@@ -102,9 +94,13 @@ def lesson_view(request, lesson_date):
                 answer = request.POST.get(f'answer_{i}', '').strip()
                 answers[str(i)] = answer
             
-            # Проверяем и выставляем оценку
-            score = lesson_task.check_answers(answers)
-            messages.success(request, f'Тест сдан! Ваша оценка: {score} из 7')
+            # Ответы сохраняются сразу, оценку выставляет очередь проверки
+            if not submit_answers(lesson_task, answers):
+                messages.warning(request, 'Вы уже сдали этот тест!')
+            elif lesson_task.score is not None:
+                messages.success(request, f'Тест сдан! Ваша оценка: {lesson_task.score} из 7')
+            else:
+                messages.success(request, 'Тест сдан! Ответы проверяются.')
             return redirect('lesson_result', lesson_date=lesson_date)
         
         context = {
@@ -124,11 +120,10 @@ def lesson_view(request, lesson_date):
 @login_required
 def lesson_result(request, lesson_date):
     """Результаты выполнения урока"""
-    lesson = get_object_or_404(Lesson, date=lesson_date)
+    lesson = get_object_or_404(Lesson.objects.defer('theory_content', 'theory_built'), date=lesson_date)
     
-    try:
-        student = request.user.student
-    except Student.DoesNotExist:
+    student = request.principal.student
+    if student is None:
         messages.error(request, 'Ваш профиль ученика не найден.')
         return redirect('home')
     
@@ -137,21 +132,41 @@ def lesson_result(request, lesson_date):
     if not lesson_task.submitted_at:
         messages.warning(request, 'Сначала выполните тест!')
         return redirect('lesson_view', lesson_date=lesson_date)
+
+    # Работа ещё в очереди; если задача проверки потеряна - проверяем здесь
+    if lesson_task.score is None and is_stale(lesson_task):
+        try:
+            grade_submission(lesson_task.pk)
+        except Exception:
+            # Ученик видит «проверяется», работу подберёт process_grading_queue
+            logger.exception('Не удалось проверить работу %s', lesson_task.pk)
+        lesson_task.refresh_from_db()
+    if lesson_task.score is None:
+        return render(request, 'lesson_result.html', {
+            'lesson': lesson,
+            'lesson_task': lesson_task,
+            'grading': True,
+        })
     
-    tasks = json.loads(lesson_task.tasks_data)
-    answers = json.loads(lesson_task.answers) if lesson_task.answers else {}
+    tasks = lesson_task.get_tasks()
+    answers = lesson_task.answers or {}
     
+    # Результат по каждому заданию сохранён при проверке; для работ,
+    # проверенных до появления TaskAttempt, проверяем заново
+    correct_by_position = dict(lesson_task.attempts.values_list('position', 'is_correct'))
+
     # Формируем детальные результаты
     results = []
     for i, task in enumerate(tasks):
         user_answer = answers.get(str(i), '')
-        correct_answer = task['answer']
-        is_correct = user_answer.strip().lower() == correct_answer.strip().lower()
-        
+        is_correct = correct_by_position.get(i)
+        if is_correct is None:
+            is_correct = default_checker.is_correct(task, user_answer)
+
         results.append({
             'task': task,
             'user_answer': user_answer,
-            'correct_answer': correct_answer,
+            'correct_answer': task['answer'],
             'is_correct': is_correct
         })
     
@@ -164,6 +179,15 @@ def lesson_result(request, lesson_date):
     return render(request, 'lesson_result.html', context)
 
 
+def lesson_asset(request, path):
+    """Стиль или скрипт теории урока: имя содержит хэш, поэтому кэшируется навсегда"""
+    # Путь за пределами каталога - SuspiciousFileOperation, Django отвечает 400
+    full_path = safe_join(settings.LESSON_ASSETS_ROOT, path)
+    if not os.path.isfile(full_path):
+        raise Http404
+    return serve_file(request, full_path)
+
+
 # Задачи
 @login_required
 def tasks(request):
@@ -190,60 +214,28 @@ def tasks_create(request):
 def students(request):
     """Главная страница раздела учеников - таблица результатов для учителей"""
     # Проверка: является ли пользователь преподавателем
-    if not is_teacher(request.user):
+    if not is_teacher(request):
         messages.error(request, 'У вас нет доступа к этому разделу.')
         return redirect('home')
     
     # Получаем преподавателя
-    teacher = request.user.teacher_profile
-    
-    # Получаем группы этого преподавателя
-    teacher_groups = teacher.groups.all()
-    
-    # Получаем всех учеников этих групп
-    students_list = Student.objects.filter(current_group__in=teacher_groups).order_by('full_name')
-    
-    # Получаем все уроки
-    lessons = Lesson.objects.filter(is_active=True).order_by('date')
-    
-    # Формируем таблицу результатов
-    results_table = []
-    for student in students_list:
-        student_data = {
-            'student': student,
-            'results': []
-        }
-        
-        for lesson in lessons:
-            try:
-                task = LessonTask.objects.get(lesson=lesson, student=student)
-                if task.submitted_at:
-                    student_data['results'].append({
-                        'lesson': lesson,
-                        'score': task.score,
-                        'submitted': True
-                    })
-                else:
-                    student_data['results'].append({
-                        'lesson': lesson,
-                        'score': None,
-                        'submitted': False
-                    })
-            except LessonTask.DoesNotExist:
-                student_data['results'].append({
-                    'lesson': lesson,
-                    'score': None,
-                    'submitted': False
-                })
-        
-        results_table.append(student_data)
-    
+    teacher = request.principal.teacher
+
+    # Группы этого преподавателя
+    teacher_groups = list(teacher.groups.all())
+
+    # Таблица результатов: фиксированное число запросов, общий кэш на набор групп
+    group_ids = sorted(group.id for group in teacher_groups)
+    gradebook = cached_computation(
+        GRADEBOOK, 'gradebook:' + ','.join(map(str, group_ids)), lambda: build_gradebook(group_ids)
+    )
+
     context = {
-        'results_table': results_table,
-        'lessons': lessons,
+        'results_table': gradebook['results_table'],
+        'lessons': gradebook['lessons'],
         'teacher_groups': teacher_groups
     }
-    
+
     return render(request, 'students.html', context)
 
 
@@ -263,11 +255,8 @@ def students_progress(request):
 
 
 # Проверка: является ли пользователь преподавателем
-def is_teacher(user):
-    try:
-        return hasattr(user, 'teacher_profile')
-    except:
-        return False
+def is_teacher(request):
+    return request.principal.is_teacher
 
 
 # Статистика - ТОЛЬКО ДЛЯ ПРЕПОДАВАТЕЛЕЙ
@@ -276,123 +265,29 @@ def statistics(request):
     """Статистика переходов между группами - интерактивный график (только для преподавателей)"""
     
     # Проверка прав доступа
-    if not is_teacher(request.user):
+    if not is_teacher(request):
         messages.error(request, 'У вас нет доступа к этому разделу. Статистика доступна только преподавателям.')
         return redirect('home')
     
-    # АВТОМАТИЧЕСКИ ОПРЕДЕЛЯЕМ ВСЕ УНИКАЛЬНЫЕ ДАТЫ ИЗ БД
-    key_dates = list(
-        GroupHistory.objects
-        .values_list('transfer_date', flat=True)
-        .distinct()
-        .order_by('transfer_date')
-    )
-    
-    if not key_dates:
-        # Если истории нет, используем дефолтные даты
-        key_dates = [
-            date(2025, 9, 1),
-            date(2025, 10, 15),
-            date(2025, 12, 16),
-            date(2026, 1, 12)
-        ]
-    
-    # Получаем всю историю
-    all_history = GroupHistory.objects.select_related('student', 'group').order_by('student_id', 'transfer_date')
-    
-    # Собираем историю для каждого ученика
-    students_history_raw = defaultdict(list)
-    students_info = {}
-    
-    for entry in all_history:
-        student_id = entry.student.id
-        students_history_raw[student_id].append({
-            'date': entry.transfer_date,
-            'group': float(entry.group.number)
-        })
-        
-        if student_id not in students_info:
-            students_info[student_id] = {
-                'id': student_id,
-                'name': entry.student.full_name
-            }
-    
-    # Дополняем историю промежуточными точками
-    students_full_history = {}
-    for student_id, history in students_history_raw.items():
-        # Сортируем по дате
-        history_sorted = sorted(history, key=lambda x: x['date'])
-        
-        # Собираем полную историю с промежуточными точками
-        full_history = []
-        
-        # Первая дата - когда ученик появился
-        first_date = history_sorted[0]['date']
-        first_group = history_sorted[0]['group']
-        
-        # Индекс текущей записи в истории
-        history_index = 0
-        current_group = first_group
-        
-        # Проходим по всем ключевым датам
-        for key_date in key_dates:
-            # Пропускаем даты до появления ученика
-            if key_date < first_date:
-                continue
-            
-            # Проверяем, есть ли изменение группы на эту дату
-            for i in range(history_index, len(history_sorted)):
-                if history_sorted[i]['date'] == key_date:
-                    current_group = history_sorted[i]['group']
-                    history_index = i + 1
-                    break
-                elif history_sorted[i]['date'] > key_date:
-                    break
-            
-            # Добавляем точку на эту дату с текущей группой
-            full_history.append({
-                'date': key_date.strftime('%Y-%m-%d'),
-                'group': current_group
-            })
-        
-        students_full_history[student_id] = full_history
-    
-    # Собираем список учеников с историей
-    students_with_transitions = []
-    for student_id, history in students_full_history.items():
-        if len(history) > 0:
-            students_with_transitions.append({
-                'id': student_id,
-                'name': students_info[student_id]['name'],
-                'history': history
-            })
-    
-    # Сортируем по имени
-    students_with_transitions.sort(key=lambda x: x['name'])
-    
+    # Готовые линии учеников по ключевым датам (обновляются сигналами GroupHistory);
+    # линии, потоки и состав групп пересчитывает один процесс после изменения истории
+    timeline = cached_computation(GROUP_HISTORY, 'timeline', get_timeline)
+    key_dates = timeline['key_dates']
+
+    # Сводные потоки между группами по соседним датам
+    transitions = cached_computation(GROUP_HISTORY, 'transitions', lambda: group_transitions(key_dates))
+
     # Статистика по группам
-    groups = Group.objects.all().order_by('number')
-    group_stats = []
-    for group in groups:
-        current_count = Student.objects.filter(current_group=group).count()
-        group_stats.append({
-            'group': group,
-            'current_count': current_count,
-            'teacher': group.teacher.full_name if group.teacher else 'Не назначен'
-        })
+    groups = cached_computation(GROUP_HISTORY, 'group_stats', group_stats)
     
     # Форматируем даты для отображения
     dates_formatted = [d.strftime('%d.%m.%Y') for d in key_dates]
     
     context = {
-        'students_with_transitions': students_with_transitions,
-        'students_json': json.dumps({
-            s['id']: {
-                'name': s['name'],
-                'history': s['history']
-            } for s in students_with_transitions
-        }),
-        'group_stats': group_stats,
+        'students_with_transitions': timeline['students'],
+        'students_json': timeline['students_json'],
+        'transitions': transitions,
+        'group_stats': groups,
         'key_dates': dates_formatted,
         'dates_count': len(key_dates),
     }
@@ -403,17 +298,27 @@ def statistics(request):
 @login_required
 def stats_overview(request):
     # Проверка прав доступа
-    if not is_teacher(request.user):
+    if not is_teacher(request):
         messages.error(request, 'У вас нет доступа к этому разделу.')
         return redirect('home')
     
-    return render(request, 'statistics.html', {'view': 'overview'})
+    # Сводка по урокам из накопительной статистики - без пересчёта по работам
+    lessons = Lesson.objects.select_related('stats').defer('theory_content', 'theory_built').order_by('-date')
+    lesson_stats = []
+    for lesson in lessons:
+        try:
+            stats = lesson.stats
+        except LessonStats.DoesNotExist:
+            stats = None
+        lesson_stats.append({'lesson': lesson, 'stats': stats})
+
+    return render(request, 'statistics.html', {'view': 'overview', 'lesson_stats': lesson_stats})
 
 
 @login_required
 def stats_reports(request):
     # Проверка прав доступа
-    if not is_teacher(request.user):
+    if not is_teacher(request):
         messages.error(request, 'У вас нет доступа к этому разделу.')
         return redirect('home')
     
@@ -423,11 +328,38 @@ def stats_reports(request):
 @login_required
 def stats_analytics(request):
     # Проверка прав доступа
-    if not is_teacher(request.user):
+    if not is_teacher(request):
         messages.error(request, 'У вас нет доступа к этому разделу.')
         return redirect('home')
     
-    return render(request, 'statistics.html', {'view': 'analytics'})
+    # Уроки, по которым уже есть проверенные работы
+    lessons = list(
+        Lesson.objects
+        .filter(Exists(TaskAttempt.objects.filter(lesson=OuterRef('pk'))))
+        .order_by('-date')
+        .only('id', 'title', 'date')
+    )
+    selected = next((lesson for lesson in lessons if str(lesson.pk) == request.GET.get('lesson')), None)
+    if selected is None and lessons:
+        selected = lessons[0]
+
+    context = {'view': 'analytics', 'lessons': lessons, 'selected_lesson': selected}
+    if selected is not None:
+        context['item_analysis'] = get_item_analysis(selected)
+        context['type_accuracy'] = task_type_accuracy(selected)
+    return render(request, 'statistics.html', context)
+
+
+@login_required
+def stats_performance(request):
+    # Проверка прав доступа: преподаватели и администраторы
+    if not (is_teacher(request) or request.user.is_staff):
+        messages.error(request, 'У вас нет доступа к этому разделу.')
+        return redirect('home')
+
+    records_count, endpoints = get_endpoint_report()
+    context = {'view': 'performance', 'records_count': records_count, 'endpoints': endpoints}
+    return render(request, 'statistics.html', context)
 
 
 # Регистрация
@@ -23,28 +23,39 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "main.performance.PerformanceMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "main.principal.PrincipalMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
 ROOT_URLCONF = "web.urls"
 
+TEMPLATE_LOADERS = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
+# В продакшене шаблоны компилируются один раз на процесс
+if not DEBUG:
+    TEMPLATE_LOADERS = [("django.template.loaders.cached.Loader", TEMPLATE_LOADERS)]
+
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "main.performance.InstrumentedDjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
-        "APP_DIRS": True,
         "OPTIONS": {
+            "loaders": TEMPLATE_LOADERS,
             "context_processors": [
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "main.principal.principal",
             ],
         },
     }
@@ -74,11 +85,93 @@ STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 STATICFILES_DIRS = [BASE_DIR / "static"]
 
+# Статика с хэшем в именах и сжатыми копиями (main/static_serving.py);
+# перед включением нужен manage.py collectstatic
+STATIC_MANIFEST = config("STATIC_MANIFEST", default=False, cast=bool)
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": (
+            "main.static_serving.CompressedManifestStaticFilesStorage"
+            if STATIC_MANIFEST
+            else "django.contrib.staticfiles.storage.StaticFilesStorage"
+        ),
+    },
+}
+# Отдавать STATIC_ROOT и файлы теории из wsgi.py, минуя Django
+SERVE_STATIC = config("SERVE_STATIC", default=True, cast=bool)
+
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Стили и скрипты теории уроков (manage.py build_lesson_assets)
+LESSON_ASSETS_ROOT = MEDIA_ROOT / "lessons"
+LESSON_ASSETS_URL = "/lesson-assets/"
+
+# Кэш: сводки учеников и профили хранятся сутки и сбрасываются сигналами,
+# поэтому кэш должен быть общим для всех процессов (Passenger, gunicorn):
+# file на одном сервере или redis (Redis или совместимый сервер).
+# locmem - свой у каждого процесса, годится только для одного процесса
+CACHE_BACKENDS = {
+    "locmem": ("main.performance.InstrumentedLocMemCache", ""),
+    "file": ("main.performance.InstrumentedFileBasedCache", str(BASE_DIR / "cache")),
+    "redis": ("main.performance.InstrumentedRedisCache", "redis://127.0.0.1:6379/1"),
+}
+CACHE_BACKEND = config("CACHE_BACKEND", default="file")
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS[CACHE_BACKEND][0],
+        "LOCATION": config("CACHE_LOCATION", default=CACHE_BACKENDS[CACHE_BACKEND][1]),
+        "KEY_PREFIX": config("CACHE_KEY_PREFIX", default="vitrich"),
+    }
+}
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Хранить у LessonTask только генератор, версию и seed вместо полного JSON заданий
+COMPACT_TASK_STORAGE = config("COMPACT_TASK_STORAGE", default=False, cast=bool)
+
+# Проверка сданных работ в фоновом пуле потоков (см. main/grading_queue.py).
+# Пул живёт в процессе веб-сервера: работы, не проверенные до перезапуска,
+# подбирает только process_grading_queue (cron) или страница результата
+ASYNC_GRADING = config("ASYNC_GRADING", default=False, cast=bool)
+GRADING_WORKERS = config("GRADING_WORKERS", default=4, cast=int)
+# Через сколько секунд ожидающую работу проверяет сама страница результата
+GRADING_STALE_SECONDS = config("GRADING_STALE_SECONDS", default=30, cast=int)
+
+# Замеры запросов: заголовок Server-Timing и журнал main/performance.py.
+# Каждый процесс пишет свой файл performance.<pid>.log (до 20 МБ с копией);
+# файлы завершившихся процессов можно удалять по возрасту
+PERFORMANCE_MONITORING = config("PERFORMANCE_MONITORING", default=True, cast=bool)
+PERFORMANCE_LOG = config("PERFORMANCE_LOG", default=str(BASE_DIR / "logs" / "performance.log"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "message": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "performance": {
+            "class": "main.performance.PerformanceLogHandler",
+            "filename": PERFORMANCE_LOG,
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 1,
+            "encoding": "utf-8",
+            "formatter": "message",
+        },
+    },
+    "loggers": {
+        "main.performance": {
+            "handlers": ["performance"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
+
 LOGIN_REDIRECT_URL = "home"
 LOGOUT_REDIRECT_URL = "home"
 LOGIN_URL = "login"
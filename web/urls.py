@@ -46,6 +46,7 @@ urlpatterns = [
     path('statistics/overview/', views.stats_overview, name='stats_overview'),
     path('statistics/reports/', views.stats_reports, name='stats_reports'),
     path('statistics/analytics/', views.stats_analytics, name='stats_analytics'),
+    path('statistics/performance/', views.stats_performance, name='stats_performance'),
 
     # Аутентификация
     path('login/', auth_views.LoginView.as_view(template_name='login.html'), name='login'),
@@ -54,4 +55,5 @@ urlpatterns = [
 
     path('lesson/<str:lesson_date>/', views.lesson_view, name='lesson_view'),
     path('lesson/<str:lesson_date>/result/', views.lesson_result, name='lesson_result'),
+    path('lesson-assets/<path:path>', views.lesson_asset, name='lesson_asset'),
 ]
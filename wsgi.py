@@ -6,8 +6,14 @@ exec(open(activate_this).read(), {'__file__': activate_this})
  
 sys.path.insert(1, os.path.expanduser('~/vitr/public_html/'))
  
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
  
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'web.settings')
  
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+ 
+# Статика с долгим кэшем и сжатыми копиями, если Apache не отдал файл сам
+if settings.SERVE_STATIC:
+    from main.static_serving import StaticFilesMiddleware
+    application = StaticFilesMiddleware(application)
\ No newline at end of file